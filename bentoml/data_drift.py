@@ -1,49 +1,392 @@
-from evidently.report import Report
-from evidently.ui.workspace import Workspace
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Union
+import numpy as np
 import pandas
 import datetime
 import logging
+import queue
+import random
+import threading
+import time
+from src.drift_sampling import DriftSampler
+from src.drift_stats import CategoryDriftEngine
+from src.metrics import drift_queue_depth, request_metrics_enabled
+from src.reference_dataset import align_categories
+from src.reference_profile import ReferenceProfile
+from src.request_profiler import RequestProfiler
+from src.ring_buffer import CategoricalRingBuffer
+from src.snapshot_shipper import SnapshotShipper
+
+if TYPE_CHECKING:
+    from evidently.report import Report
+    from src.drift_aggregation import CategoryCountWindow, RedisDriftAggregator
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+OVERFLOW_POLICIES = ("drop", "sample", "block")
+REPORT_SCHEDULES = ("interval", "hop", "tumbling")
+
 
 class MonitoringService:
+    """
+    Keeps a sliding window of recent feature rows and reports its drift
+    against the reference data to an Evidently workspace, through a
+    SnapshotShipper so a slow workspace never holds up the window.
+
+    The reference is a ReferenceProfile. Reports get reference_data when
+    given (full-data mode), otherwise a frame rebuilt once from the profile.
+
+    iterate only puts the rows on a bounded queue; a background thread appends
+    them to a CategoricalRingBuffer window, so predictions never wait for
+    Evidently. Every batch updates a CategoryDriftEngine, which runs
+    Evidently's drift tests on category counts; see drift(). The full
+    Evidently report, and with it the window DataFrame, is only built on the
+    report schedule or after request_report(). Once the window is full,
+    "interval" reports every report_interval_seconds (never when 0), "hop"
+    after every report_hop_rows new rows, and "tumbling" after window_size
+    new rows, so consecutive reports never share a row.
+    When the queue is full the overflow policy decides what happens to new
+    rows: "drop" discards them, "sample" starts admitting only a share of them
+    once the queue is half full (and discards them when full), "block" waits
+    for space.
+
+    With an aggregator every worker only publishes category counts, and the
+    worker holding the aggregator's lock keeps one window for the whole
+    service and runs the drift checks and reports, see RedisDriftAggregator.
+
+    A DriftSampler picks the rows that go into the window before they are
+    queued. In "reservoir" mode the window is the reservoir: it fills in
+    arrival order and then kept rows replace random rows, and every report
+    starts a new period. Reports carry the rows seen and sampled since the
+    previous report in their metadata.
+
+    The window, the engine and the report state belong to the background
+    thread and are never touched by request threads. The counters reported
+    by stats() are updated from both and are guarded by a lock.
+
+    With a profiler, the background thread's window updates and reports are
+    sampled like requests, as "drift_process" and "drift_report".
+    """
+
     def __init__(
         self,
-        report: Report,
-        reference: pandas.DataFrame,
-        workspace: Workspace,
+        report_factory: Callable[[], "Report"],
+        reference: ReferenceProfile,
+        shipper: SnapshotShipper,
         project_id: str,
         window_size: int,
+        queue_size: int = 1000,
+        overflow_policy: str = "drop",
+        stattest: Optional[str] = None,
+        report_schedule: str = "interval",
+        report_interval_seconds: float = 0,
+        report_hop_rows: int = 0,
+        reference_data: Optional[pandas.DataFrame] = None,
+        aggregator: Optional["RedisDriftAggregator"] = None,
+        sampler: Optional[DriftSampler] = None,
+        profiler: Optional[RequestProfiler] = None,
     ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"Unknown overflow policy {overflow_policy}, "
+                f"expected one of {OVERFLOW_POLICIES}"
+            )
+        if report_schedule not in REPORT_SCHEDULES:
+            raise ValueError(
+                f"Unknown report schedule {report_schedule}, "
+                f"expected one of {REPORT_SCHEDULES}"
+            )
+        if report_schedule == "hop" and int(report_hop_rows) < 1:
+            raise ValueError("The hop report schedule needs report_hop_rows >= 1")
+        sampler = sampler or DriftSampler()
+        if sampler.mode == "reservoir":
+            if aggregator is not None:
+                raise ValueError("Reservoir sampling does not support aggregation")
+            if sampler.reservoir_size != int(window_size):
+                raise ValueError("The reservoir size must be the window size")
         self.window_size = int(window_size)
-        self.report = report
+        # The report (and with it evidently) is only created when the first
+        # report runs
+        self.report_factory = report_factory
+        self._report: Optional["Report"] = None
+        self.shipper = shipper
         self.new_rows = 0
         self.reference = reference
-        self.workspace = workspace
+        self._reference_data = reference_data
         self.project_id = project_id
-        self.current = pandas.DataFrame()
+        self.aggregator = aggregator
+        self.sampler = sampler
+        self.profiler = profiler
+        # Rows appended in arrival order before the reservoir replaces rows
+        self._reservoir_appends_left = self.window_size
+        # Stream totals since the last report, when aggregating
+        self._rows_seen_published = 0
+        self._aggregated_rows_seen = 0
+        self._aggregated_rows_sampled = 0
+        # Created from the columns of the first rows, see _process, or when
+        # this worker becomes the aggregator, see _aggregate
+        self.window: Optional[Union[CategoricalRingBuffer, "CategoryCountWindow"]] = (
+            None
+        )
+        self.engine: Optional[CategoryDriftEngine] = None
+        self.stattest = stattest
+        self.latest_drift: Optional[Dict[str, Any]] = None
+        self.report_schedule = report_schedule
+        self.report_interval_seconds = float(report_interval_seconds)
+        self.report_hop_rows = int(report_hop_rows)
+        self.last_report_time = time.monotonic()
+        self.new_rows_at_last_report: Optional[int] = None
+        self._report_requested = threading.Event()
+        self.overflow_policy = overflow_policy
+        self.queue = queue.Queue(maxsize=int(queue_size))
+        self._counter_lock = threading.Lock()
+        self.enqueued_batches = 0
+        self.dropped_batches = 0
+        self.dropped_rows = 0
+        self.drift_evaluations = 0
+        self.reports_run = 0
+        self.report_failures = 0
+        self._worker = threading.Thread(
+            target=self._run, name="drift-monitoring", daemon=True
+        )
+        self._worker.start()
+
+    @property
+    def report(self) -> "Report":
+        if self._report is None:
+            self._report = self.report_factory()
+        return self._report
+
+    @property
+    def reference_data(self) -> pandas.DataFrame:
+        if self._reference_data is None:
+            self._reference_data = self.reference.to_dataframe()
+        return self._reference_data
 
     def iterate(self, new_rows: pandas.DataFrame):
+        new_rows = self.sampler.sample(new_rows)
+        if new_rows is None:
+            return
+        if self.overflow_policy == "block":
+            self.queue.put(new_rows)
+            self._count_enqueued()
+            return
+        if self.overflow_policy == "sample":
+            fill = self.queue.qsize() / self.queue.maxsize
+            # Admit everything up to half full, then linearly less down to none
+            if fill > 0.5 and random.random() > 2 * (1 - fill):
+                self._drop(new_rows)
+                return
+        try:
+            self.queue.put_nowait(new_rows)
+        except queue.Full:
+            self._drop(new_rows)
+        else:
+            self._count_enqueued()
+
+    def _count_enqueued(self):
+        with self._counter_lock:
+            self.enqueued_batches += 1
+
+    def _drop(self, new_rows: pandas.DataFrame):
+        with self._counter_lock:
+            self.dropped_batches += 1
+            self.dropped_rows += new_rows.shape[0]
+
+    def stats(self) -> Dict[str, int]:
+        with self._counter_lock:
+            counters = {
+                "enqueued_batches": self.enqueued_batches,
+                "dropped_batches": self.dropped_batches,
+                "dropped_rows": self.dropped_rows,
+                "drift_evaluations": self.drift_evaluations,
+                "reports_run": self.reports_run,
+                "report_failures": self.report_failures,
+            }
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            **counters,
+            **self.sampler.stats(),
+        }
+
+    def drift(self) -> Optional[Dict[str, Any]]:
+        """Drift of the latest full window, None until the window is full."""
+        if self.aggregator is not None and not self.aggregator.is_leader:
+            return self.aggregator.load_drift()
+        return self.latest_drift
+
+    def request_report(self):
+        """Makes the worker run the full Evidently report once it is idle."""
+        if self.aggregator is not None:
+            self.aggregator.request_report()
+        else:
+            self._report_requested.set()
+
+    def _report_due(self) -> bool:
+        if self.window is None or len(self.window) < self.window_size:
+            return False
+        if self._report_requested.is_set():
+            return True
+        if self.report_schedule == "interval":
+            return (
+                self.report_interval_seconds > 0
+                and time.monotonic() - self.last_report_time
+                >= self.report_interval_seconds
+            )
+        # The first report runs as soon as the window is full
+        if self.new_rows_at_last_report is None:
+            return True
+        rows_since_report = self.new_rows - self.new_rows_at_last_report
+        if self.report_schedule == "hop":
+            return rows_since_report >= self.report_hop_rows
+        return rows_since_report >= self.window_size
+
+    def _run(self):
+        while True:
+            try:
+                # Wakes up regularly so scheduled reports run without traffic
+                batches = [self.queue.get(timeout=1.0)]
+            except queue.Empty:
+                batches = []
+            if request_metrics_enabled():
+                # Set here rather than in iterate, off the request path
+                drift_queue_depth.set(self.queue.qsize() + len(batches))
+            # Everything queued so far goes into the window in one step
+            while True:
+                try:
+                    batches.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if batches:
+                    with self._profile("drift_process"):
+                        self._process(pandas.concat(batches, ignore_index=True))
+                if self.aggregator is not None:
+                    self._aggregate()
+                if self._report_due():
+                    with self._profile("drift_report"):
+                        self._run_report()
+            except Exception:
+                with self._counter_lock:
+                    self.report_failures += 1
+                logger.exception("Drift monitoring failed")
+            finally:
+                # Lets queue.join() wait until the queued rows are processed
+                for _ in batches:
+                    self.queue.task_done()
+
+    def _profile(self, name: str):
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.profile(name)
+
+    def _process(self, new_rows: pandas.DataFrame):
         rows_count = new_rows.shape[0]
 
-        self.current = pandas.concat([self.current, new_rows], ignore_index=True)
+        if self.aggregator is not None:
+            self.aggregator.add(new_rows)
+            return
+        if self.window is None:
+            self.window = CategoricalRingBuffer(new_rows.columns, self.window_size)
+            self.engine = CategoryDriftEngine(
+                self.window, self.reference, stattest=self.stattest
+            )
+        if self.sampler.mode == "reservoir":
+            self._add_to_reservoir(new_rows)
+        else:
+            self.engine.update(*self.window.append(new_rows))
         self.new_rows += rows_count
-        current_size = self.current.shape[0]
-        if current_size > self.window_size:
-            self.current = self.current.iloc[-self.window_size :]
-            self.current.reset_index(drop=True, inplace=True)
+        self._evaluate()
+
+    def _add_to_reservoir(self, new_rows: pandas.DataFrame):
+        rows_count = new_rows.shape[0]
+        n_append = min(rows_count, self._reservoir_appends_left)
+        if n_append:
+            self.engine.update(*self.window.append(new_rows.iloc[:n_append]))
+            self._reservoir_appends_left -= n_append
+        if n_append < rows_count:
+            slots = np.random.randint(0, self.window_size, rows_count - n_append)
+            self.engine.update(*self.window.replace(new_rows.iloc[n_append:], slots))
+
+    def _aggregate(self):
+        from src.drift_aggregation import CategoryCountWindow
+
+        rows_seen = self.sampler.stats()["rows_seen"]
+        self.aggregator.add_seen(rows_seen - self._rows_seen_published)
+        self._rows_seen_published = rows_seen
+        self.aggregator.publish()
+        became_leader, entries = self.aggregator.poll()
+        if became_leader:
+            logger.info("Aggregating drift for all workers")
+            self.window = CategoryCountWindow(self.reference.columns, self.window_size)
+            self.engine = CategoryDriftEngine(
+                self.window, self.reference, stattest=self.stattest
+            )
+            self.new_rows_at_last_report = None
+        elif not self.aggregator.is_leader:
+            self.window = self.engine = None
+            return
+        if self.aggregator.take_report_request():
+            self._report_requested.set()
+        for rows_count, counts, rows_seen in entries:
+            self.engine.update_counts(*self.window.add(rows_count, counts))
+            self.new_rows += rows_count
+            self._aggregated_rows_seen += rows_seen
+            self._aggregated_rows_sampled += rows_count
+        if became_leader:
+            # The previous aggregator may have reported the rows read back
+            self._aggregated_rows_seen = self._aggregated_rows_sampled = 0
+        if entries:
+            self._evaluate()
+            if self.latest_drift is not None:
+                self.aggregator.store_drift(self.latest_drift)
+
+    def _evaluate(self):
+        current_size = len(self.window)
         if current_size < self.window_size:
             logger.info(
                 f"Not enough data for measurement: {current_size} of {self.window_size}."
                 f" Waiting more data"
             )
             return
+        drift = self.engine.evaluate()
+        with self._counter_lock:
+            self.drift_evaluations += 1
+        if self.latest_drift is None or (
+            drift["dataset_drift"] != self.latest_drift["dataset_drift"]
+        ):
+            logger.info(
+                f"Dataset drift: {drift['dataset_drift']}, "
+                f"{drift['number_of_drifted_columns']} of "
+                f"{drift['number_of_columns']} columns drifted"
+            )
+        self.latest_drift = drift
+
+    def _run_report(self):
+        self._report_requested.clear()
+        self.last_report_time = time.monotonic()
+        self.new_rows_at_last_report = self.new_rows
         self.report.timestamp = datetime.datetime.now()
+        if self.aggregator is not None:
+            metadata = self.sampler.start_period(
+                self._aggregated_rows_seen, self._aggregated_rows_sampled
+            )
+            self._aggregated_rows_seen = self._aggregated_rows_sampled = 0
+        else:
+            metadata = self.sampler.start_period()
+        self.report.metadata.update(metadata)
+        self._reservoir_appends_left = self.window_size
         logger.info("Running report")
-        self.report.run(
-            reference_data=self.reference,
-            current_data=self.current,
+        reference_data, current_data = align_categories(
+            self.reference_data, self.window.to_dataframe()
         )
-        self.workspace.add_report(project_id=self.project_id, report=self.report)
+        self.report.run(reference_data=reference_data, current_data=current_data)
+        if self.aggregator is not None and not self.aggregator.is_leader:
+            # Another worker owns the window now and reports it
+            logger.warning("Lost the drift aggregation lock, report not sent")
+            return
+        self.shipper.submit(self.project_id, self.report)
+        with self._counter_lock:
+            self.reports_run += 1
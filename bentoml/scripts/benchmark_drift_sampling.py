@@ -0,0 +1,102 @@
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from data_drift import MonitoringService  # noqa: E402
+from src.drift_sampling import DriftSampler  # noqa: E402
+from src.reference_profile import ReferenceProfile  # noqa: E402
+
+# Replays one-row requests through MonitoringService under each sampling mode
+# and reports the monitoring overhead per request: the time iterate takes on
+# the request path, and the process CPU time including the window thread.
+# Also checks the rows seen and sampled and, for "stratified", that the
+# sampled shares of the stratify column follow the traffic. No reports run.
+WINDOW_SIZE = 1_000
+N_REQUESTS = 20_000
+columns = [
+    "Education",
+    "Marital-Status",
+    "Native_country",
+    "Occupation",
+    "Race",
+    "Relationship",
+    "Sex",
+    "Workclass",
+]
+rng = np.random.default_rng(0)
+
+
+def sample_rows(n_rows: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            column: rng.choice(
+                [f"{column}-{i}" for i in range(10)],
+                n_rows,
+                p=np.linspace(1, 3, 10) / np.linspace(1, 3, 10).sum(),
+            )
+            for column in columns
+        }
+    )
+
+
+def replay(requests: list, sampler: DriftSampler):
+    service = MonitoringService(
+        report_factory=lambda: None,
+        reference=reference,
+        shipper=None,
+        project_id="benchmark",
+        window_size=WINDOW_SIZE,
+        queue_size=N_REQUESTS,
+        sampler=sampler,
+    )
+    iterate_seconds = 0.0
+    cpu_start = time.process_time()
+    for new_rows in requests:
+        start = time.perf_counter()
+        service.iterate(new_rows)
+        iterate_seconds += time.perf_counter() - start
+    service.queue.join()
+    cpu = time.process_time() - cpu_start
+    return service, iterate_seconds, cpu
+
+
+reference = ReferenceProfile.from_dataframe(sample_rows(5_000))
+traffic = sample_rows(N_REQUESTS)
+requests = [traffic.iloc[[i]] for i in range(N_REQUESTS)]
+modes = [
+    ("none", DriftSampler()),
+    ("rate 0.1", DriftSampler("rate", rate=0.1)),
+    ("rate 0.01", DriftSampler("rate", rate=0.01)),
+    ("reservoir", DriftSampler("reservoir", reservoir_size=WINDOW_SIZE)),
+    ("stratified 0.1", DriftSampler("stratified", rate=0.1, stratify_column="Sex")),
+]
+
+print("mode,rows_sampled,iterate_us_per_request,cpu_us_per_request,drifted_columns")
+for name, sampler in modes:
+    service, iterate_seconds, cpu = replay(requests, sampler)
+    stats = service.stats()
+    assert stats["rows_seen"] == N_REQUESTS, stats
+    assert service.new_rows == stats["rows_sampled"], stats
+    if sampler.mode == "stratified":
+        # Each stratum keeps its first row and then every 1 / rate-th one
+        traffic_counts = traffic["Sex"].value_counts()
+        expected = np.ceil(traffic_counts * sampler.rate).astype(int)
+        window = service.window.to_dataframe()["Sex"].value_counts()
+        assert stats["rows_sampled"] == expected.sum(), (stats, expected.sum())
+        # The window holds the newest WINDOW_SIZE of them
+        assert (abs(window / WINDOW_SIZE - expected / expected.sum()) < 0.01).all()
+    elif sampler.mode == "reservoir":
+        # Algorithm R keeps about k (1 + ln(n / k)) rows
+        expected = WINDOW_SIZE * (1 + np.log(N_REQUESTS / WINDOW_SIZE))
+        assert abs(stats["rows_sampled"] / expected - 1) < 0.1, stats
+    elif sampler.mode == "rate":
+        assert abs(stats["rows_sampled"] / N_REQUESTS - sampler.rate) < 0.01, stats
+    drift = service.drift()
+    print(
+        f"{name},{stats['rows_sampled']},"
+        f"{iterate_seconds / N_REQUESTS * 1e6:.1f},{cpu / N_REQUESTS * 1e6:.1f},"
+        f"{'-' if drift is None else drift['number_of_drifted_columns']}"
+    )
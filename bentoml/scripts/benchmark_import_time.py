@@ -0,0 +1,52 @@
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+# Import-time budget per service module, in seconds. Measured in a fresh
+# interpreter from the bentoml directory, so it is the cost every API worker
+# and runner process pays before serving. Exits non-zero if over budget.
+IMPORT_BUDGET_SECONDS = {
+    "service": 6.0,
+    "service_with_drift_detection": 6.0,
+}
+TOP_N = 15
+
+bentoml_dir = Path(__file__).resolve().parents[1]
+
+
+def measure(module: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=bentoml_dir,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise RuntimeError(f"import {module} failed")
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    self_time_by_package = defaultdict(int)
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        package = name.strip().split(".")[0]
+        self_time_by_package[package] += int(self_us)
+        if name.strip() == module:
+            total_us = int(cumulative_us)
+    return total_us / 1e6, self_time_by_package
+
+
+failed = False
+for module, budget in IMPORT_BUDGET_SECONDS.items():
+    total, by_package = measure(module)
+    print(f"{module}: {total:.2f}s (budget {budget:.2f}s)")
+    for package, self_us in sorted(by_package.items(), key=lambda x: -x[1])[:TOP_N]:
+        print(f"  {package:<30} {self_us / 1e6:6.3f}s")
+    if total > budget:
+        print(f"  over budget by {total - budget:.2f}s")
+        failed = True
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,68 @@
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.data_mapper import InputMapper, OneHotEncoder  # noqa: E402
+
+# Synthetic categories shaped like the income features. Column list is built
+# the way training does it: get_dummies(drop_first=True) over the full data.
+categories = {
+    "Sex": ["Female", "Male"],
+    "Native_country": [f"Country-{i}" for i in range(40)],
+    "Race": [f"Race-{i}" for i in range(5)],
+    "Relationship": [f"Relationship-{i}" for i in range(6)],
+    "Marital-Status": [f"Status-{i}" for i in range(7)],
+    "Workclass": [f"Workclass-{i}" for i in range(8)],
+    "Education": [f"Education-{i}" for i in range(16)],
+    "Occupation": [f"Occupation-{i}" for i in range(14)],
+}
+rng = np.random.default_rng(0)
+
+
+def sample_features(n_rows: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {feature: rng.choice(values, n_rows) for feature, values in categories.items()}
+    )
+
+
+all_categories = max(len(values) for values in categories.values())
+col_list = list(
+    pd.get_dummies(
+        pd.DataFrame(
+            {
+                feature: [values[i % len(values)] for i in range(all_categories)]
+                for feature, values in categories.items()
+            }
+        ),
+        drop_first=True,
+    ).columns
+)
+encoder = OneHotEncoder(list(categories), col_list)
+
+print("rows,input,pandas_ms,encoder_ms,speedup")
+for n_rows in [1, 10, 100, 1_000, 100_000, 1_000_000]:
+    data = sample_features(n_rows)
+    data.loc[0, "Native_country"] = "Unseen-Country"
+    repeats = max(1, 2_000 // n_rows)
+    # Parquet read with dictionary columns gives categoricals
+    for kind, frame in [("object", data), ("category", data.astype("category"))]:
+        expected = InputMapper(frame, col_list).generate_pandas_dataframe()
+        actual = InputMapper(frame, col_list, encoder).generate_pandas_dataframe()
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            InputMapper(frame, col_list).generate_pandas_dataframe()
+        pandas_ms = (time.perf_counter() - start) / repeats * 1000
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            InputMapper(frame, col_list, encoder).generate_pandas_dataframe()
+        encoder_ms = (time.perf_counter() - start) / repeats * 1000
+        print(
+            f"{n_rows},{kind},{pandas_ms:.3f},{encoder_ms:.3f},"
+            f"{pandas_ms / encoder_ms:.1f}x"
+        )
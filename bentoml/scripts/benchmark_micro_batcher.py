@@ -0,0 +1,68 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.micro_batcher import MicroBatcher  # noqa: E402
+
+# Latency of /predict-style single-user calls on one event loop, each scored
+# on its own (as /predict_async does) or coalesced by MicroBatcher. The
+# scoring is simulated: a Feast lookup of FEATURE_MS that runs concurrently,
+# then a runner call that handles one call at a time and costs
+# RUNNER_CALL_MS plus RUNNER_ROW_MS per row. Run
+# scripts/load_test_concurrency.py against a served bento for real numbers.
+FEATURE_MS = float(os.getenv("FEATURE_MS", "2"))
+RUNNER_CALL_MS = float(os.getenv("RUNNER_CALL_MS", "4"))
+RUNNER_ROW_MS = float(os.getenv("RUNNER_ROW_MS", "0.05"))
+REQUESTS = int(os.getenv("BENCHMARK_REQUESTS", "2000"))
+concurrency_levels = [1, 8, 32, 128]
+
+
+async def run_level(concurrency: int, batched: bool):
+    runner = asyncio.Lock()
+
+    async def score(user_ids):
+        await asyncio.sleep(FEATURE_MS / 1000)
+        async with runner:
+            await asyncio.sleep((RUNNER_CALL_MS + RUNNER_ROW_MS * len(user_ids)) / 1000)
+        return [0] * len(user_ids)
+
+    batcher = MicroBatcher(score, max_batch_size=32, max_wait_ms=5)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_request(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            if batched:
+                await batcher.submit(i)
+            else:
+                await score([i])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request(i) for i in range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    if batched:
+        batcher._worker.cancel()
+    return elapsed, np.array(latencies), batcher.avg_batch_size
+
+
+async def main():
+    print("mode,concurrency,req_per_second,p50_ms,p99_ms,avg_batch")
+    for mode in ["single", "batched"]:
+        for concurrency in concurrency_levels:
+            elapsed, latencies, avg_batch = await run_level(
+                concurrency, mode == "batched"
+            )
+            print(
+                f"{mode},{concurrency},{REQUESTS / elapsed:.1f},"
+                f"{np.percentile(latencies, 50) * 1000:.1f},"
+                f"{np.percentile(latencies, 99) * 1000:.1f},{avg_batch:.1f}"
+            )
+
+
+asyncio.run(main())
@@ -0,0 +1,71 @@
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.ring_buffer import CategoricalRingBuffer  # noqa: E402
+
+# Throughput of the MonitoringService window update for one-row requests on a
+# full window: the previous concat + iloc + reset_index against the ring buffer.
+# Report runs are excluded, only the per-request window maintenance is timed.
+columns = [
+    "Education",
+    "Marital-Status",
+    "Native_country",
+    "Occupation",
+    "Race",
+    "Relationship",
+    "Sex",
+    "Workclass",
+]
+rng = np.random.default_rng(0)
+
+
+def sample_rows(n_rows: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            column: rng.choice([f"{column}-{i}" for i in range(10)], n_rows)
+            for column in columns
+        }
+    )
+
+
+def concat_window(window: pd.DataFrame, new_rows: pd.DataFrame, window_size: int):
+    window = pd.concat([window, new_rows], ignore_index=True)
+    if window.shape[0] > window_size:
+        window = window.iloc[-window_size:]
+        window.reset_index(drop=True, inplace=True)
+    return window
+
+
+def rows_per_second(update, requests: list, time_budget: float = 2.0) -> float:
+    start = time.perf_counter()
+    done = 0
+    for new_rows in requests:
+        update(new_rows)
+        done += 1
+        if time.perf_counter() - start > time_budget:
+            break
+    return done / (time.perf_counter() - start)
+
+
+print("window_size,concat_rows_per_s,ring_buffer_rows_per_s,speedup")
+for window_size in [1_000, 10_000, 100_000, 1_000_000]:
+    initial = sample_rows(window_size)
+    requests = [sample_rows(1) for _ in range(2_000)]
+
+    state = {"window": initial}
+
+    def concat_update(new_rows):
+        state["window"] = concat_window(state["window"], new_rows, window_size)
+
+    ring_buffer = CategoricalRingBuffer(columns, window_size)
+    ring_buffer.append(initial)
+
+    concat_rate = rows_per_second(concat_update, requests)
+    ring_rate = rows_per_second(ring_buffer.append, requests)
+    print(
+        f"{window_size},{concat_rate:.0f},{ring_rate:.0f},{ring_rate / concat_rate:.1f}x"
+    )
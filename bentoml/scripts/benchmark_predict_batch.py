@@ -0,0 +1,33 @@
+import pandas as pd
+import requests
+import json
+import os
+import time
+
+# BENTO_HOST is the service base url, e.g. http://localhost:3000
+mock_request_data = pd.read_csv("mock_request_data.csv")
+bentoml_host = os.getenv("BENTO_HOST", "http://localhost:3000")
+batch_sizes = [1, 8, 32, 64, 128, 256]
+repeats = int(os.getenv("BENCHMARK_REPEATS", "5"))
+
+user_ids = mock_request_data["user_id"].tolist()
+session = requests.Session()
+
+print("batch_size,requests,users,seconds,users_per_second")
+for batch_size in batch_sizes:
+    # Cycle through the mock users so every batch size scores full batches
+    batch = [user_ids[i % len(user_ids)] for i in range(batch_size)]
+    scored_users = 0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        response = session.post(
+            f"{bentoml_host}/predict_batch",
+            data=json.dumps({"user_ids": batch}),
+        )
+        response.raise_for_status()
+        scored_users += len(response.json()["predictions"])
+    elapsed = time.perf_counter() - start
+    print(
+        f"{batch_size},{repeats},{scored_users},{elapsed:.3f},"
+        f"{scored_users / elapsed:.1f}"
+    )
@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import numpy as np
+import requests
+import json
+import os
+import time
+
+# Run once with MICRO_BATCH_MAX_SIZE=1 (no coalescing) and once with the
+# micro-batcher enabled to compare per-request latency under the same load.
+mock_request_data = pd.read_csv("mock_request_data.csv")
+bentoml_endpoint = os.getenv("BENTO_ENDPOINT", "http://localhost:3000/predict")
+concurrency = int(os.getenv("BENCHMARK_CONCURRENCY", "32"))
+total_requests = int(os.getenv("BENCHMARK_REQUESTS", "2000"))
+
+user_ids = mock_request_data["user_id"].tolist()
+session = requests.Session()
+session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+
+def timed_request(i: int) -> float:
+    start = time.perf_counter()
+    response = session.post(
+        bentoml_endpoint,
+        data=json.dumps({"user_id": user_ids[i % len(user_ids)]}),
+    )
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+start = time.perf_counter()
+with ThreadPoolExecutor(max_workers=concurrency) as executor:
+    latencies = np.array(list(executor.map(timed_request, range(total_requests))))
+elapsed = time.perf_counter() - start
+
+print(f"concurrency={concurrency} requests={total_requests}")
+print(f"throughput={total_requests / elapsed:.1f} req/s")
+print(f"p50={np.percentile(latencies, 50) * 1000:.1f} ms")
+print(f"p99={np.percentile(latencies, 99) * 1000:.1f} ms")
@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.reference_dataset import (  # noqa: E402
+    DATASET_FILE_NAME,
+    convert_reference_dataset,
+    read_reference_dataset,
+)
+from src.reference_profile import ReferenceProfile  # noqa: E402
+
+# Compares a CSV reference dataset read with pd.read_csv, as the drift
+# workers did, with the same data converted to Parquet and read with
+# read_reference_dataset: file size, read time and the resident memory a
+# fresh process gains by reading it (Linux). Also checks that both give the
+# same profile.
+N_ROWS = 500_000
+columns = [
+    "Education",
+    "Marital-Status",
+    "Native_country",
+    "Occupation",
+    "Race",
+    "Relationship",
+    "Sex",
+    "Workclass",
+]
+
+
+def rss_growth_mb(reader: str, path: str) -> float:
+    """Resident memory a new process gains by reading path and keeping it."""
+    code = (
+        f"import sys; sys.path.append({str(Path(__file__).parents[1])!r});"
+        "import pandas as pd, pyarrow.parquet;"
+        "from src.reference_dataset import read_reference_dataset;"
+        "rss = lambda: int(open('/proc/self/statm').read().split()[1]);"
+        "before = rss();"
+        f"data = {reader}({path!r});"
+        "print((rss() - before) * __import__('os').sysconf('SC_PAGE_SIZE'))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return int(output.stdout) / 2**20
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(
+        {
+            column: rng.choice([f"{column}-{i}" for i in range(15)] + [None], N_ROWS)
+            for column in columns
+        }
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "reference.csv")
+        data.to_csv(csv_path, index=False)
+        parquet_path = convert_reference_dataset(
+            csv_path, os.path.join(tmp_dir, DATASET_FILE_NAME)
+        )
+        csv_data, csv_seconds = timed(pd.read_csv, csv_path)
+        parquet_data, parquet_seconds = timed(read_reference_dataset, parquet_path)
+        csv_profile = ReferenceProfile.from_dataframe(csv_data)
+        parquet_profile = ReferenceProfile.from_dataframe(parquet_data)
+        for column in columns:
+            assert csv_profile.value_counts(column) == parquet_profile.value_counts(
+                column
+            ), column
+        _, rebuild_seconds = timed(parquet_profile.to_dataframe)
+
+        print("format,file_mb,read_s,frame_mb,rss_growth_mb")
+        for name, path, frame, seconds, reader in [
+            ("csv", csv_path, csv_data, csv_seconds, "pd.read_csv"),
+            (
+                "parquet",
+                parquet_path,
+                parquet_data,
+                parquet_seconds,
+                "read_reference_dataset",
+            ),
+        ]:
+            print(
+                f"{name},{os.path.getsize(path) / 2**20:.1f},{seconds:.3f},"
+                f"{frame.memory_usage(deep=True).sum() / 2**20:.1f},"
+                f"{rss_growth_mb(reader, path):.1f}"
+            )
+        print(f"profile to_dataframe: {rebuild_seconds:.3f}s")
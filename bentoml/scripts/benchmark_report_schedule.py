@@ -0,0 +1,91 @@
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from data_drift import MonitoringService  # noqa: E402
+from evidently_reports import build_data_drift_report  # noqa: E402
+from src.reference_profile import ReferenceProfile  # noqa: E402
+
+# Replays one-row requests through MonitoringService under each report
+# schedule and checks the number of reports it ran. The process CPU time is
+# compared with a report per request, which is what the service did before
+# report scheduling ("hop" every row). Reports are built but not uploaded.
+# Needs requirements_with_drift.txt.
+WINDOW_SIZE = 100
+N_REQUESTS = 2_000
+columns = [
+    "Education",
+    "Marital-Status",
+    "Native_country",
+    "Occupation",
+    "Race",
+    "Relationship",
+    "Sex",
+    "Workclass",
+]
+rng = np.random.default_rng(0)
+
+
+class DiscardingShipper:
+    def submit(self, project_id, report):
+        return True
+
+
+def sample_rows(n_rows: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            column: rng.choice([f"{column}-{i}" for i in range(10)], n_rows)
+            for column in columns
+        }
+    )
+
+
+def replay(requests: list, **schedule):
+    service = MonitoringService(
+        report_factory=build_data_drift_report,
+        reference=reference,
+        shipper=DiscardingShipper(),
+        project_id="benchmark",
+        window_size=WINDOW_SIZE,
+        overflow_policy="block",
+        **schedule,
+    )
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for new_rows in requests:
+        service.iterate(new_rows)
+        # One request at a time, as the report used to run inside iterate
+        service.queue.join()
+    cpu = time.process_time() - cpu_start
+    return service.reports_run, cpu, time.perf_counter() - wall_start
+
+
+reference = ReferenceProfile.from_dataframe(sample_rows(1_000))
+requests = [sample_rows(1) for _ in range(N_REQUESTS)]
+rows_after_full = N_REQUESTS - WINDOW_SIZE
+schedules = [
+    ("every request", {"report_schedule": "hop", "report_hop_rows": 1}),
+    ("hop 100 rows", {"report_schedule": "hop", "report_hop_rows": 100}),
+    ("tumbling", {"report_schedule": "tumbling"}),
+    ("interval 1s", {"report_schedule": "interval", "report_interval_seconds": 1}),
+]
+
+print("schedule,reports,cpu_s,cpu_saved")
+baseline_cpu = None
+for name, schedule in schedules:
+    reports, cpu, wall = replay(requests, **schedule)
+    if schedule["report_schedule"] == "hop":
+        expected = 1 + rows_after_full // schedule["report_hop_rows"]
+        assert reports == expected, (name, reports, expected)
+    elif schedule["report_schedule"] == "tumbling":
+        expected = 1 + rows_after_full // WINDOW_SIZE
+        assert reports == expected, (name, reports, expected)
+    else:
+        assert reports <= 1 + wall / schedule["report_interval_seconds"], (
+            name,
+            reports,
+        )
+    baseline_cpu = baseline_cpu or cpu
+    print(f"{name},{reports},{cpu:.2f},{1 - cpu / baseline_cpu:.0%}")
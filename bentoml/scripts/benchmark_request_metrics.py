@@ -0,0 +1,39 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.metrics import (  # noqa: E402
+    count_request,
+    enable_request_metrics,
+    observe_batch_size,
+    stage_timer,
+)
+
+# Measures what the request metrics add to one request: the four stage
+# timers, the batch size and the request counter of /predict, with
+# REQUEST_METRICS on and off. Run it inside the service image, with PROMETHEUS_MULTIPROC_DIR set to
+# an empty directory to measure the multiprocess mode the API workers use.
+N_REQUESTS = 100_000
+
+
+def request():
+    count_request("predict")
+    observe_batch_size("predict", 1)
+    for stage in ("features", "monitoring", "encode", "runner"):
+        with stage_timer("predict", stage):
+            pass
+
+
+def per_request_us() -> float:
+    start = time.perf_counter()
+    for _ in range(N_REQUESTS):
+        request()
+    return (time.perf_counter() - start) / N_REQUESTS * 1e6
+
+
+print("request_metrics,us_per_request")
+for enabled in (True, False):
+    enable_request_metrics(enabled)
+    per_request_us()  # Creates the labelled children
+    print(f"{'on' if enabled else 'off'},{per_request_us():.2f}")
@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import redis
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from data_drift import MonitoringService  # noqa: E402
+from src.drift_aggregation import RedisDriftAggregator  # noqa: E402
+from src.drift_stats import CategoryDriftEngine  # noqa: E402
+from src.reference_profile import ReferenceProfile  # noqa: E402
+from src.ring_buffer import CategoricalRingBuffer  # noqa: E402
+
+# Runs several worker processes with MonitoringService in Redis aggregation
+# mode against a local Redis, e.g. `redis-server --port 6390` and
+# REDIS_URL=redis://localhost:6390/0. Checks that exactly one worker
+# aggregates, and that the shared drift result equals a single window fed
+# with every worker's rows.
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/15")
+KEY_PREFIX = f"drift-check-{os.getpid()}"
+N_WORKERS = 4
+ROWS_PER_WORKER = 500
+columns = ["Education", "Race", "Sex", "Workclass"]
+
+
+def sample_rows(seed: int, n_rows: int, shift: float = 0.0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    weights = np.linspace(1, 1 + shift, 6)
+    return pd.DataFrame(
+        {
+            column: rng.choice(
+                [f"{column}-{i}" for i in range(6)] + [None],
+                n_rows,
+                p=np.append(weights / weights.sum() * 0.95, 0.05),
+            )
+            for column in columns
+        }
+    )
+
+
+reference = ReferenceProfile.from_dataframe(sample_rows(0, 3_000))
+
+
+def new_service() -> MonitoringService:
+    aggregator = RedisDriftAggregator(
+        redis.Redis.from_url(REDIS_URL),
+        key_prefix=KEY_PREFIX,
+        window_size=N_WORKERS * ROWS_PER_WORKER,
+        publish_interval_seconds=0.2,
+        lock_timeout_seconds=2,
+    )
+    return MonitoringService(
+        report_factory=lambda: None,
+        reference=reference,
+        shipper=None,
+        project_id="check",
+        window_size=N_WORKERS * ROWS_PER_WORKER,
+        aggregator=aggregator,
+    )
+
+
+def worker(worker_index: int, results):
+    service = new_service()
+    rows = sample_rows(worker_index + 1, ROWS_PER_WORKER, shift=1.0)
+    start = 0
+    while start < len(rows):
+        size = 1 + start % 5
+        service.iterate(rows.iloc[start : start + size])
+        start += size
+        time.sleep(0.001)
+    service.queue.join()
+    # Outlive the publish interval and a few aggregation rounds
+    time.sleep(4)
+    results.put((worker_index, service.aggregator.is_leader, service.drift_evaluations))
+    time.sleep(1)
+
+
+if __name__ == "__main__":
+    client = redis.Redis.from_url(REDIS_URL)
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(i, results))
+        for i in range(N_WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join()
+
+    leaders = [outcome for outcome in outcomes if outcome[1]]
+    assert len(leaders) == 1, outcomes
+    assert all(evaluations == 0 for _, leader, evaluations in outcomes if not leader)
+
+    window = CategoricalRingBuffer(columns, N_WORKERS * ROWS_PER_WORKER)
+    engine = CategoryDriftEngine(window, reference)
+    for i in range(N_WORKERS):
+        engine.update(*window.append(sample_rows(i + 1, ROWS_PER_WORKER, shift=1.0)))
+    expected = engine.evaluate()
+
+    aggregator = RedisDriftAggregator(client, KEY_PREFIX, window_size=1)
+    shared = aggregator.load_drift()
+    assert shared["current_rows"] == expected["current_rows"], shared
+    for column in columns:
+        assert np.isclose(
+            shared["columns"][column]["drift_score"],
+            expected["columns"][column]["drift_score"],
+        ), column
+    print(f"worker outcomes (index, leader, evaluations): {outcomes}")
+    print(
+        "shared drift matches a single window:",
+        shared["number_of_drifted_columns"],
+        "of",
+        shared["number_of_columns"],
+        "columns drifted",
+    )
+    client.delete(*client.keys(f"{KEY_PREFIX}:*"))
@@ -0,0 +1,105 @@
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from evidently.metrics import ColumnDriftMetric
+from evidently.report import Report
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.drift_stats import CategoryDriftEngine  # noqa: E402
+from src.reference_dataset import align_categories  # noqa: E402
+from src.reference_profile import ReferenceProfile  # noqa: E402
+from src.ring_buffer import CategoricalRingBuffer  # noqa: E402
+
+# Compares the incremental drift engine with Evidently's ColumnDriftMetric on
+# synthetic categorical data, for small (Z-test / chi-square) and large
+# (Jensen-Shannon) reference datasets and with PSI, and Evidently's results on the full
+# reference with those on the frame rebuilt from its ReferenceProfile. The
+# default test depends on the categories of both datasets ("binary" gains a
+# third category in the shifted windows) and on the reference rows left
+# after dropping missing values (with 1100 rows "sparse" has fewer than
+# 1000). Needs requirements_with_drift.txt.
+rng = np.random.default_rng(0)
+WINDOW_SIZE = 500
+# Evidently's stattest_name for each engine stattest
+STATTEST_NAMES = {
+    "z": "Z-test p_value",
+    "chisquare": "chi-square p_value",
+    "jensenshannon": "Jensen-Shannon distance",
+    "psi": "PSI",
+}
+
+
+def sample(n_rows: int, shift: float) -> pd.DataFrame:
+    categories = list("abcdef")
+    weights = np.linspace(1, 1 + shift * 5, len(categories))
+    return pd.DataFrame(
+        {
+            "binary": rng.choice(
+                ["yes", "no", "maybe"],
+                n_rows,
+                p=[0.5 + shift / 4, 0.5 - shift / 2, shift / 4],
+            ),
+            "multi": rng.choice(categories, n_rows, p=weights / weights.sum()),
+            "sparse": rng.choice(categories + [None], n_rows),
+        }
+    )
+
+
+def column_drift_report(columns, stattest) -> Report:
+    return Report(
+        metrics=[ColumnDriftMetric(column_name=c, stattest=stattest) for c in columns]
+    )
+
+
+mismatches = 0
+# Evidently's default choice of test, then PSI as DRIFT_STATTEST=psi would
+for stattest in (None, "psi"):
+    for reference_rows in (800, 1100, 5000):
+        for shift in (0.0, 0.3, 1.0):
+            reference = sample(reference_rows, 0.0)
+            window = CategoricalRingBuffer(reference.columns, WINDOW_SIZE)
+            profile = ReferenceProfile.from_dataframe(reference)
+            engine = CategoryDriftEngine(window, profile, stattest=stattest)
+            # Several appends so rows are evicted before the comparison
+            for _ in range(4):
+                engine.update(*window.append(sample(WINDOW_SIZE // 2, shift)))
+            drift = engine.evaluate()
+
+            # Evidently gets the frames the way MonitoringService passes them
+            report = column_drift_report(reference.columns, stattest)
+            reference_data, current_data = align_categories(
+                reference, window.to_dataframe()
+            )
+            report.run(reference_data=reference_data, current_data=current_data)
+            # The frame rebuilt from the profile must give Evidently the same result
+            profile_report = column_drift_report(reference.columns, stattest)
+            reference_data, current_data = align_categories(
+                profile.to_dataframe(), window.to_dataframe()
+            )
+            profile_report.run(reference_data=reference_data, current_data=current_data)
+            for metric, profile_metric in zip(
+                report.as_dict()["metrics"], profile_report.as_dict()["metrics"]
+            ):
+                expected = metric["result"]
+                actual = drift["columns"][expected["column_name"]]
+                match = (
+                    expected["stattest_name"] == STATTEST_NAMES[actual["stattest"]]
+                    and expected["drift_detected"] == actual["drift_detected"]
+                    and np.isclose(expected["drift_score"], actual["drift_score"])
+                    and np.isclose(
+                        expected["drift_score"], profile_metric["result"]["drift_score"]
+                    )
+                )
+                mismatches += not match
+                print(
+                    reference_rows,
+                    shift,
+                    expected["column_name"],
+                    expected["stattest_name"],
+                    expected["drift_score"],
+                    actual["stattest"],
+                    actual["drift_score"],
+                    "ok" if match else "MISMATCH",
+                )
+sys.exit(1 if mismatches else 0)
@@ -0,0 +1,49 @@
+import os
+import sys
+from pathlib import Path
+import pandas as pd
+from dotenv import dotenv_values
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.constants import FEATURE_LIST  # noqa: E402
+from src.feature_store import DataStore, OnlineFeatureReader  # noqa: E402
+from src.cache import LRUCache  # noqa: E402
+
+# Compares the direct Redis reader with the Feast SDK for the mock users plus
+# one unknown user. Run from the bentoml directory with the port-forwards from
+# the Readme in place.
+config = dotenv_values(".env")
+os.environ["FEAST_S3_ENDPOINT_URL"] = config["FEAST_S3_ENDPOINT_URL"]
+os.environ["AWS_ENDPOINT_URL"] = config["FEAST_S3_ENDPOINT_URL"]
+data_store = DataStore(
+    config["MINIO_HOST"],
+    config["MINIO_ACCESS_KEY"],
+    config["MINIO_SECRET_KEY"],
+    config["FEATURE_REGISTRY_BUCKET_NAME"],
+    config["FEATURE_REGSITRY_FILE_NAME"],
+    config["FEAST_S3_ENDPOINT_URL"],
+    config["FEAST_REDIS_HOST"],
+    config["FEAST_REDIS_PASSWORD"],
+)
+store = data_store.init_feature_store()
+reader = OnlineFeatureReader(
+    store,
+    FEATURE_LIST,
+    LRUCache(max_size=0),
+    fast_reader=data_store.init_redis_reader(store, FEATURE_LIST),
+)
+
+user_ids = pd.read_csv("scripts/mock_request_data.csv")["user_id"].tolist()
+user_ids.append("unknown-user")
+expected = reader.fetch_feast(user_ids)
+actual = reader.fast_reader.fetch(user_ids)
+
+mismatches = [
+    (user_id, expected[user_id], actual[user_id])
+    for user_id in user_ids
+    if [None if pd.isna(v) else v for v in expected[user_id]] != list(actual[user_id])
+]
+for mismatch in mismatches:
+    print("mismatch", *mismatch)
+print(f"{len(user_ids) - len(mismatches)} of {len(user_ids)} users match")
+sys.exit(1 if mismatches else 0)
@@ -0,0 +1,152 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.micro_batcher import MicroBatcher  # noqa: E402
+from src.request_profiler import RequestProfiler  # noqa: E402
+
+# Checks RequestProfiler: sampled requests end up in the pstats files and
+# unsampled ones do not, a window profiles every request and is flushed when
+# it closes, concurrent requests are profiled one at a time, micro-batched
+# /predict calls are profiled like score_users_async does it, and an idle
+# profiler costs next to nothing per request.
+N_REQUESTS = 2_000
+
+
+def sampled_work():
+    return sum(i * i for i in range(200))
+
+
+def unsampled_work():
+    return sum(i * i for i in range(200))
+
+
+def get_features(user_ids):
+    return [sum(i * i for i in range(200)) for _ in user_ids]
+
+
+def encode(features):
+    return [feature + 1 for feature in features]
+
+
+def other_request_work():
+    return sum(i * i for i in range(200))
+
+
+def call_count(stats: pstats.Stats, function_name: str) -> int:
+    return sum(
+        calls[1] for (_, _, name), calls in stats.stats.items() if name == function_name
+    )
+
+
+def load(paths) -> pstats.Stats:
+    return pstats.Stats(*[str(path) for path in paths])
+
+
+with tempfile.TemporaryDirectory() as output_dir:
+    # Sampling: every profiled request ran sampled_work, nothing else did
+    profiler = RequestProfiler(output_dir, sample_rate=0.1)
+    for _ in range(N_REQUESTS):
+        with profiler.profile("sampled"):
+            sampled_work()
+        unsampled_work()
+    profiler.flush()
+    files = list(Path(output_dir).glob("sampled-*.pstats"))
+    assert len(files) == 1, files
+    stats = load(files)
+    assert call_count(stats, "sampled_work") == profiler.profiled
+    assert call_count(stats, "unsampled_work") == 0
+    assert 0.05 < profiler.profiled / N_REQUESTS < 0.15, profiler.stats()
+    print("sampling ok", profiler.stats())
+
+    # A window profiles every request and flushes when it closes
+    profiler = RequestProfiler(output_dir, sample_rate=0.0)
+    with profiler.profile("idle"):
+        sampled_work()
+    assert profiler.profiled == 0
+    profiler.start_window(0.5)
+    for _ in range(100):
+        with profiler.profile("window"):
+            sampled_work()
+    assert profiler.profiled == 100
+    time.sleep(1.0)
+    files = list(Path(output_dir).glob("window-*.pstats"))
+    assert len(files) == 1 and not profiler.window_open(), files
+    assert call_count(load(files), "sampled_work") == 100
+    print("window ok", profiler.stats())
+
+    # Concurrent requests: the ones arriving while another request is being
+    # profiled run unprofiled
+    profiler = RequestProfiler(output_dir, sample_rate=1.0)
+    barrier = threading.Barrier(8)
+
+    def request():
+        barrier.wait()
+        with profiler.profile("concurrent"):
+            time.sleep(0.2)
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert profiler.profiled == 1, profiler.stats()
+    print("one request at a time ok")
+
+    # Micro-batched /predict: the batcher calls a coroutine shaped like
+    # score_users_async, whose feature read runs in an executor thread and
+    # whose encoding runs on the event loop. Both land in the profile, the
+    # work of other requests served during its awaits does not.
+    profiler = RequestProfiler(output_dir, sample_rate=1.0)
+    executor = ThreadPoolExecutor(max_workers=2)
+
+    async def score_users_async(user_ids):
+        loop = asyncio.get_running_loop()
+        with profiler.profile_async("score_users_async") as profile:
+            features = await loop.run_in_executor(
+                executor, profile.wrap(get_features), user_ids
+            )
+            with profile.section():
+                encoded = encode(features)
+            await asyncio.sleep(0.01)  # The runner call
+            return encoded
+
+    async def other_requests():
+        for _ in range(20):
+            other_request_work()
+            await asyncio.sleep(0.001)
+
+    async def predict_calls():
+        batcher = MicroBatcher(score_users_async, max_batch_size=16, max_wait_ms=5)
+        results = await asyncio.gather(
+            *[batcher.submit(f"user_{i}") for i in range(64)], other_requests()
+        )
+        return results
+
+    asyncio.run(predict_calls())
+    executor.shutdown()
+    profiler.flush()
+    files = list(Path(output_dir).glob("score_users_async-*.pstats"))
+    assert len(files) == 1 and profiler.profiled >= 1, profiler.stats()
+    stats = load(files)
+    assert call_count(stats, "get_features") == profiler.profiled, profiler.stats()
+    assert call_count(stats, "encode") == profiler.profiled, profiler.stats()
+    if sys.version_info < (3, 12):
+        # On 3.12+ a section in the executor also records the event loop
+        assert call_count(stats, "other_request_work") == 0
+    print("micro-batched predict ok", profiler.stats())
+
+    # Overhead of an idle profiler per request
+    profiler = RequestProfiler(output_dir, sample_rate=0.0)
+    start = time.perf_counter()
+    for _ in range(100_000):
+        with profiler.profile("idle"):
+            pass
+    idle_us = (time.perf_counter() - start) / 100_000 * 1e6
+    print(f"idle overhead {idle_us:.2f}us per request")
@@ -0,0 +1,25 @@
+import filecmp
+import sys
+from pathlib import Path
+
+# Modules the pipeline images need but cannot import from bentoml/src, since
+# each image is built from the kubeflow-pipeline directory alone. The copies
+# must stay identical; run this after changing either side.
+ROOT = Path(__file__).resolve().parents[2]
+PIPELINE_SRC = ROOT / "evidently" / "kubeflow-pipeline" / "src"
+SHARED = [
+    ("bentoml/src/one_hot_encoder.py", PIPELINE_SRC / "run_inference"),
+    ("bentoml/src/reference_dataset.py", PIPELINE_SRC / "detect_drift"),
+    ("bentoml/src/reference_profile.py", PIPELINE_SRC / "detect_drift"),
+]
+
+different = [
+    source
+    for source, pipeline_dir in SHARED
+    if not filecmp.cmp(ROOT / source, pipeline_dir / Path(source).name, shallow=False)
+]
+for source in different:
+    print(f"{source} differs from its pipeline copy")
+if different:
+    sys.exit(1)
+print(f"{len(SHARED)} shared modules identical")
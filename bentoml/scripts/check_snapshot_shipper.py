@@ -0,0 +1,128 @@
+import json
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import pandas as pd
+from evidently.metrics import ColumnDriftMetric
+from evidently.report import Report
+from evidently.ui.remote import RemoteWorkspace
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.snapshot_shipper import SnapshotShipper  # noqa: E402
+
+# Runs SnapshotShipper against a local HTTP server standing in for the
+# Evidently UI service: normal uploads, an outage with retries, a slow
+# service, a full spool and a restart with spooled snapshots. Needs
+# requirements_with_drift.txt.
+PROJECT_ID = "0193ca03-1859-79c5-b54c-5a09e3a74bc8"
+
+
+class StubEvidently(BaseHTTPRequestHandler):
+    snapshots = []
+    failures_left = 0
+    delay_seconds = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._reply(200, {"application": "Evidently UI", "version": "0.5.0"})
+        else:
+            self._reply(404, {})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(StubEvidently.delay_seconds)
+        if StubEvidently.failures_left > 0:
+            StubEvidently.failures_left -= 1
+            self._reply(503, {"detail": "unavailable"})
+        elif self.path == f"/api/projects/{PROJECT_ID}/snapshots":
+            StubEvidently.snapshots.append(json.loads(body))
+            self._reply(200, {})
+        else:
+            self._reply(404, {})
+
+
+def build_report() -> Report:
+    data = pd.DataFrame({"Sex": ["Male", "Female"] * 50})
+    report = Report(metrics=[ColumnDriftMetric(column_name="Sex")])
+    report.run(reference_data=data, current_data=data)
+    return report
+
+
+def wait_for(condition, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.05)
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), StubEvidently)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url = f"http://127.0.0.1:{server.server_address[1]}"
+report = build_report()
+
+with tempfile.TemporaryDirectory() as spool_dir:
+
+    def new_shipper(**kwargs) -> SnapshotShipper:
+        return SnapshotShipper(
+            lambda: RemoteWorkspace(url),
+            spool_dir,
+            poll_interval_seconds=0.1,
+            **kwargs,
+        )
+
+    # Uploads in batches until the spool is empty
+    shipper = new_shipper(batch_size=2)
+    for _ in range(5):
+        assert shipper.submit(PROJECT_ID, report)
+    wait_for(lambda: len(StubEvidently.snapshots) == 5 and not shipper.spooled())
+    print("upload ok", shipper.stats())
+
+    # Retries with backoff through an outage, nothing is lost
+    StubEvidently.failures_left = 3
+    shipper.submit(PROJECT_ID, report)
+    wait_for(lambda: len(StubEvidently.snapshots) == 6)
+    assert shipper.upload_failures == 3 and shipper.consecutive_failures == 0
+    print("retry ok", shipper.stats())
+
+    # A slow service does not slow down submit
+    StubEvidently.delay_seconds = 1.0
+    start = time.perf_counter()
+    shipper.submit(PROJECT_ID, report)
+    submit_seconds = time.perf_counter() - start
+    assert submit_seconds < 0.5, submit_seconds
+    wait_for(lambda: len(StubEvidently.snapshots) == 7)
+    assert shipper.last_upload_seconds >= 1.0
+    StubEvidently.delay_seconds = 0.0
+    print(f"slow service ok, submit took {submit_seconds * 1000:.1f}ms")
+    shipper.close()
+
+    # The spool is bounded while the service is down, and a restarted
+    # shipper uploads what was spooled
+    StubEvidently.failures_left = 10**6
+    shipper = new_shipper(max_spool_files=3, max_backoff_seconds=0.5)
+    results = [shipper.submit(PROJECT_ID, report) for _ in range(5)]
+    assert results.count(False) == 2 and shipper.dropped == 2, results
+    shipper.close()
+    StubEvidently.failures_left = 0
+    shipper = new_shipper()
+    wait_for(lambda: len(StubEvidently.snapshots) == 10 and not shipper.spooled())
+    print("bounded spool and restart ok", shipper.stats())
+    shipper.close()
+
+server.shutdown()
+print("all checks passed")
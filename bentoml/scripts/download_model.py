@@ -8,6 +8,9 @@ os.environ["AWS_SECRET_ACCESS_KEY"] = "minio123"
 os.environ["AWS_ENDPOINT_URL"] = "http://localhost:9000"
 model_name = "random-forest-classifier"
 model_stage = "Production"
+# batchable lets the runner merge concurrent predict calls along the row axis
 bentoml.mlflow.import_model(
-    "random-forest-classifier", model_uri=f"models:/{model_name}/{model_stage}"
+    "random-forest-classifier",
+    model_uri=f"models:/{model_name}/{model_stage}",
+    signatures={"predict": {"batchable": True, "batch_dim": 0}},
 )
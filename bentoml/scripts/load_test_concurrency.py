@@ -0,0 +1,54 @@
+import asyncio
+import os
+import time
+import aiohttp
+import numpy as np
+import pandas as pd
+
+# Start the service with a single API worker (bentoml serve --api-workers 1) to
+# see how many requests one worker keeps in flight on each route.
+mock_request_data = pd.read_csv("mock_request_data.csv")
+bentoml_host = os.getenv("BENTO_HOST", "http://localhost:3000")
+routes = os.getenv("LOAD_TEST_ROUTES", "/predict,/predict_async").split(",")
+concurrency_levels = [1, 8, 32, 128, 512]
+requests_per_level = int(os.getenv("LOAD_TEST_REQUESTS", "2000"))
+
+user_ids = mock_request_data["user_id"].tolist()
+
+
+async def run_level(session: aiohttp.ClientSession, url: str, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_request(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            async with session.post(
+                url, json={"user_id": user_ids[i % len(user_ids)]}
+            ) as response:
+                response.raise_for_status()
+                await response.read()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request(i) for i in range(requests_per_level)))
+    return time.perf_counter() - start, np.array(latencies)
+
+
+async def main():
+    connector = aiohttp.TCPConnector(limit=max(concurrency_levels))
+    async with aiohttp.ClientSession(connector=connector) as session:
+        print("route,concurrency,req_per_second,p50_ms,p99_ms")
+        for route in routes:
+            for concurrency in concurrency_levels:
+                elapsed, latencies = await run_level(
+                    session, f"{bentoml_host}{route}", concurrency
+                )
+                print(
+                    f"{route},{concurrency},{requests_per_level / elapsed:.1f},"
+                    f"{np.percentile(latencies, 50) * 1000:.1f},"
+                    f"{np.percentile(latencies, 99) * 1000:.1f}"
+                )
+
+
+asyncio.run(main())
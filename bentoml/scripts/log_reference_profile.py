@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+import mlflow
+from minio import Minio
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.constants import FEATURE_LIST  # noqa: E402
+from src.reference_dataset import read_reference_dataset  # noqa: E402
+from src.reference_profile import PROFILE_FILE_NAME, ReferenceProfile  # noqa: E402
+
+# Profiles the reference dataset of a model run and logs the profile to the
+# run, once per trained model (e.g. right after registering it, next to
+# download_model.py). The drift service and the pipeline's detect_drift step
+# only download it; neither writes to the model run.
+
+
+def find_reference_dataset(run_id: str, dataset_name: str) -> str:
+    """Returns the bucket/object URI the run logged dataset_name from."""
+    for dataset_input in mlflow.get_run(run_id).inputs.dataset_inputs:
+        for tag in dataset_input.tags:
+            if tag.value == dataset_name:
+                return json.loads(dataset_input.dataset.source)["uri"]
+    raise ValueError(f"Reference dataset {dataset_name} not found in run {run_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mlflow_host", default="http://localhost:5000")
+    parser.add_argument("--minio_host", default="localhost:9000")
+    parser.add_argument("--access_key", default="minio")
+    parser.add_argument("--secret_key", default="minio123")
+    parser.add_argument("--model_name", default="random-forest-classifier")
+    parser.add_argument("--model_stage", default="Production")
+    parser.add_argument("--reference_dataset_name", default="reference_features")
+    args = parser.parse_args()
+
+    os.environ["AWS_ACCESS_KEY_ID"] = args.access_key
+    os.environ["AWS_SECRET_ACCESS_KEY"] = args.secret_key
+    os.environ["AWS_ENDPOINT_URL"] = f"http://{args.minio_host}"
+    mlflow.set_tracking_uri(args.mlflow_host)
+    client = mlflow.MlflowClient(args.mlflow_host)
+    run_id = next(
+        (
+            model.run_id
+            for model in client.search_model_versions(f"name='{args.model_name}'")
+            if model.current_stage == args.model_stage
+        ),
+        None,
+    )
+    if run_id is None:
+        raise ValueError(f"No {args.model_name} model in stage {args.model_stage}")
+
+    source = find_reference_dataset(run_id, args.reference_dataset_name)
+    bucket_name, object_name = source.split("/", 1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dataset_path = os.path.join(tmp_dir, object_name.split("/")[-1])
+        Minio(
+            args.minio_host,
+            access_key=args.access_key,
+            secret_key=args.secret_key,
+            secure=False,
+        ).fget_object(bucket_name, object_name, dataset_path)
+        reference_df = read_reference_dataset(
+            dataset_path, columns=[feature.split(":")[1] for feature in FEATURE_LIST]
+        )
+        profile_path = os.path.join(tmp_dir, PROFILE_FILE_NAME)
+        ReferenceProfile.from_dataframe(reference_df).save(profile_path)
+        client.log_artifact(run_id, profile_path)
+    print(f"Logged {PROFILE_FILE_NAME} of {len(reference_df)} rows to run {run_id}")
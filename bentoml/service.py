@@ -1,46 +1,78 @@
 import bentoml
 from src.constants import *
 from src.income_classifier_users import IncomeClassifierUsers
+from src.income_classifier_users import IncomeClassifierUsersBatch
 from bentoml.io import JSON
-from typing import Any, Dict
-from src.data_mapper import InputMapper, OutputMapper
+from typing import Any, Dict, List
+from src.data_mapper import InputMapper, OneHotEncoder, OutputMapper
+from src.micro_batcher import MicroBatcher
+from src.artifact_cache import ArtifactCache, fetch_column_list
+from src.artifact_cache import resolve_model_run_id, run_timed
+from src.cache import LRUCache
+from src.metrics import (
+    count_request,
+    enable_request_metrics,
+    observe_batch_size,
+    stage_timer,
+)
+from src.prediction_cache import PredictionCache
+from src.request_profiler import RequestProfiler
 
+import asyncio
+import functools
 import pickle
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import dotenv_values
+import logging
 import os
+import time
 
-income_clf_runner = bentoml.mlflow.get(
-    "random-forest-classifier:latest"
-).to_runner()  # A
+income_clf_model = bentoml.mlflow.get("random-forest-classifier:latest")
+income_clf_runner = income_clf_model.to_runner()  # A
 full_input_spec = JSON(pydantic_model=IncomeClassifierUsers)
+batch_input_spec = JSON(pydantic_model=IncomeClassifierUsersBatch)
+bentoml_logger = logging.getLogger("bentoml")
 svc = bentoml.Service(
     "income_classifier_service",
     runners=[income_clf_runner],
 )
 
 
+def profiled_startup(startup):
+    # Creates the request profiler; PROFILER_STARTUP=true also profiles startup
+    @functools.wraps(startup)
+    async def profiled(context: bentoml.Context):
+        config = dotenv_values(ENV_FILE_NAME)
+        profiler = RequestProfiler(
+            config["PROFILER_DIR"],
+            sample_rate=config["PROFILER_SAMPLE_RATE"],
+            flush_interval_seconds=config["PROFILER_FLUSH_SECONDS"],
+        )
+        context.state["profiler"] = profiler
+        with profiler.profile("initialise", force=config["PROFILER_STARTUP"] == "true"):
+            await startup(context)
+        profiler.flush()
+
+    return profiled
+
+
 @svc.on_startup
+@profiled_startup
 async def initialise(context: bentoml.Context):
-    from src.feature_store import DataStore
+    from src.feature_store import DataStore, OnlineFeatureReader
     from mlflow.tracking import MlflowClient
     import mlflow
 
+    startup_start = time.perf_counter()
+
     config = dotenv_values(ENV_FILE_NAME)  # C
     os.environ["FEAST_S3_ENDPOINT_URL"] = config["FEAST_S3_ENDPOINT_URL"]
     os.environ["AWS_ENDPOINT_URL"] = config["FEAST_S3_ENDPOINT_URL"]
+    # Per-stage timings and request counters on the /metrics endpoint
+    enable_request_metrics(config["REQUEST_METRICS"] == "true")
 
-    mlflow_client = MlflowClient(config["MLFLOW_HOST"])  # D
-    mlflow.set_tracking_uri(config["MLFLOW_HOST"])
-    for model in mlflow_client.search_model_versions(
-        f"name='{config['MLFLOW_MODEL_NAME']}'"
-    ):
-        if model.current_stage == config["MLFLOW_MODEL_STAGE"]:
-            model_run_id = model.run_id
-    mlflow.artifacts.download_artifacts(
-        f"runs:/{model_run_id}/column_list.pkl", dst_path="column_list"
-    )  # E
-    with open("column_list/column_list.pkl", "rb") as f:
-        col_list = pickle.load(f)
+    timings = {}
+    artifact_cache = ArtifactCache(config["ARTIFACT_CACHE_DIR"])
     feature_store = DataStore(
         config["MINIO_HOST"],
         config["MINIO_ACCESS_KEY"],
@@ -51,7 +83,42 @@ async def initialise(context: bentoml.Context):
         config["FEAST_REDIS_HOST"],
         config["FEAST_REDIS_PASSWORD"],
     )  # F
-    context.state["store"] = feature_store.init_feature_store()  # G
+    mlflow_client = MlflowClient(config["MLFLOW_HOST"])  # D
+    mlflow.set_tracking_uri(config["MLFLOW_HOST"])
+    # The independent downloads run concurrently and are served from the local
+    # artifact cache when this run / object version was fetched before
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        feature_store_config = executor.submit(
+            run_timed,
+            timings,
+            "feature_store_yaml",
+            feature_store.fetch_config,
+            artifact_cache,
+        )
+        model_run_id = run_timed(
+            timings,
+            "resolve_model_run",
+            resolve_model_run_id,
+            mlflow_client,
+            config["MLFLOW_MODEL_NAME"],
+            config["MLFLOW_MODEL_STAGE"],
+        )
+        column_list_path = executor.submit(
+            run_timed,
+            timings,
+            "column_list",
+            fetch_column_list,
+            artifact_cache,
+            model_run_id,
+        )  # E
+        with open(column_list_path.result(), "rb") as f:
+            col_list = pickle.load(f)
+        context.state["store"] = run_timed(
+            timings,
+            "init_feature_store",
+            feature_store.init_feature_store,
+            feature_store_config.result(),
+        )  # G
     context.state["col_list"] = col_list
     context.state["feature_list"] = [
         "demographic:Sex",
@@ -63,23 +130,177 @@ async def initialise(context: bentoml.Context):
         "occupation:Education",
         "occupation:Occupation",
     ]
+    fast_reader = None
+    if config["FEAST_REDIS_FAST_PATH"] == "true":
+        # Reads Feast's Redis layout directly, Feast stays the reference reader
+        fast_reader = feature_store.init_redis_reader(
+            context.state["store"], context.state["feature_list"]
+        )
+    context.state["feature_reader"] = OnlineFeatureReader(
+        context.state["store"],
+        context.state["feature_list"],
+        LRUCache(
+            max_size=config["FEATURE_CACHE_MAX_SIZE"],
+            ttl_seconds=config["FEATURE_CACHE_TTL_SECONDS"],
+        ),
+        invalidation_file=config["FEATURE_CACHE_INVALIDATION_FILE"],
+        fast_reader=fast_reader,
+    )
+    context.state["encoder"] = OneHotEncoder(
+        [feature.split(":")[1] for feature in context.state["feature_list"]], col_list
+    )
+    context.state["prediction_cache"] = PredictionCache(
+        LRUCache(
+            max_size=config["PREDICTION_CACHE_MAX_SIZE"],
+            ttl_seconds=config["PREDICTION_CACHE_TTL_SECONDS"],
+        ),
+        model_version=f"{income_clf_model.tag}/{model_run_id}",
+    )
+    # Blocking feature store reads of /predict_async run here, off the event loop
+    context.state["io_executor"] = ThreadPoolExecutor(
+        max_workers=int(config["FEATURE_IO_WORKERS"]), thread_name_prefix="feature-io"
+    )
+    # Concurrent /predict calls are coalesced into one score_users_async call
+    context.state["micro_batcher"] = MicroBatcher(
+        lambda user_ids: score_users_async(context.state, user_ids, "predict"),
+        max_batch_size=config["MICRO_BATCH_MAX_SIZE"],
+        max_wait_ms=config["MICRO_BATCH_MAX_WAIT_MS"],
+    )
+    timings["total"] = time.perf_counter() - startup_start
+    bentoml_logger.info(
+        "Startup phases: "
+        + ", ".join(f"{phase}={seconds:.2f}s" for phase, seconds in timings.items())
+    )
+
+
+@svc.on_shutdown
+def shutdown(context: bentoml.Context):
+    context.state["profiler"].flush()
+
+
+def run_model(state: Dict[str, Any], feature_df, endpoint: str) -> List[Any]:
+    with stage_timer(endpoint, "encode"):
+        data_mapper = InputMapper(feature_df, state["col_list"], state["encoder"])
+        input_df = data_mapper.generate_pandas_dataframe()  # C
+    with stage_timer(endpoint, "runner"):
+        return list(income_clf_runner.predict.run(input_df))  # D
+
+
+async def run_model_async(
+    state: Dict[str, Any], feature_df, endpoint: str, profile
+) -> List[Any]:
+    with stage_timer(endpoint, "encode"), profile.section():
+        data_mapper = InputMapper(feature_df, state["col_list"], state["encoder"])
+        input_df = data_mapper.generate_pandas_dataframe()  # C
+    with stage_timer(endpoint, "runner"):
+        return list(await income_clf_runner.predict.async_run(input_df))  # D
+
+
+def score_users(state: Dict[str, Any], user_ids: List[str], endpoint: str) -> List[Any]:
+    # One Feast lookup (for users not in the feature cache), then one encoding
+    # pass and one runner call for rows not in the prediction cache. Results
+    # come back in user_ids order.
+    observe_batch_size(endpoint, len(user_ids))
+    with state["profiler"].profile("score_users"):
+        with stage_timer(endpoint, "features"):
+            feature_df = state["feature_reader"].get_features(user_ids)  # B
+        return state["prediction_cache"].predict(
+            feature_df, lambda miss_df: run_model(state, miss_df, endpoint)
+        )
+
+
+async def score_users_async(
+    state: Dict[str, Any], user_ids: List[str], endpoint: str
+) -> List[Any]:
+    # Same steps as score_users without blocking the event loop, so one worker
+    # keeps many requests in flight
+    loop = asyncio.get_running_loop()
+    observe_batch_size(endpoint, len(user_ids))
+    # Only the synchronous steps are profiled, not the other requests the
+    # event loop serves while this one awaits
+    with state["profiler"].profile_async("score_users_async") as profile:
+        with stage_timer(endpoint, "features"):
+            feature_df = await loop.run_in_executor(
+                state["io_executor"],
+                profile.wrap(state["feature_reader"].get_features),
+                user_ids,
+            )  # B
+        return await state["prediction_cache"].predict_async(
+            feature_df,
+            lambda miss_df: run_model_async(state, miss_df, endpoint, profile),
+        )
 
 
 @svc.api(input=full_input_spec, output=JSON(), route="/predict")
-def predict(inputs: IncomeClassifierUsers, ctx: bentoml.Context) -> Dict[str, Any]:
+async def predict(
+    inputs: IncomeClassifierUsers, ctx: bentoml.Context
+) -> Dict[str, Any]:
+    count_request("predict")
     input_dict = inputs.dict()  # A
-    feature_df = (
-        ctx.state["store"]
-        .get_online_features(
-            features=ctx.state["feature_list"], entity_rows=[input_dict]
-        )
-        .to_df()
-    )  # B
-    feature_df.drop(columns=["user_id"], inplace=True)
-    data_mapper = InputMapper(feature_df, ctx.state["col_list"])
-    input_df = data_mapper.generate_pandas_dataframe()  # C
-    output_mapper = OutputMapper(income_clf_runner.predict.run(input_df)[0])  # D
+    prediction = await ctx.state["micro_batcher"].submit(input_dict["user_id"])
+    output_mapper = OutputMapper(prediction)
     return {
         "income_category": output_mapper.map_prediction(),
         "user_id": input_dict["user_id"],
     }  # E
+
+
+@svc.api(input=full_input_spec, output=JSON(), route="/predict_async")
+async def predict_async(
+    inputs: IncomeClassifierUsers, ctx: bentoml.Context
+) -> Dict[str, Any]:
+    count_request("predict_async")
+    input_dict = inputs.dict()  # A
+    predictions = await score_users_async(
+        ctx.state, [input_dict["user_id"]], "predict_async"
+    )
+    output_mapper = OutputMapper(predictions[0])
+    return {
+        "income_category": output_mapper.map_prediction(),
+        "user_id": input_dict["user_id"],
+    }  # E
+
+
+@svc.api(input=batch_input_spec, output=JSON(), route="/predict_batch")
+def predict_batch(
+    inputs: IncomeClassifierUsersBatch, ctx: bentoml.Context
+) -> Dict[str, Any]:
+    count_request("predict_batch")
+    user_ids = inputs.user_ids
+    predictions = score_users(ctx.state, user_ids, "predict_batch") if user_ids else []
+    return {
+        "predictions": [
+            {
+                "income_category": OutputMapper(prediction).map_prediction(),
+                "user_id": user_id,
+            }
+            for user_id, prediction in zip(user_ids, predictions)
+        ]
+    }
+
+
+@svc.api(input=JSON(), output=JSON(), route="/feature_cache/invalidate")
+def invalidate_feature_cache(
+    request: Dict[str, Any], ctx: bentoml.Context
+) -> Dict[str, Any]:
+    # Call after feast materialize. A full invalidation reaches every worker on
+    # the node; {"user_ids": [...]} only clears those users in this worker.
+    ctx.state["feature_reader"].invalidate((request or {}).get("user_ids"))
+    return ctx.state["feature_reader"].cache.stats()
+
+
+@svc.api(input=JSON(), output=JSON(), route="/feature_cache/stats")
+def feature_cache_stats(
+    request: Dict[str, Any], ctx: bentoml.Context
+) -> Dict[str, Any]:
+    return ctx.state["feature_reader"].cache.stats()
+
+
+@svc.api(input=JSON(), output=JSON(), route="/admin/profile")
+def admin_profile(request: Dict[str, Any], ctx: bentoml.Context) -> Dict[str, Any]:
+    # {"seconds": 60} profiles every request of this worker for a minute; the
+    # pstats files go to PROFILER_DIR
+    seconds = (request or {}).get("seconds")
+    if seconds:
+        ctx.state["profiler"].start_window(min(float(seconds), 600))
+    return ctx.state["profiler"].stats()
@@ -1,24 +1,39 @@
 import bentoml
 from src.constants import *
 from src.income_classifier_users import IncomeClassifierUsers
+from src.income_classifier_users import IncomeClassifierUsersBatch
 from bentoml.io import JSON
-from typing import Any, Dict
-from typing import Optional
-from src.data_mapper import InputMapper, OutputMapper
-from data_drift import MonitoringService
+from typing import Any, Dict, List
+from src.artifact_cache import ArtifactCache, fetch_column_list
+from src.artifact_cache import resolve_model_run_id, run_timed
+from src.cache import LRUCache
+from src.metrics import (
+    count_request,
+    enable_request_metrics,
+    observe_batch_size,
+    stage_timer,
+)
+from src.request_profiler import RequestProfiler
+import asyncio
+import functools
 import pickle
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import dotenv_values
+import logging
 import os
-from minio import Minio
-import json
-import pandas as pd
-from evidently.ui.remote import RemoteWorkspace
-from evidently_reports import data_drift_report
-
-income_clf_runner = bentoml.mlflow.get(
-    "random-forest-classifier:latest"
-).to_runner()  # A
+import time
+
+# pandas, minio, mlflow, feast and evidently are imported where they are used,
+# and so are the src modules that import pandas (data_mapper, prediction_cache)
+# or that only the API workers need (micro_batcher). Runner processes import
+# this module too and never need them, and API workers only build the
+# Evidently report when a scheduled or requested report runs.
+
+income_clf_model = bentoml.mlflow.get("random-forest-classifier:latest")
+income_clf_runner = income_clf_model.to_runner()  # A
 full_input_spec = JSON(pydantic_model=IncomeClassifierUsers)
+batch_input_spec = JSON(pydantic_model=IncomeClassifierUsersBatch)
+bentoml_logger = logging.getLogger("bentoml")
 svc = bentoml.Service(
     "income_classifier_service",
     runners=[income_clf_runner],
@@ -33,35 +48,155 @@ def download_file_from_minio(
     object_name: str,
     file_path: str,
 ):
+    from minio import Minio
+
     client = Minio(
         endpoint=minio_host, access_key=access_key, secret_key=secret_key, secure=False
     )
     client.fget_object(bucket_name, object_name, file_path)
 
 
+def fetch_reference_dataset(
+    config: Dict[str, str], artifact_cache: ArtifactCache, model_run_id: str
+) -> str:
+    from minio import Minio
+    from src.reference_dataset import DATASET_FILE_NAME, convert_reference_dataset
+    import json
+    import mlflow
+
+    run = mlflow.get_run(model_run_id)
+    dataset_source = None
+
+    for dataset_input in run.inputs.dataset_inputs:
+        for tag in dataset_input.tags:
+            if tag.value == config["REFERENCE_DATASET_NAME"]:
+                dataset_source = json.loads(dataset_input.dataset.source)["uri"]
+                break
+
+    if not dataset_source:
+        raise ValueError(
+            f"Reference dataset {config['REFERENCE_DATASET_NAME']} not found."
+        )
+
+    bucket_name = dataset_source.split("/")[0]
+    object_name = "/".join(dataset_source.split("/")[1:])
+    file_name = object_name.split("/")[-1]
+    print(bucket_name, object_name, file_name)
+
+    client = Minio(
+        endpoint=config["MINIO_HOST"],
+        access_key=config["MINIO_ACCESS_KEY"],
+        secret_key=config["MINIO_SECRET_KEY"],
+        secure=False,
+    )
+    etag = client.stat_object(bucket_name, object_name).etag
+
+    def download(tmp_dir: str) -> str:
+        file_path = os.path.join(tmp_dir, file_name)
+        download_file_from_minio(
+            minio_host=config["MINIO_HOST"],
+            access_key=config["MINIO_ACCESS_KEY"],
+            secret_key=config["MINIO_SECRET_KEY"],
+            bucket_name=bucket_name,
+            object_name=object_name,
+            file_path=file_path,
+        )
+        # Runs logged before Parquet references have CSV, cache it converted
+        return convert_reference_dataset(
+            file_path, os.path.join(tmp_dir, DATASET_FILE_NAME)
+        )
+
+    return artifact_cache.fetch(f"{dataset_source}@{etag}", DATASET_FILE_NAME, download)
+
+
+def fetch_reference_profile(
+    config: Dict[str, str], artifact_cache: ArtifactCache, model_run_id: str
+) -> str:
+    from src.reference_dataset import read_reference_dataset
+    from src.reference_profile import PROFILE_FILE_NAME, ReferenceProfile
+    from mlflow.exceptions import MlflowException
+    import mlflow
+
+    def download(tmp_dir: str) -> str:
+        try:
+            return mlflow.artifacts.download_artifacts(
+                f"runs:/{model_run_id}/{PROFILE_FILE_NAME}", dst_path=tmp_dir
+            )
+        except (MlflowException, OSError):
+            pass
+        # The profile is logged once per model by scripts/log_reference_profile.py,
+        # workers never write to the model run. Without it this node profiles
+        # the reference dataset itself, the artifact cache keeps the result.
+        bentoml_logger.warning(
+            f"Run {model_run_id} has no {PROFILE_FILE_NAME}, profiling the"
+            " reference dataset locally; run scripts/log_reference_profile.py"
+        )
+        reference_df = read_reference_dataset(
+            fetch_reference_dataset(config, artifact_cache, model_run_id),
+            columns=[feature.split(":")[1] for feature in FEATURE_LIST],
+        )
+        file_path = os.path.join(tmp_dir, PROFILE_FILE_NAME)
+        ReferenceProfile.from_dataframe(reference_df).save(file_path)
+        return file_path
+
+    return artifact_cache.fetch(model_run_id, PROFILE_FILE_NAME, download)
+
+
+def build_data_drift_report():
+    from evidently_reports import build_data_drift_report
+
+    return build_data_drift_report()
+
+
+def connect_evidently_workspace(workspace_url: str):
+    from evidently.ui.remote import RemoteWorkspace
+
+    return RemoteWorkspace(workspace_url)
+
+
+def profiled_startup(startup):
+    # Creates the request profiler; PROFILER_STARTUP=true also profiles startup
+    @functools.wraps(startup)
+    async def profiled(context: bentoml.Context):
+        config = dotenv_values(ENV_FILE_NAME)
+        profiler = RequestProfiler(
+            config["PROFILER_DIR"],
+            sample_rate=config["PROFILER_SAMPLE_RATE"],
+            flush_interval_seconds=config["PROFILER_FLUSH_SECONDS"],
+        )
+        context.state["profiler"] = profiler
+        with profiler.profile("initialise", force=config["PROFILER_STARTUP"] == "true"):
+            await startup(context)
+        profiler.flush()
+
+    return profiled
+
+
 @svc.on_startup
+@profiled_startup
 async def initialise(context: bentoml.Context):
-    from src.feature_store import DataStore
+    from src.feature_store import DataStore, OnlineFeatureReader
     from mlflow.tracking import MlflowClient
+    from data_drift import MonitoringService
+    from src.data_mapper import OneHotEncoder
+    from src.drift_sampling import DriftSampler
+    from src.micro_batcher import MicroBatcher
+    from src.prediction_cache import PredictionCache
+    from src.reference_dataset import read_reference_dataset
+    from src.reference_profile import ReferenceProfile
+    from src.snapshot_shipper import SnapshotShipper
     import mlflow
 
-    config = dotenv_values(ENV_FILE_NAME)  # C
+    startup_start = time.perf_counter()
 
+    config = dotenv_values(ENV_FILE_NAME)  # C
     os.environ["FEAST_S3_ENDPOINT_URL"] = config["FEAST_S3_ENDPOINT_URL"]
     os.environ["AWS_ENDPOINT_URL"] = config["FEAST_S3_ENDPOINT_URL"]
+    # Per-stage timings and request counters on the /metrics endpoint
+    enable_request_metrics(config["REQUEST_METRICS"] == "true")
 
-    mlflow_client = MlflowClient(config["MLFLOW_HOST"])  # D
-    mlflow.set_tracking_uri(config["MLFLOW_HOST"])
-    for model in mlflow_client.search_model_versions(
-        f"name='{config['MLFLOW_MODEL_NAME']}'"
-    ):
-        if model.current_stage == config["MLFLOW_MODEL_STAGE"]:
-            model_run_id = model.run_id
-    mlflow.artifacts.download_artifacts(
-        f"runs:/{model_run_id}/column_list.pkl", dst_path="column_list"
-    )  # E
-    with open("column_list/column_list.pkl", "rb") as f:
-        col_list = pickle.load(f)
+    timings = {}
+    artifact_cache = ArtifactCache(config["ARTIFACT_CACHE_DIR"])
     feature_store = DataStore(
         config["MINIO_HOST"],
         config["MINIO_ACCESS_KEY"],
@@ -72,7 +207,72 @@ async def initialise(context: bentoml.Context):
         config["FEAST_REDIS_HOST"],
         config["FEAST_REDIS_PASSWORD"],
     )  # F
-    context.state["store"] = feature_store.init_feature_store()  # G
+    mlflow_client = MlflowClient(config["MLFLOW_HOST"])  # D
+    mlflow.set_tracking_uri(config["MLFLOW_HOST"])
+    # The independent downloads run concurrently and are served from the local
+    # artifact cache when this run / object version was fetched before
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        feature_store_config = executor.submit(
+            run_timed,
+            timings,
+            "feature_store_yaml",
+            feature_store.fetch_config,
+            artifact_cache,
+        )
+        model_run_id = run_timed(
+            timings,
+            "resolve_model_run",
+            resolve_model_run_id,
+            mlflow_client,
+            config["MLFLOW_MODEL_NAME"],
+            config["MLFLOW_MODEL_STAGE"],
+        )
+        column_list_path = executor.submit(
+            run_timed,
+            timings,
+            "column_list",
+            fetch_column_list,
+            artifact_cache,
+            model_run_id,
+        )  # E
+        # The profile is all the drift engine needs; full mode also keeps the
+        # reference dataset itself for the Evidently reports
+        reference_profile_path = executor.submit(
+            run_timed,
+            timings,
+            "reference_profile",
+            fetch_reference_profile,
+            config,
+            artifact_cache,
+            model_run_id,
+        )
+        if config["DRIFT_REFERENCE_MODE"] == "full":
+            reference_dataset_path = executor.submit(
+                run_timed,
+                timings,
+                "reference_dataset",
+                fetch_reference_dataset,
+                config,
+                artifact_cache,
+                model_run_id,
+            )
+        with open(column_list_path.result(), "rb") as f:
+            col_list = pickle.load(f)
+        context.state["store"] = run_timed(
+            timings,
+            "init_feature_store",
+            feature_store.init_feature_store,
+            feature_store_config.result(),
+        )  # G
+        reference_profile = ReferenceProfile.load(reference_profile_path.result())
+        reference_df = None
+        if config["DRIFT_REFERENCE_MODE"] == "full":
+            reference_df = run_timed(
+                timings,
+                "read_reference_dataset",
+                read_reference_dataset,
+                reference_dataset_path.result(),
+            )
     context.state["col_list"] = col_list
     context.state["feature_list"] = [
         "demographic:Sex",
@@ -84,64 +284,265 @@ async def initialise(context: bentoml.Context):
         "occupation:Education",
         "occupation:Occupation",
     ]
-    run = mlflow.get_run(model_run_id)
-    dataset_source = None
-
-    for dataset_input in run.inputs.dataset_inputs:
-        for tag in dataset_input.tags:
-            if tag.value == config["REFERENCE_DATASET_NAME"]:
-                dataset_source = json.loads(dataset_input.dataset.source)["uri"]
-                break
-
-    if not dataset_source:
-        raise ValueError(
-            f"Reference dataset {config['REFERENCE_DATASET_NAME']} not found."
+    fast_reader = None
+    if config["FEAST_REDIS_FAST_PATH"] == "true":
+        # Reads Feast's Redis layout directly, Feast stays the reference reader
+        fast_reader = feature_store.init_redis_reader(
+            context.state["store"], context.state["feature_list"]
         )
-
-    bucket_name = dataset_source.split("/")[0]
-    object_name = "/".join(dataset_source.split("/")[1:])
-    file_path = object_name.split("/")[-1]
-    print(bucket_name, object_name, file_path)
-
-    download_file_from_minio(
-        minio_host=config["MINIO_HOST"],
-        access_key=config["MINIO_ACCESS_KEY"],
-        secret_key=config["MINIO_SECRET_KEY"],
-        bucket_name=bucket_name,
-        object_name=object_name,
-        file_path=file_path,
+    context.state["feature_reader"] = OnlineFeatureReader(
+        context.state["store"],
+        context.state["feature_list"],
+        LRUCache(
+            max_size=config["FEATURE_CACHE_MAX_SIZE"],
+            ttl_seconds=config["FEATURE_CACHE_TTL_SECONDS"],
+        ),
+        invalidation_file=config["FEATURE_CACHE_INVALIDATION_FILE"],
+        fast_reader=fast_reader,
     )
+    context.state["encoder"] = OneHotEncoder(
+        [feature.split(":")[1] for feature in context.state["feature_list"]], col_list
+    )
+    context.state["prediction_cache"] = PredictionCache(
+        LRUCache(
+            max_size=config["PREDICTION_CACHE_MAX_SIZE"],
+            ttl_seconds=config["PREDICTION_CACHE_TTL_SECONDS"],
+        ),
+        model_version=f"{income_clf_model.tag}/{model_run_id}",
+    )
+    # Blocking feature store reads of /predict_async run here, off the event loop
+    context.state["io_executor"] = ThreadPoolExecutor(
+        max_workers=int(config["FEATURE_IO_WORKERS"]), thread_name_prefix="feature-io"
+    )
+    # Concurrent /predict calls are coalesced into one score_users_async call
+    context.state["micro_batcher"] = MicroBatcher(
+        lambda user_ids: score_users_async(context.state, user_ids, "predict"),
+        max_batch_size=config["MICRO_BATCH_MAX_SIZE"],
+        max_wait_ms=config["MICRO_BATCH_MAX_WAIT_MS"],
+    )
+    aggregator = None
+    if config["DRIFT_AGGREGATION"] == "redis":
+        from src.drift_aggregation import RedisDriftAggregator
 
-    reference_df = pd.read_csv(file_path)
-
-    evidently_workspace = RemoteWorkspace(config["EVIDENTLY_WORKSPACE_URL"])
-    context.state["evidently_workspace"] = evidently_workspace
+        # One drift window for every worker and pod, in the Feast Redis
+        aggregator = RedisDriftAggregator(
+            feature_store.redis_client(),
+            key_prefix=f"drift:{config['EVIDENTLY_PROJECT_ID']}",
+            window_size=config["EVIDENTLY_REPORT_WINDOW_SIZE"],
+            publish_interval_seconds=config["DRIFT_AGGREGATION_PUBLISH_SECONDS"],
+        )
     context.state["monitoring_service"] = MonitoringService(
-        report=data_drift_report,
-        reference=reference_df,
-        workspace=evidently_workspace,
+        report_factory=build_data_drift_report,
+        reference=reference_profile,
+        reference_data=reference_df,
+        aggregator=aggregator,
+        sampler=DriftSampler(
+            mode=config["DRIFT_SAMPLING"],
+            rate=config["DRIFT_SAMPLING_RATE"],
+            # The window is the reservoir
+            reservoir_size=config["EVIDENTLY_REPORT_WINDOW_SIZE"],
+            stratify_column=config["DRIFT_SAMPLING_STRATIFY_COLUMN"] or None,
+        ),
+        shipper=SnapshotShipper(
+            lambda: connect_evidently_workspace(config["EVIDENTLY_WORKSPACE_URL"]),
+            spool_dir=config["DRIFT_SPOOL_DIR"],
+            max_spool_files=config["DRIFT_SPOOL_MAX_FILES"],
+            batch_size=config["DRIFT_UPLOAD_BATCH_SIZE"],
+            max_backoff_seconds=config["DRIFT_UPLOAD_MAX_BACKOFF_SECONDS"],
+        ),
         project_id=config["EVIDENTLY_PROJECT_ID"],
         window_size=config["EVIDENTLY_REPORT_WINDOW_SIZE"],
+        queue_size=config["DRIFT_QUEUE_MAX_SIZE"],
+        overflow_policy=config["DRIFT_QUEUE_OVERFLOW_POLICY"],
+        stattest=config["DRIFT_STATTEST"] or None,
+        report_schedule=config["EVIDENTLY_REPORT_SCHEDULE"],
+        report_interval_seconds=config["EVIDENTLY_REPORT_INTERVAL_SECONDS"],
+        report_hop_rows=config["EVIDENTLY_REPORT_HOP_ROWS"],
+        profiler=context.state["profiler"],
     )
+    timings["total"] = time.perf_counter() - startup_start
+    bentoml_logger.info(
+        "Startup phases: "
+        + ", ".join(f"{phase}={seconds:.2f}s" for phase, seconds in timings.items())
+    )
+
+
+@svc.on_shutdown
+def shutdown(context: bentoml.Context):
+    aggregator = context.state["monitoring_service"].aggregator
+    if aggregator is not None:
+        # Publishes the last counts and lets another worker take over at once
+        aggregator.release()
+    context.state["profiler"].flush()
+
+
+def run_model(state: Dict[str, Any], feature_df, endpoint: str) -> List[Any]:
+    from src.data_mapper import InputMapper
+
+    with stage_timer(endpoint, "encode"):
+        data_mapper = InputMapper(feature_df, state["col_list"], state["encoder"])
+        input_df = data_mapper.generate_pandas_dataframe()  # C
+    with stage_timer(endpoint, "runner"):
+        return list(income_clf_runner.predict.run(input_df))  # D
+
+
+async def run_model_async(
+    state: Dict[str, Any], feature_df, endpoint: str, profile
+) -> List[Any]:
+    from src.data_mapper import InputMapper
+
+    with stage_timer(endpoint, "encode"), profile.section():
+        data_mapper = InputMapper(feature_df, state["col_list"], state["encoder"])
+        input_df = data_mapper.generate_pandas_dataframe()  # C
+    with stage_timer(endpoint, "runner"):
+        return list(await income_clf_runner.predict.async_run(input_df))  # D
+
+
+def score_users(state: Dict[str, Any], user_ids: List[str], endpoint: str) -> List[Any]:
+    # One Feast lookup (for users not in the feature cache), then one encoding
+    # pass and one runner call for rows not in the prediction cache. Results
+    # come back in user_ids order.
+    observe_batch_size(endpoint, len(user_ids))
+    with state["profiler"].profile("score_users"):
+        with stage_timer(endpoint, "features"):
+            feature_df = state["feature_reader"].get_features(user_ids)  # B
+        with stage_timer(endpoint, "monitoring"):
+            state["monitoring_service"].iterate(feature_df)
+        return state["prediction_cache"].predict(
+            feature_df, lambda miss_df: run_model(state, miss_df, endpoint)
+        )
+
+
+async def score_users_async(
+    state: Dict[str, Any], user_ids: List[str], endpoint: str
+) -> List[Any]:
+    # Same steps as score_users without blocking the event loop, so one worker
+    # keeps many requests in flight
+    loop = asyncio.get_running_loop()
+    observe_batch_size(endpoint, len(user_ids))
+    # Only the synchronous steps are profiled, not the other requests the
+    # event loop serves while this one awaits
+    with state["profiler"].profile_async("score_users_async") as profile:
+        with stage_timer(endpoint, "features"):
+            feature_df = await loop.run_in_executor(
+                state["io_executor"],
+                profile.wrap(state["feature_reader"].get_features),
+                user_ids,
+            )  # B
+        with stage_timer(endpoint, "monitoring"):
+            if state["monitoring_service"].overflow_policy == "block":
+                # A full monitoring queue would otherwise stall the event loop
+                await loop.run_in_executor(
+                    state["io_executor"],
+                    profile.wrap(state["monitoring_service"].iterate),
+                    feature_df,
+                )
+            else:
+                with profile.section():
+                    state["monitoring_service"].iterate(feature_df)
+        return await state["prediction_cache"].predict_async(
+            feature_df,
+            lambda miss_df: run_model_async(state, miss_df, endpoint, profile),
+        )
 
 
 @svc.api(input=full_input_spec, output=JSON(), route="/predict")
-def predict(inputs: IncomeClassifierUsers, ctx: bentoml.Context) -> Dict[str, Any]:
+async def predict(
+    inputs: IncomeClassifierUsers, ctx: bentoml.Context
+) -> Dict[str, Any]:
+    from src.data_mapper import OutputMapper
+
+    count_request("predict")
     input_dict = inputs.dict()  # A
-    feature_df = (
-        ctx.state["store"]
-        .get_online_features(
-            features=ctx.state["feature_list"], entity_rows=[input_dict]
-        )
-        .to_df()
-    )  # B
-    print(feature_df.head())
-    feature_df.drop(columns=["user_id"], inplace=True)
-    ctx.state["monitoring_service"].iterate(feature_df)
-    data_mapper = InputMapper(feature_df, ctx.state["col_list"])
-    input_df = data_mapper.generate_pandas_dataframe()  # C
-    output_mapper = OutputMapper(income_clf_runner.predict.run(input_df)[0])  # D
+    prediction = await ctx.state["micro_batcher"].submit(input_dict["user_id"])
+    output_mapper = OutputMapper(prediction)
+    return {
+        "income_category": output_mapper.map_prediction(),
+        "user_id": input_dict["user_id"],
+    }  # E
+
+
+@svc.api(input=full_input_spec, output=JSON(), route="/predict_async")
+async def predict_async(
+    inputs: IncomeClassifierUsers, ctx: bentoml.Context
+) -> Dict[str, Any]:
+    from src.data_mapper import OutputMapper
+
+    count_request("predict_async")
+    input_dict = inputs.dict()  # A
+    predictions = await score_users_async(
+        ctx.state, [input_dict["user_id"]], "predict_async"
+    )
+    output_mapper = OutputMapper(predictions[0])
     return {
         "income_category": output_mapper.map_prediction(),
         "user_id": input_dict["user_id"],
     }  # E
+
+
+@svc.api(input=batch_input_spec, output=JSON(), route="/predict_batch")
+def predict_batch(
+    inputs: IncomeClassifierUsersBatch, ctx: bentoml.Context
+) -> Dict[str, Any]:
+    from src.data_mapper import OutputMapper
+
+    count_request("predict_batch")
+    user_ids = inputs.user_ids
+    predictions = score_users(ctx.state, user_ids, "predict_batch") if user_ids else []
+    return {
+        "predictions": [
+            {
+                "income_category": OutputMapper(prediction).map_prediction(),
+                "user_id": user_id,
+            }
+            for user_id, prediction in zip(user_ids, predictions)
+        ]
+    }
+
+
+@svc.api(input=JSON(), output=JSON(), route="/feature_cache/invalidate")
+def invalidate_feature_cache(
+    request: Dict[str, Any], ctx: bentoml.Context
+) -> Dict[str, Any]:
+    # Call after feast materialize. A full invalidation reaches every worker on
+    # the node; {"user_ids": [...]} only clears those users in this worker.
+    ctx.state["feature_reader"].invalidate((request or {}).get("user_ids"))
+    return ctx.state["feature_reader"].cache.stats()
+
+
+@svc.api(input=JSON(), output=JSON(), route="/feature_cache/stats")
+def feature_cache_stats(
+    request: Dict[str, Any], ctx: bentoml.Context
+) -> Dict[str, Any]:
+    return ctx.state["feature_reader"].cache.stats()
+
+
+@svc.api(input=JSON(), output=JSON(), route="/monitoring/stats")
+def monitoring_stats(request: Dict[str, Any], ctx: bentoml.Context) -> Dict[str, Any]:
+    return {
+        **ctx.state["monitoring_service"].stats(),
+        "snapshots": ctx.state["monitoring_service"].shipper.stats(),
+    }
+
+
+@svc.api(input=JSON(), output=JSON(), route="/monitoring/drift")
+def monitoring_drift(request: Dict[str, Any], ctx: bentoml.Context) -> Dict[str, Any]:
+    # Drift tests on the current window, updated with every request
+    return {"drift": ctx.state["monitoring_service"].drift()}
+
+
+@svc.api(input=JSON(), output=JSON(), route="/monitoring/report")
+def monitoring_report(request: Dict[str, Any], ctx: bentoml.Context) -> Dict[str, Any]:
+    # Sends a full Evidently report of this worker's window to the workspace
+    ctx.state["monitoring_service"].request_report()
+    return ctx.state["monitoring_service"].stats()
+
+
+@svc.api(input=JSON(), output=JSON(), route="/admin/profile")
+def admin_profile(request: Dict[str, Any], ctx: bentoml.Context) -> Dict[str, Any]:
+    # {"seconds": 60} profiles every request of this worker for a minute; the
+    # pstats files go to PROFILER_DIR
+    seconds = (request or {}).get("seconds")
+    if seconds:
+        ctx.state["profiler"].start_window(min(float(seconds), 600))
+    return ctx.state["profiler"].stats()
@@ -0,0 +1,77 @@
+from pathlib import Path
+from typing import Callable, Dict
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactCache:
+    """
+    Local content-addressed cache for artifacts fetched at service startup.
+
+    Artifacts are stored under a digest of their key: the MLflow run_id for
+    run artifacts, or the object ETag for MinIO objects. Restarted workers and
+    extra workers on the same node reuse them instead of downloading again.
+    Downloads go to a private temp directory and are moved into place
+    atomically, so concurrent workers never see a partial file.
+
+    Args:
+        cache_dir (str): Directory holding the cached artifacts.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+
+    def path(self, key: str, file_name: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return self.cache_dir / digest / file_name
+
+    def fetch(self, key: str, file_name: str, download: Callable[[str], str]) -> str:
+        """
+        Returns the cached path of file_name for key. On a miss download is
+        called with a temp directory and returns the path it wrote to.
+        """
+        target = self.path(key, file_name)
+        if target.exists():
+            logger.info(f"Artifact cache hit for {file_name} ({key})")
+            return str(target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=target.parent) as tmp_dir:
+            os.replace(download(tmp_dir), target)
+        logger.info(f"Artifact cache stored {file_name} ({key})")
+        return str(target)
+
+
+def run_timed(timings: Dict[str, float], phase: str, fn: Callable, *args, **kwargs):
+    """Runs fn and records its wall time in seconds under timings[phase]."""
+    start = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        timings[phase] = time.perf_counter() - start
+
+
+def resolve_model_run_id(mlflow_client, model_name: str, model_stage: str) -> str:
+    model_run_id = None
+    for model in mlflow_client.search_model_versions(f"name='{model_name}'"):
+        if model.current_stage == model_stage:
+            model_run_id = model.run_id
+    if not model_run_id:
+        raise ValueError(f"Model in stage {model_stage} not found for {model_name}.")
+    return model_run_id
+
+
+def fetch_column_list(artifact_cache: ArtifactCache, model_run_id: str) -> str:
+    import mlflow
+
+    return artifact_cache.fetch(
+        model_run_id,
+        "column_list.pkl",
+        lambda tmp_dir: mlflow.artifacts.download_artifacts(
+            f"runs:/{model_run_id}/column_list.pkl", dst_path=tmp_dir
+        ),
+    )
@@ -1,18 +1,22 @@
 import pandas as pd
-
+from src.one_hot_encoder import OneHotEncoder
 
 prediction_mapper = {0: "<=50K", 1: ">50k"}
 
 
 class InputMapper:
-    def __init__(self, input_data, column_list):
+    def __init__(self, input_data, column_list, encoder: OneHotEncoder = None):
         self.data = input_data
         self.column_list = column_list
+        self.encoder = encoder
 
     def generate_pandas_dataframe(self):
-        dummyfied_input_data = pd.get_dummies(
-            self.data, drop_first=True, sparse=False, dtype=float
-        )
+        if self.encoder is not None:
+            return self.encoder.transform_dataframe(self.data)
+        # The baseline category dropped at training time is not in column_list,
+        # so reindexing drops it. drop_first is not used here because it would
+        # drop whichever category happens to sort first within the request.
+        dummyfied_input_data = pd.get_dummies(self.data, sparse=False, dtype=float)
         transformed_input_data = dummyfied_input_data.reindex(
             columns=self.column_list, fill_value=0
         )
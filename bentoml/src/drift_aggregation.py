@@ -0,0 +1,336 @@
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import threading
+import time
+import uuid
+import numpy as np
+import pandas as pd
+import redis
+from src.reference_profile import ReferenceProfile
+from src.ring_buffer import CategoryCodes
+
+logger = logging.getLogger(__name__)
+
+# column -> value -> count, missing values excluded
+ValueCounts = Dict[str, Dict[Any, int]]
+
+
+def count_values(rows: pd.DataFrame) -> ValueCounts:
+    return {
+        column: {
+            value.item() if isinstance(value, np.generic) else value: int(n)
+            for value, n in rows[column].value_counts(dropna=True, sort=False).items()
+        }
+        for column in rows.columns
+    }
+
+
+def merge_counts(total: ValueCounts, counts: ValueCounts):
+    for column, column_counts in counts.items():
+        column_total = total.setdefault(column, {})
+        for value, n in column_counts.items():
+            column_total[value] = column_total.get(value, 0) + n
+
+
+class CategoryCountWindow(CategoryCodes):
+    """
+    Sliding window over batches of category counts instead of rows, for
+    windows fed by several workers. A batch is only evicted as a whole, once
+    the newer batches alone hold capacity rows, so the window keeps between
+    capacity rows and capacity plus one batch.
+
+    Args:
+        columns (list): Column names of the window.
+        capacity (int): Number of rows kept.
+    """
+
+    def __init__(self, columns: List[str], capacity: int):
+        super().__init__(columns)
+        self.capacity = int(capacity)
+        self.batches = deque()  # (rows, {column: (codes, counts)})
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, rows: int, counts: ValueCounts) -> Tuple[
+        Dict[str, Tuple[np.ndarray, np.ndarray]],
+        Dict[str, Tuple[np.ndarray, np.ndarray]],
+    ]:
+        """
+        Adds a batch of rows by its value counts. Returns the (codes, counts)
+        added and the ones evicted, per column.
+        """
+        added = {}
+        for column in self.columns:
+            column_counts = counts.get(column, {})
+            added[column] = (
+                self.encode(column, list(column_counts)),
+                np.fromiter(column_counts.values(), dtype=np.int64),
+            )
+        self.batches.append((int(rows), added))
+        self.size += int(rows)
+        evicted_batches = []
+        while self.size - self.batches[0][0] >= self.capacity:
+            batch_rows, batch_counts = self.batches.popleft()
+            self.size -= batch_rows
+            evicted_batches.append(batch_counts)
+        evicted = {
+            column: (
+                np.concatenate(
+                    [batch[column][0] for batch in evicted_batches]
+                    or [np.zeros(0, dtype=np.int32)]
+                ),
+                np.concatenate(
+                    [batch[column][1] for batch in evicted_batches]
+                    or [np.zeros(0, dtype=np.int64)]
+                ),
+            )
+            for column in self.columns
+        }
+        return added, evicted
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """A frame with the window's per-column counts, see ReferenceProfile."""
+        counts = {}
+        for column in self.columns:
+            totals = np.zeros(len(self.categories[column]), dtype=np.int64)
+            for _, batch_counts in self.batches:
+                np.add.at(totals, *batch_counts[column])
+            counts[column] = [
+                [self.categories[column][code], int(n)]
+                for code, n in enumerate(totals)
+                if n > 0
+            ]
+        schema = {column: "object" for column in self.columns}
+        return ReferenceProfile(self.size, schema, counts).to_dataframe()
+
+
+class RedisDriftAggregator:
+    """
+    Shares one drift window between the API workers of every pod through a
+    Redis stream.
+
+    Each worker publishes the category counts of the rows it monitors and
+    how many request rows it saw before sampling, at most every
+    publish_interval_seconds, never raw rows. The worker holding the
+    aggregation lock reads the stream into one CategoryCountWindow and runs
+    the drift checks and reports for the whole service; its latest drift
+    result is stored in Redis for the other workers. When the lock holder
+    goes away another worker takes over and rebuilds the window from the
+    tail of the stream. The lock holder renews the lock from a heartbeat
+    thread every third of lock_timeout_seconds, so a report that runs for
+    longer than the timeout does not hand the window to a second worker.
+
+    The pending counts and the leadership are guarded by a lock, since
+    release() runs on the shutdown thread while the monitoring thread adds
+    and publishes.
+
+    Args:
+        client (redis.Redis): Client of the shared Redis.
+        key_prefix (str): Prefix of the stream, lock and result keys.
+        window_size (int): Rows in the shared window.
+        publish_interval_seconds (float): Longest time counts are held back.
+        lock_timeout_seconds (float): Time after which a silent lock holder
+            loses the aggregation lock.
+        stream_max_len (int): Approximate cap of the stream length.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        key_prefix: str,
+        window_size: int,
+        publish_interval_seconds: float = 1.0,
+        lock_timeout_seconds: float = 10.0,
+        stream_max_len: int = 100_000,
+    ):
+        self.client = client
+        self.stream_key = f"{key_prefix}:counts"
+        self.drift_key = f"{key_prefix}:drift"
+        self.report_request_key = f"{key_prefix}:report_requested"
+        self.window_size = int(window_size)
+        self.publish_interval_seconds = float(publish_interval_seconds)
+        self.stream_max_len = int(stream_max_len)
+        self.lock_timeout_seconds = float(lock_timeout_seconds)
+        self.worker_id = uuid.uuid4().hex
+        self.lock = client.lock(
+            f"{key_prefix}:aggregator",
+            timeout=lock_timeout_seconds,
+            blocking=False,
+            # Released on shutdown from another thread than the one holding it
+            thread_local=False,
+        )
+        self.is_leader = False
+        self.last_id: Optional[bytes] = None
+        self._pending: ValueCounts = {}
+        self._pending_rows = 0
+        self._pending_rows_seen = 0
+        self._last_publish = time.monotonic()
+        self.published_batches = 0
+        self._state_lock = threading.Lock()
+        self._released = threading.Event()
+        self._heartbeat = threading.Thread(
+            target=self._renew_lock, name="drift-aggregation-lock", daemon=True
+        )
+        self._heartbeat.start()
+
+    def add(self, rows: pd.DataFrame):
+        """Counts rows for the next publish."""
+        counts = count_values(rows)
+        with self._state_lock:
+            merge_counts(self._pending, counts)
+            self._pending_rows += rows.shape[0]
+
+    def add_seen(self, rows_seen: int):
+        """Counts request rows for the next publish, sampled out or not."""
+        with self._state_lock:
+            self._pending_rows_seen += int(rows_seen)
+
+    def publish(self, force: bool = False):
+        with self._state_lock:
+            self._publish(force)
+
+    def _publish(self, force: bool):
+        if self._pending_rows == 0 and self._pending_rows_seen == 0:
+            return
+        if (
+            not force
+            and time.monotonic() - self._last_publish < self.publish_interval_seconds
+        ):
+            return
+        self.client.xadd(
+            self.stream_key,
+            {
+                "worker": self.worker_id,
+                "rows": self._pending_rows,
+                "rows_seen": self._pending_rows_seen,
+                # Pairs rather than objects keep non-string values intact
+                "counts": json.dumps(
+                    {
+                        column: list(column_counts.items())
+                        for column, column_counts in self._pending.items()
+                    }
+                ),
+            },
+            maxlen=self.stream_max_len,
+            approximate=True,
+        )
+        self._pending, self._pending_rows, self._pending_rows_seen = {}, 0, 0
+        self._last_publish = time.monotonic()
+        self.published_batches += 1
+
+    def _renew_lock(self):
+        # Keeps the lock while the monitoring thread is busy, e.g. in a report
+        while not self._released.wait(self.lock_timeout_seconds / 3):
+            with self._state_lock:
+                if not self.is_leader:
+                    continue
+                try:
+                    self.lock.reacquire()
+                except redis.exceptions.LockError:
+                    logger.warning("Lost the drift aggregation lock")
+                    self.is_leader = False
+                except redis.exceptions.RedisError:
+                    logger.exception("Could not renew the drift aggregation lock")
+
+    def _refresh_leadership(self) -> bool:
+        """Returns True when this worker just became the aggregator."""
+        with self._state_lock:
+            if self.is_leader:
+                try:
+                    self.lock.reacquire()
+                    return False
+                except redis.exceptions.LockError:
+                    logger.warning("Lost the drift aggregation lock")
+                    self.is_leader = False
+            # A worker shutting down does not take over again
+            if not self._released.is_set() and self.lock.acquire(blocking=False):
+                self.is_leader = True
+                return True
+            return False
+
+    @staticmethod
+    def _decode(fields: Dict[bytes, bytes]) -> Tuple[int, ValueCounts, int]:
+        counts = json.loads(fields[b"counts"])
+        rows = int(fields[b"rows"])
+        return (
+            rows,
+            {
+                column: {value: n for value, n in pairs}
+                for column, pairs in counts.items()
+            },
+            # Entries of workers without sampling saw exactly their rows
+            int(fields.get(b"rows_seen", rows)),
+        )
+
+    def _bootstrap(self) -> List[Tuple[int, ValueCounts, int]]:
+        """Reads back the newest entries that fill the window, oldest first."""
+        entries, rows = [], 0
+        newest = "+"
+        self.last_id = b"0-0"
+        while rows < self.window_size:
+            page = self.client.xrevrange(self.stream_key, max=newest, count=500)
+            if newest != "+":
+                page = page[1:]  # The boundary entry was read with the last page
+            if not page:
+                break
+            if self.last_id == b"0-0":
+                self.last_id = page[0][0]
+            for entry_id, fields in page:
+                entry = self._decode(fields)
+                entries.append(entry)
+                rows += entry[0]
+                if rows >= self.window_size:
+                    break
+            newest = page[-1][0]
+        return entries[::-1]
+
+    def poll(self) -> Tuple[bool, List[Tuple[int, ValueCounts, int]]]:
+        """
+        Returns whether this worker just became the aggregator, and the new
+        (rows, counts, rows_seen) entries of the stream when it is the
+        aggregator.
+        """
+        became_leader = self._refresh_leadership()
+        if not self.is_leader:
+            return False, []
+        if became_leader:
+            return True, self._bootstrap()
+        response = self.client.xread({self.stream_key: self.last_id}, count=1000)
+        entries = []
+        for _, stream_entries in response:
+            for entry_id, fields in stream_entries:
+                entries.append(self._decode(fields))
+                self.last_id = entry_id
+        return False, entries
+
+    def store_drift(self, drift: Dict[str, Any]):
+        # A worker that lost the lock meanwhile would overwrite the new
+        # aggregator's result
+        if self.is_leader:
+            self.client.set(self.drift_key, json.dumps(drift))
+
+    def load_drift(self) -> Optional[Dict[str, Any]]:
+        drift = self.client.get(self.drift_key)
+        return None if drift is None else json.loads(drift)
+
+    def request_report(self):
+        self.client.set(self.report_request_key, 1)
+
+    def take_report_request(self) -> bool:
+        return self.client.delete(self.report_request_key) == 1
+
+    def release(self):
+        """Publishes the last counts and hands the lock over at once."""
+        self._released.set()
+        with self._state_lock:
+            self._publish(force=True)
+            if self.is_leader:
+                try:
+                    self.lock.release()
+                except redis.exceptions.LockError:
+                    pass
+                self.is_leader = False
@@ -0,0 +1,165 @@
+from typing import Dict, Optional
+import random
+import threading
+import numpy as np
+import pandas as pd
+
+SAMPLING_MODES = ("none", "rate", "reservoir", "stratified")
+
+
+class DriftSampler:
+    """
+    Chooses which request rows go into the drift window, so monitoring at
+    high request rates costs a fraction of a full copy of the traffic.
+
+    "none" keeps every row. "rate" keeps each row with probability rate.
+    "reservoir" keeps a uniform sample of reservoir_size rows of the current
+    period (Algorithm R): row n of the period is kept with probability
+    reservoir_size / n and replaces a random row of the window, see
+    MonitoringService. "stratified" keeps every 1 / rate-th row of each value
+    of stratify_column, so the column's shares in the sample follow the
+    traffic exactly and rare values are never left out by chance.
+
+    The decision only needs a random draw or a counter per row, so rejected
+    rows never reach the queue. Rows seen and kept are counted since start
+    and since start_period, which reports call to describe their sample.
+    Request threads sample while the monitoring thread starts periods, so
+    the decisions and counters are guarded by one lock.
+
+    Args:
+        mode (str): One of SAMPLING_MODES.
+        rate (float): Share of rows kept by "rate" and "stratified".
+        reservoir_size (int): Rows kept per period by "reservoir".
+        stratify_column (str): Column the "stratified" mode samples by.
+    """
+
+    def __init__(
+        self,
+        mode: str = "none",
+        rate: float = 1.0,
+        reservoir_size: int = 0,
+        stratify_column: Optional[str] = None,
+    ):
+        if mode not in SAMPLING_MODES:
+            raise ValueError(
+                f"Unknown sampling mode {mode}, expected one of {SAMPLING_MODES}"
+            )
+        if mode in ("rate", "stratified") and not 0 < float(rate) <= 1:
+            raise ValueError(f"The {mode} sampling mode needs 0 < rate <= 1")
+        if mode == "reservoir" and int(reservoir_size) < 1:
+            raise ValueError("The reservoir sampling mode needs reservoir_size >= 1")
+        if mode == "stratified" and not stratify_column:
+            raise ValueError("The stratified sampling mode needs stratify_column")
+        self.mode = mode
+        self.rate = float(rate)
+        self.reservoir_size = int(reservoir_size)
+        self.stratify_column = stratify_column
+        # Fractional rows owed to each stratum, a row is kept once it reaches 1
+        self._credit: Dict = {}
+        self._lock = threading.Lock()
+        self.rows_seen = 0
+        self.rows_sampled = 0
+        self.period_rows_seen = 0
+        self.period_rows_sampled = 0
+
+    def sample(self, rows: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """Returns the rows to keep, None when no row is kept."""
+        n_rows = rows.shape[0]
+        keep = None
+        with self._lock:
+            # The reservoir draws depend on period_rows_seen, so the decision
+            # and the counting happen together
+            if self.mode == "none":
+                n_kept = n_rows
+            elif n_rows == 1:
+                # A single draw is much cheaper than a mask and a row selection
+                n_kept = int(self._keep_one(rows))
+            else:
+                keep = self._keep_mask(rows)
+                n_kept = int(keep.sum())
+            self.rows_seen += n_rows
+            self.period_rows_seen += n_rows
+            self.rows_sampled += n_kept
+            self.period_rows_sampled += n_kept
+        if n_kept == 0:
+            return None
+        return rows if n_kept == n_rows else rows[keep]
+
+    def _keep_one(self, rows: pd.DataFrame) -> bool:
+        if self.mode == "rate":
+            return random.random() < self.rate
+        if self.mode == "reservoir":
+            seen = self.period_rows_seen + 1
+            return seen <= self.reservoir_size or (
+                random.random() * seen < self.reservoir_size
+            )
+        return self._keep_stratum(
+            rows.iat[0, rows.columns.get_loc(self.stratify_column)]
+        )
+
+    def _keep_mask(self, rows: pd.DataFrame) -> np.ndarray:
+        n_rows = rows.shape[0]
+        if self.mode == "rate":
+            return np.random.random(n_rows) < self.rate
+        if self.mode == "reservoir":
+            seen = self.period_rows_seen + np.arange(1, n_rows + 1)
+            return np.random.random(n_rows) * seen < self.reservoir_size
+        return np.fromiter(
+            (self._keep_stratum(value) for value in rows[self.stratify_column]),
+            dtype=bool,
+            count=n_rows,
+        )
+
+    def _keep_stratum(self, value) -> bool:
+        if value != value:
+            value = None  # All missing values are one stratum
+        # Starting at 1 keeps the first row of every stratum
+        credit = self._credit.get(value, 1.0)
+        if credit >= 1.0:
+            self._credit[value] = credit - 1.0 + self.rate
+            return True
+        self._credit[value] = credit + self.rate
+        return False
+
+    def start_period(
+        self, rows_seen: Optional[int] = None, rows_sampled: Optional[int] = None
+    ) -> Dict[str, str]:
+        """
+        Starts a new period and returns the metadata of the one it ends, see
+        metadata. No row is counted in neither period or in both.
+        """
+        with self._lock:
+            metadata = self._metadata(rows_seen, rows_sampled)
+            self.period_rows_seen = 0
+            self.period_rows_sampled = 0
+        return metadata
+
+    def metadata(
+        self, rows_seen: Optional[int] = None, rows_sampled: Optional[int] = None
+    ) -> Dict[str, str]:
+        """
+        Describes the sample of the current period for report metadata, or
+        of rows_seen and rows_sampled when they were counted elsewhere.
+        """
+        with self._lock:
+            return self._metadata(rows_seen, rows_sampled)
+
+    def _metadata(
+        self, rows_seen: Optional[int], rows_sampled: Optional[int]
+    ) -> Dict[str, str]:
+        metadata = {
+            "sampling_mode": self.mode,
+            "rows_seen": str(self.period_rows_seen if rows_seen is None else rows_seen),
+            "rows_sampled": str(
+                self.period_rows_sampled if rows_sampled is None else rows_sampled
+            ),
+        }
+        if self.mode in ("rate", "stratified"):
+            metadata["sampling_rate"] = str(self.rate)
+        if self.mode == "stratified":
+            metadata["stratify_column"] = self.stratify_column
+        return metadata
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"rows_seen": self.rows_seen, "rows_sampled": self.rows_sampled}
@@ -0,0 +1,228 @@
+from typing import Any, Dict, List, Optional, Tuple
+import math
+import numpy as np
+from src.reference_profile import ReferenceProfile
+from src.ring_buffer import CategoryCodes
+
+# Evidently's defaults for categorical columns: up to this many reference rows
+# a Z-test (two categories) or chi-square test, Jensen-Shannon above it. Like
+# Evidently's ColumnDriftMetric, rows are counted after dropping missing
+# values and categories are counted over the reference and current data.
+SMALL_REFERENCE_ROWS = 1000
+STATTEST_THRESHOLDS = {
+    "z": 0.05,
+    "chisquare": 0.05,
+    "jensenshannon": 0.1,
+    "psi": 0.1,
+}
+# Tests whose score is a p-value, drift is detected below the threshold
+P_VALUE_STATTESTS = ("z", "chisquare")
+# Evidently's PSI replaces empty category shares by this, or by a millionth
+# of the smallest share when that is smaller; Jensen-Shannon keeps them empty
+EMPTY_SHARE = 0.0001
+DRIFT_SHARE = 0.5
+
+
+def default_stattest(reference_rows: int, categories: int) -> str:
+    if reference_rows <= SMALL_REFERENCE_ROWS:
+        return "z" if categories <= 2 else "chisquare"
+    return "jensenshannon"
+
+
+def z_test(reference: np.ndarray, current: np.ndarray) -> float:
+    """Two-proportion Z-test p-value on the share of the first category."""
+    if np.count_nonzero(reference) == 1 and np.array_equal(reference > 0, current > 0):
+        return 1.0
+    n_reference, n_current = reference.sum(), current.sum()
+    p_reference = reference[0] / n_reference
+    p_current = current[0] / n_current
+    pooled = (reference[0] + current[0]) / (n_reference + n_current)
+    z = (p_reference - p_current) / math.sqrt(
+        pooled * (1 - pooled) * (1 / n_reference + 1 / n_current)
+    )
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def chi_square_test(reference: np.ndarray, current: np.ndarray) -> float:
+    """Chi-square goodness of fit p-value of current against reference."""
+    from scipy.stats import chi2
+
+    expected = reference * (current.sum() / reference.sum())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        statistic = np.sum(
+            np.where(current == expected, 0, (current - expected) ** 2 / expected)
+        )
+    return float(chi2.sf(statistic, len(reference) - 1))
+
+
+def _shares(counts: np.ndarray) -> np.ndarray:
+    shares = counts / counts.sum()
+    smallest = shares[shares > 0].min()
+    shares[shares == 0] = smallest / 10**6 if smallest <= EMPTY_SHARE else EMPTY_SHARE
+    return shares
+
+
+def _relative_entropy(p: np.ndarray, m: np.ndarray) -> float:
+    present = p > 0
+    return float(np.sum(p[present] * np.log(p[present] / m[present])))
+
+
+def jensen_shannon_distance(reference: np.ndarray, current: np.ndarray) -> float:
+    p, q = reference / reference.sum(), current / current.sum()
+    m = (p + q) / 2
+    divergence = (_relative_entropy(p, m) + _relative_entropy(q, m)) / 2
+    return float(math.sqrt(max(divergence, 0.0)))
+
+
+def population_stability_index(reference: np.ndarray, current: np.ndarray) -> float:
+    p, q = _shares(reference), _shares(current)
+    return float(np.sum((p - q) * np.log(p / q)))
+
+
+STATTESTS = {
+    "z": z_test,
+    "chisquare": chi_square_test,
+    "jensenshannon": jensen_shannon_distance,
+    "psi": population_stability_index,
+}
+
+
+class CategoryDriftEngine:
+    """
+    Keeps per-column category counts of the reference data and of the current
+    window and tests them for drift the way Evidently's ColumnDriftMetric and
+    DatasetDriftMetric do for categorical columns.
+
+    Counts are indexed by the category codes of the window's ring buffer, so
+    update only adds the codes that entered the window and subtracts the ones
+    that left it, and evaluate costs O(categories) whatever the window size.
+    Missing values are ignored, as in Evidently. Without a stattest the test
+    is chosen per column and evaluation, since Evidently's choice depends on
+    the categories of the current window too.
+
+    Args:
+        window (CategoryCodes): Empty window whose codes are counted, a
+            CategoricalRingBuffer or a CategoryCountWindow.
+        reference (ReferenceProfile): Reference value counts, only the
+            window's columns are used.
+        stattest (str): One of STATTESTS, or None for Evidently's default
+            choice per column.
+        drift_share (float): Share of drifted columns from which the whole
+            dataset counts as drifted.
+    """
+
+    def __init__(
+        self,
+        window: CategoryCodes,
+        reference: ReferenceProfile,
+        stattest: Optional[str] = None,
+        drift_share: float = DRIFT_SHARE,
+    ):
+        if stattest is not None and stattest not in STATTESTS:
+            raise ValueError(
+                f"Unknown stattest {stattest}, expected one of {list(STATTESTS)}"
+            )
+        self.window = window
+        self.columns: List[str] = [
+            column for column in window.columns if column in reference.counts
+        ]
+        self.drift_share = drift_share
+        self.stattest = stattest
+        self.reference_counts = {}
+        self.reference_rows = {}
+        self.current_counts = {}
+        for column in self.columns:
+            values = [value for value, _ in reference.counts[column]]
+            counts = [n for _, n in reference.counts[column]]
+            codes = window.encode(column, values)
+            self.reference_counts[column] = np.bincount(
+                codes, weights=counts, minlength=len(window.categories[column])
+            ).astype(np.int64)
+            self.current_counts[column] = np.zeros(0, dtype=np.int64)
+            self.reference_rows[column] = int(sum(counts))
+
+    def _add(
+        self,
+        column: str,
+        codes: np.ndarray,
+        sign: int,
+        weights: Optional[np.ndarray] = None,
+    ):
+        present = codes >= 0
+        codes = codes[present]
+        if codes.size == 0:
+            return
+        counts = self.current_counts[column]
+        if codes.max() >= counts.size:
+            counts = np.concatenate(
+                [counts, np.zeros(codes.max() + 1 - counts.size, dtype=counts.dtype)]
+            )
+        if weights is not None:
+            np.add.at(counts, codes, sign * np.asarray(weights)[present])
+        elif codes.size == 1:
+            counts[codes[0]] += sign
+        else:
+            counts[: codes.max() + 1] += sign * np.bincount(codes)
+        self.current_counts[column] = counts
+
+    def update(self, written: Dict[str, np.ndarray], evicted: Dict[str, np.ndarray]):
+        """Applies the codes returned by CategoricalRingBuffer.append."""
+        for column in self.columns:
+            self._add(column, evicted[column], -1)
+            self._add(column, written[column], 1)
+
+    def update_counts(
+        self,
+        added: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        removed: Dict[str, Tuple[np.ndarray, np.ndarray]],
+    ):
+        """Applies the (codes, counts) returned by CategoryCountWindow.add."""
+        for column in self.columns:
+            self._add(column, removed[column][0], -1, removed[column][1])
+            self._add(column, added[column][0], 1, added[column][1])
+
+    def _aligned_counts(self, column: str):
+        reference = self.reference_counts[column]
+        current = self.current_counts[column]
+        size = max(reference.size, current.size)
+        reference = np.pad(reference, (0, size - reference.size))
+        current = np.pad(current, (0, size - current.size))
+        # Only categories seen in either dataset take part, as in Evidently
+        present = (reference > 0) | (current > 0)
+        return reference[present].astype(float), current[present].astype(float)
+
+    def column_drift(self, column: str) -> Dict[str, Any]:
+        reference, current = self._aligned_counts(column)
+        stattest = self.stattest or default_stattest(
+            self.reference_rows[column], len(reference)
+        )
+        threshold = STATTEST_THRESHOLDS[stattest]
+        if reference.sum() == 0 or current.sum() == 0:
+            score = None
+            detected = False
+        else:
+            score = STATTESTS[stattest](reference, current)
+            if stattest in P_VALUE_STATTESTS:
+                detected = score < threshold
+            else:
+                detected = score >= threshold
+        return {
+            "stattest": stattest,
+            "stattest_threshold": threshold,
+            "drift_score": score,
+            "drift_detected": bool(detected),
+        }
+
+    def evaluate(self) -> Dict[str, Any]:
+        """Returns the drift of every column and of the whole window."""
+        columns = {column: self.column_drift(column) for column in self.columns}
+        drifted = sum(result["drift_detected"] for result in columns.values())
+        share = drifted / len(columns) if columns else 0.0
+        return {
+            "number_of_columns": len(columns),
+            "number_of_drifted_columns": drifted,
+            "share_of_drifted_columns": share,
+            "dataset_drift": bool(columns) and share >= self.drift_share,
+            "current_rows": len(self.window),
+            "columns": columns,
+        }
@@ -5,8 +5,20 @@ from minio import Minio
 from pathlib import Path
 from feast import FeatureStore
 from feast.repo_config import FeastConfigError
+from feast.infra.key_encoding_utils import serialize_entity_key
+from feast.protos.feast.types.EntityKey_pb2 import EntityKey as EntityKeyProto
+from feast.protos.feast.types.Value_pb2 import Value as ValueProto
 from pydantic import ValidationError
+from typing import Dict, List, Optional
+from src.artifact_cache import ArtifactCache
+from src.cache import LRUCache
+from src.metrics import feature_cache_rows, feature_store_rows
+from src.metrics import request_metrics_enabled
+import mmh3
 import os
+import redis
+import struct
+import time
 import yaml
 
 
@@ -31,17 +43,38 @@ class DataStore:
         self.redis_host = feast_redis_host
         self.redis_password = feast_redis_password
 
-    def init_feature_store(self) -> FeatureStore:
-        # Download the content of the feature_store.yaml from the GCS bucket
-        client = Minio(
+    def _minio_client(self) -> Minio:
+        return Minio(
             self.minio_host,
             access_key=self.access_key,
             secret_key=self.secret_key,
             secure=False,
         )
-        client.fget_object(self.bucket_name, self.file_name, "feature_store.yaml")
+
+    def fetch_config(self, artifact_cache: ArtifactCache) -> str:
+        """Returns a cached copy of feature_store.yaml, keyed by its ETag."""
+        client = self._minio_client()
+        etag = client.stat_object(self.bucket_name, self.file_name).etag
+
+        def download(tmp_dir: str) -> str:
+            tmp_path = os.path.join(tmp_dir, "feature_store.yaml")
+            client.fget_object(self.bucket_name, self.file_name, tmp_path)
+            return tmp_path
+
+        return artifact_cache.fetch(
+            f"{self.bucket_name}/{self.file_name}@{etag}",
+            "feature_store.yaml",
+            download,
+        )
+
+    def init_feature_store(self, source_config_path: str = None) -> FeatureStore:
         config_path = Path("./") / "feature_store.yaml"
-        with open(config_path, "r") as file:
+        if source_config_path is None:
+            # Download the content of the feature_store.yaml from the GCS bucket
+            client = self._minio_client()
+            client.fget_object(self.bucket_name, self.file_name, "feature_store.yaml")
+            source_config_path = config_path
+        with open(source_config_path, "r") as file:
             feast_config = yaml.safe_load(file)
         feast_config["online_store"][
             "connection_string"
@@ -57,3 +90,202 @@ class DataStore:
         except ValidationError as e:
             raise FeastConfigError(e, config_path)
         return store
+
+    def redis_client(self) -> redis.Redis:
+        connection_pool = redis.ConnectionPool(
+            host=self.redis_host, port=6379, password=self.redis_password
+        )
+        return redis.Redis(connection_pool=connection_pool)
+
+    def init_redis_reader(
+        self, store: FeatureStore, feature_list: List[str]
+    ) -> "RedisFeatureReader":
+        return RedisFeatureReader(
+            self.redis_client(),
+            project=store.config.project,
+            feature_list=feature_list,
+            entity_key_serialization_version=store.config.entity_key_serialization_version,
+        )
+
+
+class OnlineFeatureReader:
+    """
+    Reads online features for many user_ids with one Feast call, serving
+    repeat users from an in-process LRUCache keyed by (user_id, feature_list).
+    Users with no stored features are not cached.
+
+    A full invalidation also touches invalidation_file, and every reader
+    sharing that file clears its own cache once it notices the change, so
+    one call reaches all API workers on the node. Every worker has to see
+    the same writable file, the services read it from
+    FEATURE_CACHE_INVALIDATION_FILE, next to the artifact cache.
+
+    Args:
+        store (FeatureStore): Initialised Feast feature store.
+        feature_list (list): Feature references, e.g. "demographic:Sex".
+        cache (LRUCache): Cache for the per-user feature rows.
+        invalidation_file (str): File used to broadcast full invalidations.
+        fast_reader (RedisFeatureReader): Optional direct Redis reader used
+            instead of the Feast SDK for cache misses.
+    """
+
+    def __init__(
+        self,
+        store: FeatureStore,
+        feature_list: List[str],
+        cache: LRUCache,
+        invalidation_file: str = "artifact_cache/feature_cache.invalidated",
+        fast_reader: Optional["RedisFeatureReader"] = None,
+    ):
+        self.store = store
+        self.fast_reader = fast_reader
+        self.feature_list = list(feature_list)
+        self.feature_names = [feature.split(":")[1] for feature in self.feature_list]
+        self.cache = cache
+        self.invalidation_file = Path(invalidation_file)
+        self._feature_key = tuple(self.feature_list)
+        self._invalidated_at = self._read_invalidation_time()
+        self._next_invalidation_check = 0.0
+
+    def _read_invalidation_time(self) -> float:
+        try:
+            return self.invalidation_file.stat().st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def _check_invalidation(self):
+        now = time.monotonic()
+        if now < self._next_invalidation_check:
+            return
+        self._next_invalidation_check = now + 1.0
+        invalidated_at = self._read_invalidation_time()
+        if invalidated_at != self._invalidated_at:
+            self._invalidated_at = invalidated_at
+            self.cache.invalidate()
+
+    def get_features(self, user_ids: List[str]) -> pd.DataFrame:
+        self._check_invalidation()
+        rows = [self.cache.get((user_id, self._feature_key)) for user_id in user_ids]
+        missing = list(
+            dict.fromkeys(
+                user_id for user_id, row in zip(user_ids, rows) if row is None
+            )
+        )
+        if request_metrics_enabled():
+            cache_misses = rows.count(None)
+            feature_cache_rows.labels(result="hit").inc(len(rows) - cache_misses)
+            feature_cache_rows.labels(result="miss").inc(cache_misses)
+        if missing:
+            fetched = self.fetch(missing)
+            found = 0
+            for user_id, row in fetched.items():
+                if not all(pd.isna(value) for value in row):
+                    self.cache.put((user_id, self._feature_key), row)
+                    found += 1
+            if request_metrics_enabled():
+                feature_store_rows.labels(result="found").inc(found)
+                feature_store_rows.labels(result="missing").inc(len(fetched) - found)
+            rows = [
+                fetched[user_id] if row is None else row
+                for user_id, row in zip(user_ids, rows)
+            ]
+        return pd.DataFrame.from_records(rows, columns=self.feature_names)
+
+    def fetch(self, user_ids: List[str]) -> Dict[str, tuple]:
+        if self.fast_reader is not None:
+            return self.fast_reader.fetch(user_ids)
+        return self.fetch_feast(user_ids)
+
+    def fetch_feast(self, user_ids: List[str]) -> Dict[str, tuple]:
+        feature_df = self.store.get_online_features(
+            features=self.feature_list,
+            entity_rows=[{"user_id": user_id} for user_id in user_ids],
+        ).to_df()
+        # Feast returns rows in the order of entity_rows
+        values = feature_df[self.feature_names].itertuples(index=False, name=None)
+        return dict(zip(user_ids, values))
+
+    def invalidate(self, user_ids: Optional[List[str]] = None):
+        """Drops cached rows, call after materializing new feature values."""
+        if user_ids is None:
+            self.cache.invalidate()
+            self.invalidation_file.parent.mkdir(parents=True, exist_ok=True)
+            self.invalidation_file.touch()
+            self._invalidated_at = self._read_invalidation_time()
+        else:
+            self.cache.invalidate(
+                [(user_id, self._feature_key) for user_id in user_ids]
+            )
+
+
+class RedisFeatureReader:
+    """
+    Reads online features straight from Feast's Redis online store.
+
+    Feast stores one Redis hash per entity and project, keyed by the
+    serialized entity key followed by the project name. The hash fields are
+    the little-endian 32 bit murmur3 hash of "<feature_view>:<feature>" and
+    hold serialized ValueProto messages. All hashes for a batch of users are
+    read with HMGET in a single pipeline and only the requested string values
+    are decoded. Rows match what OnlineFeatureReader.fetch_feast returns.
+
+    Args:
+        client (redis.Redis): Client backed by a connection pool.
+        project (str): Feast project name.
+        feature_list (list): Feature references, e.g. "demographic:Sex".
+        entity_key_serialization_version (int): From the Feast repo config.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        project: str,
+        feature_list: List[str],
+        entity_key_serialization_version: int = 2,
+    ):
+        self.client = client
+        self.project_suffix = project.encode("utf-8")
+        self.entity_key_serialization_version = entity_key_serialization_version
+        # One HMGET per feature view; remember where each field lands in the row
+        self.views = {}
+        for position, feature in enumerate(feature_list):
+            view, name = feature.split(":")
+            fields, positions = self.views.setdefault(view, ([], []))
+            fields.append(struct.pack("<I", mmh3.hash(f"{view}:{name}", signed=False)))
+            positions.append(position)
+        self.row_length = len(feature_list)
+
+    def _redis_key(self, user_id: str) -> bytes:
+        entity_key = EntityKeyProto(
+            join_keys=["user_id"], entity_values=[ValueProto(string_val=user_id)]
+        )
+        return (
+            serialize_entity_key(
+                entity_key,
+                entity_key_serialization_version=self.entity_key_serialization_version,
+            )
+            + self.project_suffix
+        )
+
+    @staticmethod
+    def _decode(raw: Optional[bytes]) -> Optional[str]:
+        if raw is None:
+            return None
+        value = ValueProto.FromString(raw)
+        return value.string_val if value.WhichOneof("val") == "string_val" else None
+
+    def fetch(self, user_ids: List[str]) -> Dict[str, tuple]:
+        pipeline = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            redis_key = self._redis_key(user_id)
+            for fields, _ in self.views.values():
+                pipeline.hmget(redis_key, fields)
+        replies = iter(pipeline.execute())
+        rows = {}
+        for user_id in user_ids:
+            row = [None] * self.row_length
+            for _, positions in self.views.values():
+                for position, raw in zip(positions, next(replies)):
+                    row[position] = self._decode(raw)
+            rows[user_id] = tuple(row)
+        return rows
@@ -1,5 +1,10 @@
 from pydantic import BaseModel
+from typing import List
 
 
 class IncomeClassifierUsers(BaseModel):
     user_id: str
+
+
+class IncomeClassifierUsersBatch(BaseModel):
+    user_ids: List[str]
@@ -0,0 +1,132 @@
+from contextlib import nullcontext
+import time
+import bentoml
+
+# Exported on the service's Prometheus /metrics endpoint
+prediction_cache_rows = bentoml.metrics.Counter(
+    name="prediction_cache_rows",
+    documentation="Rows looked up in the prediction cache, by result",
+    labelnames=["result"],
+)
+
+drift_snapshot_spool_files = bentoml.metrics.Gauge(
+    name="drift_snapshot_spool_files",
+    documentation="Drift report snapshots waiting in the local spool",
+)
+
+drift_snapshot_upload_seconds = bentoml.metrics.Histogram(
+    name="drift_snapshot_upload_seconds",
+    documentation="Time to upload one drift report snapshot to Evidently",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+drift_snapshot_uploads = bentoml.metrics.Counter(
+    name="drift_snapshot_uploads",
+    documentation="Drift report snapshots by upload result",
+    labelnames=["result"],
+)
+
+predict_requests = bentoml.metrics.Counter(
+    name="predict_requests",
+    documentation="Prediction requests by endpoint",
+    labelnames=["endpoint"],
+)
+
+# Stages are observed once per scoring call, not per request: once per
+# micro-batch on /predict, once per request on /predict_async and once per
+# request batch on /predict_batch. predict_batch_size has the users of each
+# call, so per request figures come from the two together.
+predict_stage_seconds = bentoml.metrics.Histogram(
+    name="predict_stage_seconds",
+    documentation="Time spent in each stage of one scoring call, by endpoint",
+    labelnames=["endpoint", "stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+predict_batch_size = bentoml.metrics.Histogram(
+    name="predict_batch_size",
+    documentation="Users in one scoring call, by endpoint",
+    labelnames=["endpoint"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+
+feature_cache_rows = bentoml.metrics.Counter(
+    name="feature_cache_rows",
+    documentation="Users looked up in the feature cache, by result",
+    labelnames=["result"],
+)
+
+feature_store_rows = bentoml.metrics.Counter(
+    name="feature_store_rows",
+    documentation="Users read from the online store, by whether it had features",
+    labelnames=["result"],
+)
+
+drift_queue_depth = bentoml.metrics.Gauge(
+    name="drift_queue_depth",
+    documentation="Feature batches waiting for the drift monitoring thread",
+)
+
+# Request, stage and feature lookup metrics, see enable_request_metrics
+_request_metrics_enabled = True
+_NO_TIMER = nullcontext()
+# Labelled children by label value, labels() takes a lock on every call
+_stage_histograms = {}
+_batch_size_histograms = {}
+_request_counters = {}
+
+
+def enable_request_metrics(enabled: bool):
+    global _request_metrics_enabled
+    _request_metrics_enabled = enabled
+
+
+def request_metrics_enabled() -> bool:
+    return _request_metrics_enabled
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+def stage_timer(endpoint: str, stage: str):
+    """Context manager observing its block under predict_stage_seconds."""
+    if not _request_metrics_enabled:
+        return _NO_TIMER
+    histogram = _stage_histograms.get((endpoint, stage))
+    if histogram is None:
+        histogram = _stage_histograms[(endpoint, stage)] = predict_stage_seconds.labels(
+            endpoint=endpoint, stage=stage
+        )
+    return _StageTimer(histogram)
+
+
+def observe_batch_size(endpoint: str, size: int):
+    if not _request_metrics_enabled:
+        return
+    histogram = _batch_size_histograms.get(endpoint)
+    if histogram is None:
+        histogram = _batch_size_histograms[endpoint] = predict_batch_size.labels(
+            endpoint=endpoint
+        )
+    histogram.observe(size)
+
+
+def count_request(endpoint: str):
+    if not _request_metrics_enabled:
+        return
+    counter = _request_counters.get(endpoint)
+    if counter is None:
+        counter = _request_counters[endpoint] = predict_requests.labels(
+            endpoint=endpoint
+        )
+    counter.inc()
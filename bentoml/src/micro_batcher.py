@@ -0,0 +1,87 @@
+from typing import Any, Awaitable, Callable, List
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item calls into batched calls of batch_fn.
+
+    Requests queue up while the previous batch is being processed and are sent
+    together in the next batch, up to max_batch_size. The batcher only waits
+    for more requests (at most max_wait_ms) once it has seen batches of more
+    than one item, so a lightly loaded worker does not pay the wait.
+
+    Everything runs on the event loop of the API worker: batch_fn is a
+    coroutine function, so the runner is called with async_run and no thread
+    of the batcher's own needs an AnyIO context. The batching task starts
+    with the first submit, on the loop serving the requests.
+
+    Args:
+        batch_fn (Callable): Coroutine function taking a list of items and
+            returning a list of results in the same order.
+        max_batch_size (int): Maximum number of items per batch_fn call.
+        max_wait_ms (float): Maximum time to hold a batch open for more items.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int,
+        max_wait_ms: float,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = float(max_wait_ms) / 1000
+        self.avg_batch_size = 1.0
+        self._pending = []
+        self._wakeup = None
+        self._worker = None
+
+    async def submit(self, item: Any) -> Any:
+        if self._worker is None:
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        self._wakeup.set()
+        return await future
+
+    async def _collect(self) -> list:
+        while not self._pending:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        wait = self.max_wait if self.avg_batch_size > 1.5 else 0.0
+        deadline = time.monotonic() + wait
+        while len(self._pending) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        batch = self._pending[: self.max_batch_size]
+        del self._pending[: self.max_batch_size]
+        self.avg_batch_size = 0.9 * self.avg_batch_size + 0.1 * len(batch)
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                results = await self.batch_fn([item for item, _ in batch])
+            except Exception as e:
+                logger.exception("Batch of %d failed", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                # The request may have been cancelled while it was scored
+                if not future.done():
+                    future.set_result(result)
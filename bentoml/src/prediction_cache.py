@@ -0,0 +1,66 @@
+from typing import Any, Awaitable, Callable, List, Tuple
+import pandas as pd
+from src.cache import LRUCache
+from src.metrics import prediction_cache_rows
+
+_MISSING = object()
+
+
+class PredictionCache:
+    """
+    Caches model outputs keyed by the loaded model version and the fetched
+    feature values of a row. Hits skip encoding and the runner; only the
+    missing rows are passed on to the score function. The model version is
+    part of every key, so entries cached for another model never match.
+
+    Args:
+        cache (LRUCache): Backing cache, max_size 0 disables caching.
+        model_version (str): Identifies the loaded model.
+    """
+
+    def __init__(self, cache: LRUCache, model_version: str):
+        self.cache = cache
+        self.model_version = model_version
+
+    def _lookup(self, feature_df: pd.DataFrame) -> Tuple[list, list, list]:
+        if self.cache.max_size <= 0:
+            return [None] * len(feature_df), [], list(range(len(feature_df)))
+        keys = [
+            # NaN != NaN, so missing values are normalised to keep keys stable
+            (self.model_version, tuple(None if v != v else v for v in row))
+            for row in feature_df.itertuples(index=False, name=None)
+        ]
+        predictions = [self.cache.get(key, _MISSING) for key in keys]
+        misses = [i for i, p in enumerate(predictions) if p is _MISSING]
+        prediction_cache_rows.labels(result="hit").inc(len(keys) - len(misses))
+        prediction_cache_rows.labels(result="miss").inc(len(misses))
+        return predictions, keys, misses
+
+    def _fill(self, predictions: list, keys: list, misses: list, scored: List[Any]):
+        for position, prediction in zip(misses, scored):
+            predictions[position] = prediction
+            if keys:
+                self.cache.put(keys[position], prediction)
+        return predictions
+
+    def predict(
+        self,
+        feature_df: pd.DataFrame,
+        score: Callable[[pd.DataFrame], List[Any]],
+    ) -> List[Any]:
+        predictions, keys, misses = self._lookup(feature_df)
+        if not misses:
+            return predictions
+        scored = score(feature_df.iloc[misses])
+        return self._fill(predictions, keys, misses, scored)
+
+    async def predict_async(
+        self,
+        feature_df: pd.DataFrame,
+        score: Callable[[pd.DataFrame], Awaitable[List[Any]]],
+    ) -> List[Any]:
+        predictions, keys, misses = self._lookup(feature_df)
+        if not misses:
+            return predictions
+        scored = await score(feature_df.iloc[misses])
+        return self._fill(predictions, keys, misses, scored)
@@ -0,0 +1,119 @@
+# Shared by the BentoML service (bentoml/src/reference_dataset.py) and the pipeline's
+# detect_drift step (evidently/kubeflow-pipeline/src/detect_drift/reference_dataset.py).
+# The pipeline image is built from the kubeflow-pipeline directory alone and
+# cannot import the bentoml sources, so the file is kept twice; the two
+# copies must stay identical, see bentoml/scripts/check_shared_copies.py.
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+DATASET_FILE_NAME = "reference_dataset.parquet"
+_PARQUET_SUFFIXES = (".parquet", ".pq")
+
+
+def is_parquet(path: str) -> bool:
+    return str(path).lower().endswith(_PARQUET_SUFFIXES)
+
+
+def to_categorical(data: pd.DataFrame) -> pd.DataFrame:
+    """Turns the text columns of data into pandas categoricals."""
+    text_columns = [
+        column
+        for column in data.columns
+        if pd.api.types.is_object_dtype(data[column])
+        or pd.api.types.is_string_dtype(data[column])
+    ]
+    return data.astype({column: "category" for column in text_columns})
+
+
+def _observed_values(series: pd.Series) -> list:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = np.unique(series.cat.codes)
+        return list(series.cat.categories[codes[codes >= 0]])
+    return list(pd.unique(series.dropna()))
+
+
+def align_categories(
+    reference: pd.DataFrame, current: pd.DataFrame
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Returns reference and current with one categorical dtype for every column
+    that is categorical in either of them, made of the values seen in both.
+    Evidently fails on columns whose dtypes differ when one is categorical,
+    e.g. a reference read by read_reference_dataset against text features.
+    """
+    reference, current = reference.copy(deep=False), current.copy(deep=False)
+    for column in reference.columns.intersection(current.columns):
+        if not (
+            isinstance(reference[column].dtype, pd.CategoricalDtype)
+            or isinstance(current[column].dtype, pd.CategoricalDtype)
+        ):
+            continue
+        dtype = pd.CategoricalDtype(
+            list(
+                dict.fromkeys(
+                    _observed_values(reference[column])
+                    + _observed_values(current[column])
+                )
+            )
+        )
+        reference[column] = reference[column].astype(dtype)
+        current[column] = current[column].astype(dtype)
+    return reference, current
+
+
+def write_reference_dataset(data: pd.DataFrame, path: str):
+    """
+    Writes data as Parquet with dictionary-encoded text columns, so a
+    reference of a few distinct values per column is a few bytes per row on
+    disk and in memory once read back.
+    """
+    to_categorical(data).to_parquet(path, engine="pyarrow", index=False)
+
+
+def read_reference_dataset(
+    path: str, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Reads a reference dataset with its text columns as categoricals. Parquet
+    is memory-mapped and only the requested columns are read; text columns
+    are decoded straight into dictionaries, without a string per row. Other
+    files are read as CSV, which is what earlier runs logged.
+
+    Args:
+        path (str): Parquet or CSV file.
+        columns (list): Columns to read, the ones not in the dataset are
+            skipped. All columns when None.
+    """
+    if not is_parquet(path):
+        data = pd.read_csv(
+            path, usecols=None if columns is None else lambda c: c in columns
+        )
+        return to_categorical(data)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pq.read_schema(path)
+    if columns is not None:
+        columns = [column for column in columns if column in schema.names]
+    text_columns = [
+        field.name
+        for field in schema
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type)
+    ]
+    table = pq.read_table(
+        path, columns=columns, memory_map=True, read_dictionary=text_columns
+    )
+    # Frees each column of the table once it is converted
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def convert_reference_dataset(path: str, parquet_path: str) -> str:
+    """
+    Returns path if it is already Parquet, otherwise writes the CSV at path
+    to parquet_path and returns parquet_path.
+    """
+    if is_parquet(path):
+        return path
+    write_reference_dataset(read_reference_dataset(path), parquet_path)
+    return parquet_path
@@ -0,0 +1,124 @@
+# Shared by the BentoML service (bentoml/src/reference_profile.py) and the pipeline's
+# detect_drift step (evidently/kubeflow-pipeline/src/detect_drift/reference_profile.py).
+# The pipeline image is built from the kubeflow-pipeline directory alone and
+# cannot import the bentoml sources, so the file is kept twice; the two
+# copies must stay identical, see bentoml/scripts/check_shared_copies.py.
+from typing import Any, Dict, List, Optional
+import json
+import numpy as np
+import pandas as pd
+
+PROFILE_FILE_NAME = "reference_profile.json"
+PROFILE_FORMAT_VERSION = 1
+
+
+def _nullable(dtype):
+    """A dtype of the same kind that can hold missing values."""
+    if dtype.kind in "iu":
+        # int32 -> Int32, uint8 -> UInt8
+        return pd.api.types.pandas_dtype(
+            dtype.name.replace("uint", "UInt").replace("int", "Int")
+        )
+    if dtype.kind == "b":
+        return pd.BooleanDtype()
+    return dtype
+
+
+class ReferenceProfile:
+    """
+    Per-column value frequencies of a reference dataset, with its row count
+    and schema. For categorical data this is a few hundred numbers instead of
+    the full dataset, and it is all a categorical drift test needs.
+
+    to_dataframe rebuilds a frame with exactly the same per-column counts,
+    missing values included, so Evidently gets the same drift and summary
+    results from it as from the original data. Row-wise combinations of
+    values are not kept.
+
+    Args:
+        row_count (int): Rows in the reference dataset.
+        schema (dict): Column name -> pandas dtype name.
+        counts (dict): Column name -> list of [value, count], missing values
+            excluded.
+    """
+
+    def __init__(
+        self,
+        row_count: int,
+        schema: Dict[str, str],
+        counts: Dict[str, List[List[Any]]],
+    ):
+        self.row_count = int(row_count)
+        self.schema = schema
+        self.counts = counts
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.schema)
+
+    @classmethod
+    def from_dataframe(
+        cls, data: pd.DataFrame, columns: Optional[List[str]] = None
+    ) -> "ReferenceProfile":
+        columns = list(data.columns) if columns is None else columns
+        counts = {}
+        for column in columns:
+            value_counts = data[column].value_counts(dropna=True, sort=False)
+            counts[column] = [
+                [value.item() if isinstance(value, np.generic) else value, int(n)]
+                for value, n in value_counts.items()
+                # Categoricals also count their unused categories
+                if n > 0
+            ]
+        return cls(
+            row_count=data.shape[0],
+            schema={column: str(data[column].dtype) for column in columns},
+            counts=counts,
+        )
+
+    def value_counts(self, column: str) -> Dict[Any, int]:
+        return {value: n for value, n in self.counts[column]}
+
+    def to_dataframe(self) -> pd.DataFrame:
+        data = {}
+        for column, dtype in self.schema.items():
+            values = [value for value, _ in self.counts[column]]
+            counts = [n for _, n in self.counts[column]]
+            # Missing values (code -1) go last, to keep the row count
+            codes = np.repeat(np.arange(len(values)), counts)
+            codes = np.append(codes, np.full(self.row_count - codes.size, -1))
+            dtype = pd.api.types.pandas_dtype(dtype)
+            if pd.api.types.is_numeric_dtype(dtype):
+                if codes.size and codes[-1] == -1:
+                    dtype = _nullable(dtype)
+                series = pd.Series(
+                    np.array(values + [None], dtype=object)[codes]
+                ).astype(dtype)
+            else:
+                # Text columns are categoricals, as read_reference_dataset
+                # returns them
+                series = pd.Series(pd.Categorical.from_codes(codes, values))
+            data[column] = series
+        return pd.DataFrame(data, columns=self.columns)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format_version": PROFILE_FORMAT_VERSION,
+            "row_count": self.row_count,
+            "schema": self.schema,
+            "counts": self.counts,
+        }
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> "ReferenceProfile":
+        with open(path) as f:
+            profile = json.load(f)
+        if profile.get("format_version") != PROFILE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported reference profile version {profile.get('format_version')}"
+            )
+        return cls(profile["row_count"], profile["schema"], profile["counts"])
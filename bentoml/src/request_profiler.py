@@ -0,0 +1,231 @@
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Callable, Dict, Optional
+import cProfile
+import datetime
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_NOT_PROFILED = nullcontext()
+
+
+class RequestProfiler:
+    """
+    Profiles a sample of live requests with cProfile and writes aggregated
+    pstats files, one per profiled name and flush, to output_dir.
+
+    profile(name) returns a context manager. A request is profiled with
+    probability sample_rate, or always while a window started with
+    start_window is open. One request is profiled at a time, the others run
+    unprofiled, so the overhead stays bounded; when nothing is profiled it is
+    a random draw per request. Profiles of the same name are summed and
+    flushed every flush_interval_seconds and when a window closes. Only the
+    newest max_files files are kept. Open them with pstats or snakeviz.
+
+    Coroutines use profile_async(name) instead: only the synchronous sections
+    it is given are profiled, on the event loop or in executor threads, so the
+    other requests the loop serves during an await stay out of the profile.
+
+    On Python 3.12+ cProfile records every thread while enabled, so a
+    profile also holds what other threads did during the request.
+
+    Args:
+        output_dir (str): Directory of the pstats files.
+        sample_rate (float): Share of requests profiled outside windows.
+        flush_interval_seconds (float): Longest time profiles are held back.
+        max_files (int): Profile files kept in output_dir.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        sample_rate: float = 0.0,
+        flush_interval_seconds: float = 60.0,
+        max_files: int = 100,
+    ):
+        self.output_dir = Path(output_dir)
+        self.sample_rate = float(sample_rate)
+        self.flush_interval_seconds = float(flush_interval_seconds)
+        self.max_files = int(max_files)
+        self._window_end = 0.0
+        self._window_timer: Optional[threading.Timer] = None
+        # Held by the request being profiled
+        self._profiling = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, pstats.Stats] = {}
+        self._next_flush = time.monotonic() + self.flush_interval_seconds
+        self.profiled = 0
+        self.files_written = 0
+
+    def window_open(self) -> bool:
+        return time.monotonic() < self._window_end
+
+    def _sampled(self, force: bool) -> bool:
+        if not (
+            force
+            or time.monotonic() < self._window_end
+            or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        ):
+            return False
+        # False while another request is being profiled
+        return self._profiling.acquire(blocking=False)
+
+    def profile(self, name: str, force: bool = False):
+        """Context manager profiling its block if this request is sampled."""
+        if not self._sampled(force):
+            return _NOT_PROFILED
+        return _ProfiledBlock(self, name)
+
+    def profile_async(self, name: str, force: bool = False):
+        """
+        Context manager for a request split by awaits. The object it returns
+        on enter marks the synchronous work to profile with section() and
+        wrap(fn); both profile nothing if the request is not sampled.
+        """
+        if not self._sampled(force):
+            return _NOT_PROFILED_SECTIONS
+        return _ProfiledSections(self, name)
+
+    def start_window(self, seconds: float):
+        """Profiles every request for the next seconds, then flushes."""
+        self._window_end = time.monotonic() + float(seconds)
+        if self._window_timer is not None:
+            self._window_timer.cancel()
+        self._window_timer = threading.Timer(float(seconds), self.flush)
+        self._window_timer.daemon = True
+        self._window_timer.start()
+        logger.info(f"Profiling every request for {seconds}s")
+
+    def _add(self, name: str, profile: cProfile.Profile):
+        with self._stats_lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                self._stats[name] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            self.profiled += 1
+        if time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        """Writes the profiles gathered since the last flush."""
+        with self._stats_lock:
+            stats, self._stats = self._stats, {}
+            self._next_flush = time.monotonic() + self.flush_interval_seconds
+        if not stats:
+            return
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+        for name, name_stats in stats.items():
+            path = self.output_dir / f"{name}-{timestamp}-{os.getpid()}.pstats"
+            name_stats.dump_stats(str(path))
+            self.files_written += 1
+        files = sorted(self.output_dir.glob("*.pstats"), key=os.path.getmtime)
+        for path in files[: max(0, len(files) - self.max_files)]:
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "sample_rate": self.sample_rate,
+            "window_seconds_left": max(0.0, self._window_end - time.monotonic()),
+            "profiled": self.profiled,
+            "files_written": self.files_written,
+        }
+
+
+class _ProfiledBlock:
+    __slots__ = ("profiler", "name", "profile")
+
+    def __init__(self, profiler: RequestProfiler, name: str):
+        self.profiler = profiler
+        self.name = name
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Another profiling tool is active (Python 3.12+)
+            self.profile = None
+
+    def __exit__(self, *exc_info):
+        try:
+            if self.profile is not None:
+                self.profile.disable()
+                self.profiler._add(self.name, self.profile)
+        finally:
+            self.profiler._profiling.release()
+
+
+class _NotProfiledSections:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def section(self):
+        return _NOT_PROFILED
+
+    def wrap(self, fn: Callable) -> Callable:
+        return fn
+
+
+_NOT_PROFILED_SECTIONS = _NotProfiledSections()
+
+
+class _ProfiledSections:
+    __slots__ = ("profiler", "name", "profile", "sections")
+
+    def __init__(self, profiler: RequestProfiler, name: str):
+        self.profiler = profiler
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.sections = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if self.profile is not None and self.sections:
+                self.profiler._add(self.name, self.profile)
+        finally:
+            self.profiler._profiling.release()
+
+    @contextmanager
+    def section(self):
+        # The sections of one request run one after the other, possibly in
+        # different threads, so the same profile is enabled for each of them
+        if self.profile is None:
+            yield
+            return
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Another profiling tool is active (Python 3.12+)
+            self.profile = None
+            yield
+            return
+        try:
+            yield
+        finally:
+            self.profile.disable()
+            self.sections += 1
+
+    def wrap(self, fn: Callable) -> Callable:
+        """Returns fn profiled as a section, e.g. to run in an executor."""
+
+        def profiled(*args, **kwargs):
+            with self.section():
+                return fn(*args, **kwargs)
+
+        return profiled
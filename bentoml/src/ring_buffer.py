@@ -0,0 +1,141 @@
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+# Below this many rows a plain dict lookup per value beats factorizing
+_SMALL_BATCH_ROWS = 64
+
+
+class CategoryCodes:
+    """
+    Per-column code tables mapping category values to consecutive integer
+    codes in order of first appearance. Missing values have code -1.
+
+    Args:
+        columns (list): Column names.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = list(columns)
+        self.categories = {column: [] for column in self.columns}
+        self._code_of = {column: {} for column in self.columns}
+
+    def _code(self, column: str, value) -> int:
+        if value is None or value != value:
+            return -1
+        code = self._code_of[column].get(value)
+        if code is None:
+            code = self._code_of[column][value] = len(self.categories[column])
+            self.categories[column].append(value)
+        return code
+
+    def encode(self, column: str, values) -> np.ndarray:
+        """Returns the codes of values, registering unseen categories."""
+        if len(values) <= _SMALL_BATCH_ROWS:
+            return np.array([self._code(column, v) for v in values], dtype=np.int32)
+        # Look up each distinct value once; factorize codes missing as -1
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        unique_codes = np.array(
+            [self._code(column, value) for value in uniques] + [-1], dtype=np.int32
+        )
+        return unique_codes[codes]
+
+
+class CategoricalRingBuffer(CategoryCodes):
+    """
+    Fixed-capacity sliding window of categorical rows, stored column-wise.
+
+    Each column keeps integer category codes in a preallocated NumPy array
+    plus the code -> value table, so appending a row writes one slot per
+    column and never copies the window. Missing values are stored as -1.
+    A DataFrame is only materialised by to_dataframe, oldest row first.
+
+    Args:
+        columns (list): Column names of the window.
+        capacity (int): Number of rows kept.
+    """
+
+    def __init__(self, columns: List[str], capacity: int):
+        super().__init__(columns)
+        self.capacity = int(capacity)
+        self.codes = {
+            column: np.full(self.capacity, -1, dtype=np.int32)
+            for column in self.columns
+        }
+        self.head = 0  # slot the next row is written to
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(
+        self, rows: pd.DataFrame
+    ) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """
+        Appends rows, evicting the oldest ones beyond capacity. Returns the
+        codes that were written and the codes that were overwritten, per
+        column.
+        """
+        n_rows = rows.shape[0]
+        skip = max(0, n_rows - self.capacity)
+        n_write = n_rows - skip
+        n_evicted = max(0, self.size + n_write - self.capacity)
+        if n_write == 1:
+            slots = slice(self.head, self.head + 1)
+            evicted_slots = slots if n_evicted else slice(0, 0)
+        else:
+            slots = (self.head + np.arange(n_write)) % self.capacity
+            # Once full, the oldest rows sit right after the newest ones
+            evicted_slots = (
+                self.head - self.size + np.arange(n_evicted)
+            ) % self.capacity
+        if list(rows.columns) != self.columns:
+            rows = rows[self.columns]
+        # One conversion for all columns is much cheaper than per-column access
+        values = rows.to_numpy(dtype=object)[skip:]
+        written, evicted = {}, {}
+        for i, column in enumerate(self.columns):
+            written[column] = self.encode(column, values[:, i])
+            evicted[column] = self.codes[column][evicted_slots].copy()
+            self.codes[column][slots] = written[column]
+        self.head = (self.head + n_write) % self.capacity
+        self.size = min(self.capacity, self.size + n_write)
+        return written, evicted
+
+    def replace(
+        self, rows: pd.DataFrame, slots: np.ndarray
+    ) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """
+        Overwrites the rows in the given slots of a full window, for windows
+        kept as a sample rather than in arrival order. A slot given several
+        times keeps its last row. Returns the codes that were written and
+        the codes that were overwritten, per column.
+        """
+        slots = np.asarray(slots)
+        # Later rows win, as if they had been written one after the other
+        _, last_from_end = np.unique(slots[::-1], return_index=True)
+        if len(last_from_end) < len(slots):
+            keep = np.sort(len(slots) - 1 - last_from_end)
+            rows, slots = rows.iloc[keep], slots[keep]
+        if list(rows.columns) != self.columns:
+            rows = rows[self.columns]
+        values = rows.to_numpy(dtype=object)
+        written, evicted = {}, {}
+        for i, column in enumerate(self.columns):
+            written[column] = self.encode(column, values[:, i])
+            evicted[column] = self.codes[column][slots].copy()
+            self.codes[column][slots] = written[column]
+        return written, evicted
+
+    def ordered_codes(self, column: str) -> np.ndarray:
+        start = (self.head - self.size) % self.capacity
+        slots = (start + np.arange(self.size)) % self.capacity
+        return self.codes[column][slots]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        data = {}
+        for column in self.columns:
+            # Trailing None decodes the missing-value code -1
+            values = np.array(self.categories[column] + [None], dtype=object)
+            data[column] = values[self.ordered_codes(column)]
+        return pd.DataFrame(data, columns=self.columns)
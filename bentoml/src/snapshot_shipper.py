@@ -0,0 +1,223 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from src.metrics import (
+    drift_snapshot_spool_files,
+    drift_snapshot_upload_seconds,
+    drift_snapshot_uploads,
+)
+
+if TYPE_CHECKING:
+    from evidently.report import Report
+    from evidently.ui.workspace import Workspace
+
+logger = logging.getLogger(__name__)
+
+_SPOOL_SUFFIX = ".json"
+# A shipper renames the snapshots it is uploading to
+# <name>.<claim time ns>.<shipper id>.uploading
+_CLAIM_SUFFIX = ".uploading"
+
+
+class SnapshotShipper:
+    """
+    Ships Evidently report snapshots to the workspace from a background
+    thread, so a slow or unavailable Evidently service never blocks the
+    caller and reports survive worker restarts.
+
+    submit saves the snapshot to a bounded on-disk spool; snapshots beyond
+    max_spool_files are dropped. The thread uploads up to batch_size
+    snapshots, oldest first, per round. After a failed upload it backs off
+    exponentially, with jitter, up to max_backoff_seconds. Workers on the same
+    node may share the spool directory: each claims a snapshot by renaming it
+    before uploading. A claim carries its time and the shipper's own id, not
+    the pid, which a restarted container hands out again. Claims older than
+    claim_timeout_seconds are taken to belong to a shipper that died
+    mid-upload and are put back by any shipper; the timeout must be well
+    above the longest upload.
+
+    Args:
+        workspace_factory (callable): Returns the Evidently workspace, called
+            on the first upload.
+        spool_dir (str): Directory of the spooled snapshots.
+        max_spool_files (int): Spool capacity in snapshots.
+        batch_size (int): Snapshots uploaded per round.
+        max_backoff_seconds (float): Upper bound of the retry delay.
+        poll_interval_seconds (float): Idle wait between spool scans, and the
+            first retry delay.
+        claim_timeout_seconds (float): Age after which a claimed snapshot is
+            put back in the spool.
+    """
+
+    def __init__(
+        self,
+        workspace_factory: Callable[[], "Workspace"],
+        spool_dir: str,
+        max_spool_files: int = 1000,
+        batch_size: int = 20,
+        max_backoff_seconds: float = 300,
+        poll_interval_seconds: float = 1.0,
+        claim_timeout_seconds: float = 600,
+    ):
+        self.workspace_factory = workspace_factory
+        self._workspace: Optional["Workspace"] = None
+        self.spool_dir = Path(spool_dir)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.max_spool_files = int(max_spool_files)
+        self.batch_size = int(batch_size)
+        self.max_backoff_seconds = float(max_backoff_seconds)
+        self.poll_interval_seconds = float(poll_interval_seconds)
+        self.claim_timeout_seconds = float(claim_timeout_seconds)
+        self.shipper_id = uuid.uuid4().hex
+        self.consecutive_failures = 0
+        self.uploaded = 0
+        self.upload_failures = 0
+        self.dropped = 0
+        self.last_upload_seconds: Optional[float] = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._release_orphaned_claims()
+        self._worker = threading.Thread(
+            target=self._run, name="snapshot-shipper", daemon=True
+        )
+        self._worker.start()
+
+    @property
+    def workspace(self) -> "Workspace":
+        if self._workspace is None:
+            self._workspace = self.workspace_factory()
+        return self._workspace
+
+    def spooled(self) -> List[Path]:
+        return sorted(self.spool_dir.glob(f"*{_SPOOL_SUFFIX}"))
+
+    def spool_size(self) -> int:
+        """Spooled snapshots, including the ones being uploaded."""
+        return len(self.spooled()) + len(list(self.spool_dir.glob(f"*{_CLAIM_SUFFIX}")))
+
+    def submit(self, project_id: str, report: "Report") -> bool:
+        """Spools the report's current snapshot. Returns False if dropped."""
+        spool_size = self.spool_size()
+        if spool_size >= self.max_spool_files:
+            self.dropped += 1
+            drift_snapshot_uploads.labels(result="dropped").inc()
+            logger.warning("Snapshot spool full, dropping the report")
+            return False
+        # Names sort by creation time; the project travels in the name
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}-{project_id}"
+        tmp_path = self.spool_dir / f".{name}.tmp"
+        report.save(str(tmp_path))
+        os.replace(tmp_path, self.spool_dir / f"{name}{_SPOOL_SUFFIX}")
+        drift_snapshot_spool_files.set(spool_size + 1)
+        self._wakeup.set()
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "spool_files": self.spool_size(),
+            "spool_capacity": self.max_spool_files,
+            "uploaded": self.uploaded,
+            "upload_failures": self.upload_failures,
+            "dropped": self.dropped,
+            "consecutive_failures": self.consecutive_failures,
+            "last_upload_seconds": self.last_upload_seconds,
+        }
+
+    def close(self, timeout: Optional[float] = None):
+        """Stops the upload thread, spooled snapshots stay for the next start."""
+        self._stopped.set()
+        self._wakeup.set()
+        self._worker.join(timeout)
+
+    def _release_orphaned_claims(self):
+        oldest = time.time_ns() - int(self.claim_timeout_seconds * 1e9)
+        for path in self.spool_dir.glob(f"*{_CLAIM_SUFFIX}"):
+            name, _, claim = path.name.partition(_SPOOL_SUFFIX + ".")
+            # Claims named <name>.<pid>.uploading predate claim times and
+            # read as ancient
+            claimed_ns = claim.split(".")[0]
+            if claimed_ns.isdigit() and int(claimed_ns) >= oldest:
+                continue
+            try:
+                os.replace(path, self.spool_dir / f"{name}{_SPOOL_SUFFIX}")
+            except FileNotFoundError:
+                pass  # Uploaded or put back meanwhile
+
+    def _claim(self, path: Path) -> Optional[Path]:
+        claimed = path.with_name(
+            f"{path.name}.{time.time_ns()}.{self.shipper_id}{_CLAIM_SUFFIX}"
+        )
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            return None  # Claimed by another worker
+        return claimed
+
+    def _upload(self, path: Path):
+        from evidently.suite.base_suite import Snapshot
+
+        claimed = self._claim(path)
+        if claimed is None:
+            return
+        project_id = path.name[: -len(_SPOOL_SUFFIX)].split("-", 2)[2]
+        try:
+            snapshot = Snapshot.load(str(claimed))
+        except Exception:
+            # Retrying cannot fix an unreadable file, keep it aside
+            os.replace(claimed, path.with_name(f"{path.name}.invalid"))
+            drift_snapshot_uploads.labels(result="invalid").inc()
+            logger.exception(f"Snapshot {path.name} is unreadable, skipping it")
+            return
+        start = time.perf_counter()
+        try:
+            self.workspace.add_snapshot(project_id, snapshot)
+        except Exception:
+            try:
+                os.replace(claimed, path)
+            except FileNotFoundError:
+                pass  # Put back after claim_timeout_seconds
+            drift_snapshot_uploads.labels(result="failure").inc()
+            raise
+        self.last_upload_seconds = time.perf_counter() - start
+        drift_snapshot_upload_seconds.observe(self.last_upload_seconds)
+        drift_snapshot_uploads.labels(result="success").inc()
+        # Missing when the upload outlasted claim_timeout_seconds and the
+        # snapshot went back to the spool; it is then uploaded again
+        claimed.unlink(missing_ok=True)
+        self.uploaded += 1
+
+    def _backoff_seconds(self) -> float:
+        delay = min(
+            self.max_backoff_seconds,
+            self.poll_interval_seconds * 2 ** (self.consecutive_failures - 1),
+        )
+        return delay * random.uniform(0.5, 1.0)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            try:
+                # Another worker on the node may have died mid-upload
+                self._release_orphaned_claims()
+                for path in self.spooled()[: self.batch_size]:
+                    if self._stopped.is_set():
+                        break
+                    self._upload(path)
+            except Exception:
+                self.consecutive_failures += 1
+                self.upload_failures += 1
+                delay = self._backoff_seconds()
+                logger.exception(f"Snapshot upload failed, retrying in {delay:.1f}s")
+                drift_snapshot_spool_files.set(self.spool_size())
+                # New submits do not cut the backoff short
+                self._stopped.wait(delay)
+                continue
+            self.consecutive_failures = 0
+            drift_snapshot_spool_files.set(self.spool_size())
+            if not self.spooled():
+                self._wakeup.wait(self.poll_interval_seconds)
@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from minio import Minio
+
+# Uploads a generated entity file of the requested size to MinIO and runs
+# the read_data component on it in both copy modes, each in a fresh process.
+# Prints the wall time and the peak RSS (VmHWM) of the process. Needs a MinIO
+# reachable with MINIO_HOST, MINIO_ACCESS_KEY and MINIO_SECRET_KEY.
+SRC_DIR = Path(__file__).resolve().parents[1] / "src" / "read_data"
+ROWS_PER_GROUP = 1_000_000
+
+
+def write_entity_file(path: str, target_bytes: int):
+    """Writes user_id / event_timestamp rows until the file is target_bytes."""
+    rng = np.random.default_rng(0)
+    schema = pa.schema(
+        [("user_id", pa.string()), ("event_timestamp", pa.timestamp("us"))]
+    )
+    with pq.ParquetWriter(path, schema) as writer:
+        while os.path.getsize(path) < target_bytes:
+            user_ids = rng.integers(0, 2**62, ROWS_PER_GROUP).astype(str)
+            timestamps = pd.Timestamp("2024-01-01") + pd.to_timedelta(
+                rng.integers(0, 365 * 86400, ROWS_PER_GROUP), unit="s"
+            )
+            writer.write_table(
+                pa.table(
+                    {"user_id": user_ids, "event_timestamp": timestamps},
+                    schema=schema,
+                )
+            )
+
+
+def run_component(copy_mode: str, bucket: str, object_name: str, output: str):
+    code = (
+        f"import json, sys, time; sys.path.insert(0, {str(SRC_DIR)!r});"
+        "from read_data import get_data;"
+        "start = time.perf_counter();"
+        f"get_data({os.environ['MINIO_HOST']!r}, {os.environ['MINIO_ACCESS_KEY']!r},"
+        f" {os.environ['MINIO_SECRET_KEY']!r}, {bucket!r}, {object_name!r},"
+        f" {output!r}, copy_mode={copy_mode!r},"
+        " required_columns=['user_id', 'event_timestamp']);"
+        "print(json.dumps({'seconds': time.perf_counter() - start,"
+        " 'peak_rss_kb': int([line for line in open('/proc/self/status')"
+        " if line.startswith('VmHWM')][0].split()[1])}))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size_gb", type=float, default=2.0)
+    parser.add_argument("--bucket", type=str, default="benchmark")
+    args = parser.parse_args()
+
+    client = Minio(
+        os.environ["MINIO_HOST"],
+        access_key=os.environ["MINIO_ACCESS_KEY"],
+        secret_key=os.environ["MINIO_SECRET_KEY"],
+        secure=False,
+    )
+    if not client.bucket_exists(args.bucket):
+        client.make_bucket(args.bucket)
+    object_name = f"entity_{args.size_gb:g}gb.parquet"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = os.path.join(tmp_dir, object_name)
+        write_entity_file(source, int(args.size_gb * 2**30))
+        size = os.path.getsize(source)
+        client.fput_object(args.bucket, object_name, source)
+        os.remove(source)
+
+        print("copy_mode,file_gb,seconds,peak_rss_mb")
+        for copy_mode in ("stream", "rewrite"):
+            output = os.path.join(tmp_dir, copy_mode, "data_output")
+            result = run_component(copy_mode, args.bucket, object_name, output)
+            assert pq.read_metadata(output).num_rows > 0
+            print(
+                f"{copy_mode},{size / 2**30:.2f},{result['seconds']:.1f},"
+                f"{result['peak_rss_kb'] / 1024:.0f}"
+            )
+            os.remove(output)
+        # Rewrite mode leaves its download in /tmp
+        Path("/tmp", object_name).unlink(missing_ok=True)
+    client.remove_object(args.bucket, object_name)
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from feast import Entity, FeatureStore, FeatureView, Field, FileSource
+from feast.types import Float32
+
+# Retrieves the historical features of a generated entity Dataset from a
+# local file-backed feature repo, once with a single get_historical_features
+# call and once chunked, each in a fresh process. Prints the wall time, the
+# peak RSS of the process (VmHWM) and of its largest worker and the row
+# groups written, and checks that both outputs hold the same rows.
+SRC_DIR = Path(__file__).resolve().parents[1] / "src" / "retrieve_features"
+N_FEATURES = 8
+FEATURE_STORE_YAML = """\
+project: benchmark
+registry: data/registry.db
+provider: local
+online_store:
+  type: sqlite
+  path: data/online_store.db
+offline_store:
+  type: file
+entity_key_serialization_version: 2
+"""
+
+
+def create_repo(repo_path: str, n_users: int, n_entities: int, rng) -> pd.DataFrame:
+    """Writes and applies a feature repo, returns an entity DataFrame."""
+    start = pd.Timestamp("2024-01-01", tz="UTC")
+    n_rows = n_users * 10
+    features = pd.DataFrame(
+        {
+            "user_id": np.arange(n_rows) % n_users,
+            "event_timestamp": start
+            + pd.to_timedelta(rng.integers(0, 365 * 86400, n_rows), unit="s"),
+            **{
+                f"f{i}": rng.random(n_rows).astype("float32") for i in range(N_FEATURES)
+            },
+        }
+    )
+    features_path = os.path.join(repo_path, "features.parquet")
+    features.to_parquet(features_path, index=False)
+    Path(repo_path, "data").mkdir(exist_ok=True)
+    Path(repo_path, "feature_store.yaml").write_text(FEATURE_STORE_YAML)
+
+    user = Entity(name="user", join_keys=["user_id"])
+    view = FeatureView(
+        name="user_features",
+        entities=[user],
+        ttl=timedelta(days=365),
+        schema=[Field(name=f"f{i}", dtype=Float32) for i in range(N_FEATURES)],
+        source=FileSource(path=features_path, timestamp_field="event_timestamp"),
+    )
+    FeatureStore(repo_path=repo_path).apply([user, view])
+    return pd.DataFrame(
+        {
+            "user_id": rng.integers(0, n_users, n_entities),
+            "event_timestamp": start
+            + pd.to_timedelta(rng.integers(0, 400 * 86400, n_entities), unit="s"),
+        }
+    )
+
+
+def run(repo_path: str, entity_path: str, output: str, chunk_size: int, workers: int):
+    """Retrieves the features in a new process, returns its measurements."""
+    feature_list = [f"user_features:f{i}" for i in range(N_FEATURES)]
+    code = (
+        f"import json, os, resource, sys, time; sys.path.insert(0, {str(SRC_DIR)!r});"
+        f"os.chdir({repo_path!r});"
+        "import pandas as pd;"
+        "from feast import FeatureStore;"
+        "from retrieve_features import OUTPUT_ROW_GROUP_ROWS,"
+        " write_historical_features;"
+        f"entity_df = pd.read_parquet({entity_path!r});"
+        "start = time.perf_counter();"
+        + (
+            f"FeatureStore(repo_path='.').get_historical_features("
+            f"entity_df=entity_df, features={feature_list!r})"
+            f".to_df().to_parquet({output!r}, row_group_size=OUTPUT_ROW_GROUP_ROWS);"
+            if chunk_size == 0
+            else f"write_historical_features(entity_df, {feature_list!r}, {output!r},"
+            f" {chunk_size}, {workers});"
+        )
+        + "print(json.dumps({'seconds': time.perf_counter() - start,"
+        " 'peak_rss_kb': int([line for line in open('/proc/self/status')"
+        " if line.startswith('VmHWM')][0].split()[1]),"
+        " 'worker_peak_rss_kb':"
+        " resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss}))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def sorted_rows(path: str) -> pd.DataFrame:
+    data = pd.read_parquet(path)
+    data = data[sorted(data.columns)]
+    return data.sort_values(["user_id", "event_timestamp"]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entities", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--chunk_size", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as repo_path:
+        rng = np.random.default_rng(0)
+        entity_df = create_repo(repo_path, args.users, args.entities, rng)
+        entity_path = os.path.join(repo_path, "entities.parquet")
+        entity_df.to_parquet(entity_path, index=False)
+
+        print("mode,entities,seconds,peak_rss_mb,worker_peak_rss_mb,row_groups")
+        outputs = {}
+        for mode, chunk_size in [("single", 0), ("chunked", args.chunk_size)]:
+            outputs[mode] = os.path.join(repo_path, f"{mode}.parquet")
+            result = run(
+                repo_path, entity_path, outputs[mode], chunk_size, args.workers
+            )
+            print(
+                f"{mode},{args.entities},{result['seconds']:.1f},"
+                f"{result['peak_rss_kb'] / 1024:.0f},"
+                f"{result['worker_peak_rss_kb'] / 1024:.0f},"
+                f"{pq.ParquetFile(outputs[mode]).num_row_groups}"
+            )
+        pd.testing.assert_frame_equal(
+            sorted_rows(outputs["single"]), sorted_rows(outputs["chunked"])
+        )
+        print("chunked output matches the single call")
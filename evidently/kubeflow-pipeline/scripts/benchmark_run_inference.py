@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from sklearn.ensemble import RandomForestClassifier
+
+# Scores a generated feature Dataset with a random forest trained on the
+# same kind of columns, reading it whole, streaming it in batches and
+# scoring its batches with 1 to --workers processes, each in a fresh
+# process. The input is written with a plain to_parquet, like the feature
+# Dataset of retrieve_features, so up to ~1M rows it is one row group. Prints the wall time and the peak RSS (VmHWM) of the process,
+# and of its largest worker, and checks all outputs are the same.
+SRC_DIR = Path(__file__).resolve().parents[1] / "src" / "run_inference"
+CATEGORIES = {
+    "Education": 16,
+    "Marital-Status": 7,
+    "Native_country": 40,
+    "Occupation": 14,
+    "Race": 5,
+    "Relationship": 6,
+    "Sex": 2,
+    "Workclass": 8,
+}
+
+
+def generate_features(n_rows: int, rng) -> pd.DataFrame:
+    data = {
+        "user_id": np.arange(n_rows).astype(str),
+        "event_timestamp": pd.Timestamp("2024-01-01", tz="UTC")
+        + pd.to_timedelta(rng.integers(0, 86400, n_rows), unit="s"),
+    }
+    for column, n_categories in CATEGORIES.items():
+        data[column] = pd.Categorical.from_codes(
+            rng.integers(0, n_categories, n_rows),
+            [f"{column}-{i}" for i in range(n_categories)],
+        ).astype(object)
+    return pd.DataFrame(data)
+
+
+def train_model(work_dir: str, rng):
+    """Pickles a model and its column_list next to each other in work_dir."""
+    train = generate_features(20_000, rng).drop(columns=["user_id", "event_timestamp"])
+    encoded = pd.get_dummies(train, drop_first=True, dtype=float)
+    target = (encoded.iloc[:, :5].sum(axis=1) + rng.random(len(train))) > 0.8
+    model = RandomForestClassifier(n_estimators=50, max_depth=12, random_state=0)
+    model.fit(encoded, target)
+    with open(os.path.join(work_dir, "model.pkl"), "wb") as f:
+        pickle.dump(model, f)
+    with open(os.path.join(work_dir, "column_list.pkl"), "wb") as f:
+        pickle.dump(list(encoded.columns), f)
+
+
+def run(
+    work_dir: str, input_data: str, data_output: str, batch_size: int, workers: int
+):
+    """Scores input_data in a new process, returns its measurements."""
+    if workers > 0:
+        # The workers load the model from its pickled bytes
+        score = (
+            "from functools import partial;"
+            f"score_parallel(partial(pickle.loads, open('model.pkl', 'rb').read()),"
+            f" encoder, {input_data!r}, {data_output!r}, {batch_size}, {workers});"
+        )
+    elif batch_size > 0:
+        score = (
+            f"score_stream(model, encoder, {input_data!r}, {data_output!r},"
+            f" {batch_size});"
+        )
+    else:
+        score = (
+            f"score_batch(model, encoder, pd.read_parquet({input_data!r},"
+            f" columns=names)).to_parquet({data_output!r});"
+        )
+    code = (
+        f"import json, os, pickle, resource, sys, time;"
+        f"sys.path.insert(0, {str(SRC_DIR)!r}); os.chdir({work_dir!r});"
+        "import pandas as pd, pyarrow.parquet as pq;"
+        "from one_hot_encoder import OneHotEncoder;"
+        "from run_inference import ENTITY_COLUMNS, score_batch, score_parallel,"
+        " score_stream;"
+        "model = pickle.load(open('model.pkl', 'rb'));"
+        "col_list = pickle.load(open('column_list.pkl', 'rb'));"
+        f"names = [n for n in pq.read_schema({input_data!r}).names"
+        " if n not in ENTITY_COLUMNS];"
+        "encoder = OneHotEncoder(names, col_list);"
+        "start = time.perf_counter();"
+        + score
+        + "print(json.dumps({'seconds': time.perf_counter() - start,"
+        " 'peak_rss_kb': int([line for line in open('/proc/self/status')"
+        " if line.startswith('VmHWM')][0].split()[1]),"
+        " 'worker_peak_rss_kb':"
+        " resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss}))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--batch_size", type=int, default=65536)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        rng = np.random.default_rng(0)
+        train_model(work_dir, rng)
+        input_data = os.path.join(work_dir, "features.parquet")
+        generate_features(args.rows, rng).to_parquet(input_data, index=False)
+        print(
+            f"input {os.path.getsize(input_data) / 2**20:.0f} MB in"
+            f" {pq.ParquetFile(input_data).num_row_groups} row groups"
+        )
+
+        print("mode,workers,rows,seconds,peak_rss_mb,worker_peak_rss_mb")
+        runs = [("whole", 0, 0), ("stream", args.batch_size, 0)] + [
+            ("parallel", args.batch_size, workers)
+            for workers in range(1, args.workers + 1)
+        ]
+        outputs = []
+        for mode, batch_size, workers in runs:
+            outputs.append(os.path.join(work_dir, f"{mode}-{workers}.parquet"))
+            result = run(work_dir, input_data, outputs[-1], batch_size, workers)
+            print(
+                f"{mode},{workers},{args.rows},{result['seconds']:.1f},"
+                f"{result['peak_rss_kb'] / 1024:.0f},"
+                f"{result['worker_peak_rss_kb'] / 1024:.0f}"
+            )
+        expected = pq.read_table(outputs[0])
+        for output in outputs[1:]:
+            assert pq.read_table(output).equals(expected), output
+        print("all outputs match the whole-input output")
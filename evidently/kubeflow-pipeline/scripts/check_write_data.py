@@ -0,0 +1,128 @@
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from minio import Minio
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "write_data"))
+from write_data import write_data  # noqa: E402
+
+# Checks the write_data component against a MinIO or MinIO-compatible server
+# reachable with MINIO_HOST, MINIO_ACCESS_KEY and MINIO_SECRET_KEY (e.g.
+# `minio server /tmp/minio-data`): the direct upload is byte for byte the
+# artifact, and re-encoded and partitioned uploads hold the same rows.
+# Compares the time of the direct upload with the earlier pandas round trip.
+BUCKET = "write-data-check"
+N_ROWS = 5_000_000
+
+
+def download(client: Minio, object_name: str) -> bytes:
+    response = client.get_object(BUCKET, object_name)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def pandas_round_trip(client: Minio, input_path: str, file_name: str, tmp_dir: str):
+    """What write_data did before: decode, encode a local copy, upload it."""
+    local_copy = os.path.join(tmp_dir, "copy.parquet")
+    pd.read_parquet(input_path).to_parquet(local_copy, index=False)
+    client.fput_object(BUCKET, file_name, local_copy)
+
+
+if __name__ == "__main__":
+    credentials = dict(
+        minio_host=os.environ["MINIO_HOST"],
+        access_key=os.environ["MINIO_ACCESS_KEY"],
+        secret_key=os.environ["MINIO_SECRET_KEY"],
+    )
+    client = Minio(
+        credentials["minio_host"],
+        access_key=credentials["access_key"],
+        secret_key=credentials["secret_key"],
+        secure=False,
+    )
+    if not client.bucket_exists(BUCKET):
+        client.make_bucket(BUCKET)
+
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(
+        {
+            "user_id": rng.integers(0, 2**62, N_ROWS).astype(str),
+            "score": rng.random(N_ROWS),
+            "prediction": rng.integers(0, 2, N_ROWS),
+        }
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, "predictions")
+        data.to_parquet(input_path, index=False)
+        print(f"artifact {os.path.getsize(input_path) / 2**20:.0f} MB")
+
+        # Direct upload: the object is the artifact
+        seconds = timed(
+            write_data,
+            **credentials,
+            bucket_name=BUCKET,
+            file_name="direct.parquet",
+            input_data_path=input_path,
+            part_size_mb=8,
+        )
+        assert download(client, "direct.parquet") == Path(input_path).read_bytes()
+        print(f"direct upload ok {seconds:.2f}s")
+        seconds = timed(
+            pandas_round_trip, client, input_path, "round_trip.parquet", tmp_dir
+        )
+        print(f"pandas round trip {seconds:.2f}s")
+
+        # Re-encoded: same rows, new compression
+        seconds = timed(
+            write_data,
+            **credentials,
+            bucket_name=BUCKET,
+            file_name="zstd.parquet",
+            input_data_path=input_path,
+            compression="zstd",
+        )
+        uploaded = pq.ParquetFile(io.BytesIO(download(client, "zstd.parquet")))
+        assert uploaded.metadata.row_group(0).column(0).compression == "ZSTD"
+        assert uploaded.read().equals(pq.read_table(input_path))
+        print(f"re-encoded upload ok {seconds:.2f}s")
+
+        # Partitioned: one object per partition under the file_name prefix
+        write_data(
+            **credentials,
+            bucket_name=BUCKET,
+            file_name="partitioned",
+            input_data_path=input_path,
+            partition_cols=["prediction"],
+        )
+        objects = sorted(
+            o.object_name
+            for o in client.list_objects(BUCKET, prefix="partitioned/", recursive=True)
+        )
+        assert objects == [
+            "partitioned/prediction=0/part-0.parquet",
+            "partitioned/prediction=1/part-0.parquet",
+        ], objects
+        n_rows = sum(
+            pq.read_metadata(io.BytesIO(download(client, name))).num_rows
+            for name in objects
+        )
+        assert n_rows == N_ROWS
+        print("partitioned upload ok")
+
+    for o in client.list_objects(BUCKET, recursive=True):
+        client.remove_object(BUCKET, o.object_name)
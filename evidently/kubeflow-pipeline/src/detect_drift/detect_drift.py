@@ -7,9 +7,26 @@ from evidently.metrics import DatasetDriftMetric, DatasetMissingValuesMetric
 from evidently.ui.remote import RemoteWorkspace
 import mlflow
 from mlflow import MlflowClient
+from mlflow.exceptions import MlflowException
 import json
 import argparse
 import os
+import random
+import time
+from reference_dataset import align_categories, read_reference_dataset
+from reference_profile import PROFILE_FILE_NAME, ReferenceProfile
+
+# Columns the drift report covers, and with them the reference profile
+DRIFT_COLUMNS = [
+    "Education",
+    "Marital-Status",
+    "Native_country",
+    "Occupation",
+    "Race",
+    "Relationship",
+    "Sex",
+    "Workclass",
+]
 
 
 def download_file_from_minio(
@@ -26,6 +43,80 @@ def download_file_from_minio(
     client.fget_object(bucket_name, object_name, file_path)
 
 
+def load_reference_profile(
+    model_run_id: str,
+    download_reference_dataset,
+    cache_dir: str,
+) -> ReferenceProfile:
+    """
+    Returns the reference profile of the model run. It is read from the local
+    cache, else from the run's artifacts, where
+    bentoml/scripts/log_reference_profile.py logs it once per model. A run
+    without one is profiled from the reference dataset into the local cache
+    only; a pipeline step never writes to the model's training run.
+
+    Args:
+        model_run_id (str): Run of the model in use.
+        download_reference_dataset (callable): Downloads the reference
+            dataset, Parquet or CSV, and returns its path.
+        cache_dir (str): Local directory for profiles, one per run.
+    """
+    run_cache_dir = os.path.join(cache_dir, model_run_id)
+    profile_path = os.path.join(run_cache_dir, PROFILE_FILE_NAME)
+    if os.path.exists(profile_path):
+        return ReferenceProfile.load(profile_path)
+    os.makedirs(run_cache_dir, exist_ok=True)
+    try:
+        mlflow.artifacts.download_artifacts(
+            f"runs:/{model_run_id}/{PROFILE_FILE_NAME}", dst_path=run_cache_dir
+        )
+        return ReferenceProfile.load(profile_path)
+    except (MlflowException, OSError):
+        print(
+            "reference profile not found for the run, computing it;"
+            " log it once with bentoml/scripts/log_reference_profile.py"
+        )
+    reference_df = read_reference_dataset(
+        download_reference_dataset(), columns=DRIFT_COLUMNS
+    )
+    profile = ReferenceProfile.from_dataframe(reference_df)
+    profile.save(profile_path)
+    return profile
+
+
+def add_report_with_retry(
+    workspace: RemoteWorkspace,
+    project_id,
+    report: Report,
+    attempts: int = 5,
+    base_delay_seconds: float = 2.0,
+    max_delay_seconds: float = 60.0,
+):
+    """
+    Uploads the report, retrying with exponential backoff and jitter while
+    the Evidently service is unavailable. The last error is raised.
+
+    Args:
+        workspace (RemoteWorkspace): Evidently workspace.
+        project_id: Project the report belongs to.
+        report (Report): Report to upload.
+        attempts (int): Maximum number of uploads tried.
+        base_delay_seconds (float): Delay before the first retry.
+        max_delay_seconds (float): Upper bound of the delay.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            workspace.add_report(project_id, report)
+            return
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            delay = min(max_delay_seconds, base_delay_seconds * 2 ** (attempt - 1))
+            delay *= random.uniform(0.5, 1.0)
+            print(f"report upload failed ({e}), retry {attempt} in {delay:.1f}s")
+            time.sleep(delay)
+
+
 def create_evidently_project(
     workspace: RemoteWorkspace, evidently_ui_project_name: str
 ) -> Project:
@@ -57,6 +148,9 @@ def detect_drift(
     feature_dataset_path: str,
     evidently_workspace_url: str,
     evidently_ui_project_name: str,
+    reference_mode: str = "profile",
+    profile_cache_dir: str = "reference_profiles",
+    upload_attempts: int = 5,
 ):
     os.environ["AWS_ACCESS_KEY_ID"] = access_key
     os.environ["AWS_SECRET_ACCESS_KEY"] = secret_key
@@ -93,18 +187,28 @@ def detect_drift(
     object_name = "/".join(dataset_source.split("/")[1:])
     file_path = object_name.split("/")[-1]
 
-    download_file_from_minio(
-        minio_host=minio_host,
-        access_key=access_key,
-        secret_key=secret_key,
-        bucket_name=bucket_name,
-        object_name=object_name,
-        file_path=file_path,
-    )
+    def download_reference_dataset() -> str:
+        download_file_from_minio(
+            minio_host=minio_host,
+            access_key=access_key,
+            secret_key=secret_key,
+            bucket_name=bucket_name,
+            object_name=object_name,
+            file_path=file_path,
+        )
+        return file_path
 
-    reference_df = pd.read_csv(file_path)
     feature_df = pd.read_parquet(feature_dataset_path)
     feature_df.drop(columns=["user_id"], errors="ignore", inplace=True)
+    if reference_mode == "full":
+        # Validation mode: the whole reference dataset, as it was logged
+        reference_df = read_reference_dataset(download_reference_dataset())
+    else:
+        profile = load_reference_profile(
+            model_run_id, download_reference_dataset, profile_cache_dir
+        )
+        reference_df = profile.to_dataframe()
+        feature_df = feature_df[profile.columns]
 
     report = Report(
         metrics=[
@@ -128,6 +232,7 @@ def detect_drift(
             ColumnSummaryMetric(column_name="Workclass"),
         ],
     )
+    reference_df, feature_df = align_categories(reference_df, feature_df)
     report.run(reference_data=reference_df, current_data=feature_df)
 
     report_file_path = "drift_report.json"
@@ -136,7 +241,9 @@ def detect_drift(
     print("report written")
     project = get_evidently_project(evidently_workspace, evidently_ui_project_name)
     print("project retreived")
-    evidently_workspace.add_report(project.id, report)
+    add_report_with_retry(
+        evidently_workspace, project.id, report, attempts=upload_attempts
+    )
     project.save()
 
 
@@ -186,6 +293,27 @@ def main():
         help="Evidently UI project name.",
     )
 
+    parser.add_argument(
+        "--reference_mode",
+        type=str,
+        default="profile",
+        choices=["profile", "full"],
+        help="Compare against the reference profile or the full reference dataset.",
+    )
+    parser.add_argument(
+        "--profile_cache_dir",
+        type=str,
+        default="reference_profiles",
+        help="Local cache directory for reference profiles.",
+    )
+
+    parser.add_argument(
+        "--upload_attempts",
+        type=int,
+        default=5,
+        help="Attempts to upload the report to Evidently.",
+    )
+
     args = parser.parse_args()
 
     detect_drift(
@@ -199,6 +327,9 @@ def main():
         feature_dataset_path=args.feature_dataset_path,
         evidently_workspace_url=args.evidently_workspace_url,
         evidently_ui_project_name=args.evidently_ui_project_name,
+        reference_mode=args.reference_mode,
+        profile_cache_dir=args.profile_cache_dir,
+        upload_attempts=args.upload_attempts,
     )
 
 
@@ -1,9 +1,75 @@
 from minio import Minio
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
 import argparse
+import shutil
+import struct
 from pathlib import Path
 
+# Size of the reads when streaming an object to the output artifact
+COPY_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def read_range(
+    client: Minio, bucket_name: str, object_name: str, offset: int, length: int
+) -> bytes:
+    response = client.get_object(bucket_name, object_name, offset=offset, length=length)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def read_parquet_schema(client: Minio, bucket_name: str, object_name: str) -> pa.Schema:
+    """
+    Reads the schema of a Parquet object from its footer, with two ranged
+    reads of the object's tail. No row data is downloaded.
+
+    Args:
+        client (Minio): MinIO client.
+        bucket_name (str): Minio bucket name.
+        object_name (str): Parquet object to inspect.
+    """
+    size = client.stat_object(bucket_name, object_name).size
+    if size < 12:
+        raise ValueError(f"{object_name} is too small to be a Parquet file")
+    # A Parquet file ends with the footer length and the magic bytes PAR1
+    tail = read_range(client, bucket_name, object_name, size - 8, 8)
+    if tail[4:] != b"PAR1":
+        raise ValueError(f"{object_name} is not a Parquet file")
+    footer_length = struct.unpack("<I", tail[:4])[0]
+    footer = read_range(
+        client, bucket_name, object_name, size - 8 - footer_length, footer_length + 8
+    )
+    return pq.read_schema(pa.BufferReader(footer))
+
+
+def validate_schema(schema: pa.Schema, required_columns: list):
+    missing = [column for column in required_columns if column not in schema.names]
+    if missing:
+        raise ValueError(f"Entity data is missing the columns {missing}")
+
+
+def stream_object(client: Minio, bucket_name: str, object_name: str, output_path: str):
+    """
+    Copies the object to output_path in COPY_CHUNK_BYTES chunks, without a
+    temporary copy or decoding it. The file only appears under output_path
+    once it is complete.
+    """
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{output_path}.part"
+    response = client.get_object(bucket_name, object_name)
+    try:
+        with open(tmp_path, "wb") as f:
+            shutil.copyfileobj(response, f, COPY_CHUNK_BYTES)
+    finally:
+        response.close()
+        response.release_conn()
+    os.replace(tmp_path, output_path)
+
 
 def get_data(
     minio_host: str,
@@ -12,9 +78,13 @@ def get_data(
     bucket_name: str,
     file_name: str,
     data_output_path: str,
+    copy_mode: str = "stream",
+    required_columns: list = None,
 ):
     """
-    Downloads a file from Minio, reads it as a DataFrame, and saves it as a parquet file.
+    Fetches a Parquet file from Minio into the output Dataset. "stream"
+    copies the object as it is, "rewrite" reads it into a DataFrame and
+    writes it again as parquet.
 
     Args:
         minio_host (str): Minio host URL.
@@ -23,12 +93,29 @@ def get_data(
         bucket_name (str): Minio bucket name.
         file_name (str): File name to download.
         data_output_path (str): Path to save the output Dataset.
+        copy_mode (str): "stream" or "rewrite".
+        required_columns (list): Columns the file must have, checked on the
+            Parquet footer before anything is copied.
     """
     # Initialize Minio client
     client = Minio(
         endpoint=minio_host, access_key=access_key, secret_key=secret_key, secure=False
     )
 
+    if required_columns:
+        print(f"Validating the schema of {file_name}...")
+        validate_schema(
+            read_parquet_schema(client, bucket_name, file_name), required_columns
+        )
+
+    if copy_mode == "stream":
+        print(
+            f"Streaming {file_name} from bucket {bucket_name} to {data_output_path}..."
+        )
+        stream_object(client, bucket_name, file_name, data_output_path)
+        print("Data saved successfully.")
+        return
+
     # Ensure the file will be downloaded to a temp directory
     local_temp_file = os.path.join("/tmp", file_name)
 
@@ -72,6 +159,19 @@ def main():
         required=True,
         help="Output path for the Dataset",
     )
+    parser.add_argument(
+        "--copy_mode",
+        type=str,
+        default="stream",
+        choices=["stream", "rewrite"],
+        help="Copy the file as it is, or rewrite it through pandas",
+    )
+    parser.add_argument(
+        "--required_columns",
+        type=str,
+        default="",
+        help="Comma-separated columns the file must have, checked on its footer",
+    )
 
     args = parser.parse_args()
 
@@ -83,6 +183,8 @@ def main():
         bucket_name=args.bucket_name,
         file_name=args.file_name,
         data_output_path=args.data_output_path,
+        copy_mode=args.copy_mode,
+        required_columns=[c for c in args.required_columns.split(",") if c],
     )
 
 
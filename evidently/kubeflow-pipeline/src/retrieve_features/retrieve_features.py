@@ -4,9 +4,19 @@ from pathlib import Path
 from minio import Minio
 from feast.repo_config import FeastConfigError
 from pydantic import ValidationError
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import pyarrow as pa
+import pyarrow.parquet as pq
 import argparse
 import os
 
+# Feature store of a chunk worker process
+_worker_store = None
+# Rows per row group of the output Dataset, so run_inference can read and
+# score it in batches whatever the retrieval chunking was
+OUTPUT_ROW_GROUP_ROWS = 65536
+
 
 def init_feature_store(
     minio_host: str, access_key: str, secret_key: str, bucket_name: str, file_name: str
@@ -30,6 +40,91 @@ def init_feature_store(
     return store
 
 
+def _init_worker(repo_path: str):
+    global _worker_store
+    _worker_store = FeatureStore(repo_path=repo_path)
+
+
+def _retrieve_chunk(entity_df: pd.DataFrame, feature_list: list) -> pa.Table:
+    feature_df = _worker_store.get_historical_features(
+        entity_df=entity_df,
+        features=feature_list,
+    ).to_df()
+    return pa.Table.from_pandas(feature_df, preserve_index=False)
+
+
+def write_historical_features(
+    entity_df: pd.DataFrame,
+    feature_list: list,
+    data_output: str,
+    chunk_size: int,
+    num_workers: int,
+    repo_path: str = ".",
+):
+    """
+    Retrieves the historical features of entity_df in slices of chunk_size
+    rows, num_workers slices at a time, each in its own process with its own
+    FeatureStore. The point-in-time join is per entity row, so the slices
+    give the same rows as a single call. A single call also keeps only one
+    of repeated entity rows, so they are dropped before slicing; a repeat
+    in another slice would otherwise survive. Each slice is appended to
+    data_output in entity order, as row groups of OUTPUT_ROW_GROUP_ROWS,
+    once it and the ones before it are done, so at most a few slices are
+    held in memory.
+
+    Args:
+        entity_df (pd.DataFrame): Entity rows with their event timestamps.
+        feature_list (list): Feature references to retrieve.
+        data_output (str): Parquet file to write.
+        chunk_size (int): Entity rows per slice.
+        num_workers (int): Worker processes.
+        repo_path (str): Feature repo with the feature_store.yaml.
+    """
+    entity_df = entity_df.drop_duplicates()
+    chunks = (
+        entity_df.iloc[start : start + chunk_size]
+        for start in range(0, len(entity_df), chunk_size)
+    )
+    Path(data_output).parent.mkdir(parents=True, exist_ok=True)
+    writer = None
+    # Spawned rather than forked, the parent may already hold feature store
+    # connections and threads
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(repo_path,),
+    ) as executor:
+        pending = []
+        n_rows = 0
+        for chunk in chunks:
+            pending.append(executor.submit(_retrieve_chunk, chunk, feature_list))
+            # Keeps the workers busy with the next slices while bounding the
+            # finished ones waiting for an earlier slice
+            while len(pending) > 2 * num_workers:
+                writer, written = _write_chunk(writer, pending.pop(0), data_output)
+                n_rows += written
+        while pending:
+            writer, written = _write_chunk(writer, pending.pop(0), data_output)
+            n_rows += written
+    if writer is None:
+        return
+    writer.close()
+    print(f"Wrote {n_rows} rows in chunks of {chunk_size} to {data_output}")
+
+
+def _write_chunk(writer, future, data_output: str):
+    table = future.result()
+    if writer is None:
+        writer = pq.ParquetWriter(data_output, table.schema)
+    else:
+        # A slice whose feature column is all missing can come back with
+        # another type
+        table = table.cast(writer.schema)
+    writer.write_table(table, row_group_size=OUTPUT_ROW_GROUP_ROWS)
+    return writer, table.num_rows
+
+
 def get_features(
     minio_host: str,
     access_key: str,
@@ -39,7 +134,27 @@ def get_features(
     entity_df: str,
     feature_list: str,
     data_output: str,
+    chunk_size: int = 0,
+    num_workers: int = 4,
 ):
+    """
+    Retrieves the historical features of the entity Dataset into the
+    output Dataset, written in row groups of OUTPUT_ROW_GROUP_ROWS. With
+    chunk_size 0 it is a single get_historical_features call, otherwise see
+    write_historical_features.
+
+    Args:
+        minio_host (str): Minio host URL.
+        access_key (str): Minio access key.
+        secret_key (str): Minio secret key.
+        bucket_name (str): Minio bucket of the feature_store.yaml.
+        file_name (str): Name of the feature_store.yaml.
+        entity_df (str): Path of the entity Dataset.
+        feature_list (str): Comma-separated feature references.
+        data_output (str): Path to save the output Dataset.
+        chunk_size (int): Entity rows per retrieval, 0 for a single one.
+        num_workers (int): Retrievals running at a time when chunked.
+    """
     store = init_feature_store(
         minio_host, access_key, secret_key, bucket_name, file_name
     )
@@ -50,6 +165,11 @@ def get_features(
     entity_df = pd.read_parquet(entity_df)
     print("Entity DataFrame head:")
     print(entity_df.head())
+    if 0 < chunk_size < len(entity_df):
+        write_historical_features(
+            entity_df, feature_list, data_output, chunk_size, num_workers
+        )
+        return
     feature_df = store.get_historical_features(
         entity_df=entity_df,
         features=feature_list,
@@ -57,7 +177,7 @@ def get_features(
     print("Retrieved historical features:")
     print(feature_df.head())
     Path(data_output).parent.mkdir(parents=True, exist_ok=True)
-    feature_df.to_parquet(data_output)
+    feature_df.to_parquet(data_output, row_group_size=OUTPUT_ROW_GROUP_ROWS)
 
 
 def main():
@@ -85,6 +205,18 @@ def main():
     parser.add_argument(
         "--data_output", type=str, required=True, help="Output path for the Dataset"
     )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=0,
+        help="Entity rows per retrieval, 0 retrieves them all in one call",
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=4,
+        help="Retrievals running at a time when chunked",
+    )
     args = parser.parse_args()
 
     # Call the get_features function with parsed arguments
@@ -97,6 +229,8 @@ def main():
         entity_df=args.entity_df,
         feature_list=args.feature_list,
         data_output=args.data_output,
+        chunk_size=args.chunk_size,
+        num_workers=args.num_workers,
     )
 
 
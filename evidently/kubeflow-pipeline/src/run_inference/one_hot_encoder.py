@@ -0,0 +1,120 @@
+# Shared by the BentoML services (bentoml/src/one_hot_encoder.py) and the
+# pipeline's run_inference step (evidently/kubeflow-pipeline/src/run_inference/
+# one_hot_encoder.py). The pipeline image is built from the kubeflow-pipeline
+# directory alone and cannot import the bentoml sources, so the file is kept
+# twice; the two copies must stay identical.
+import numpy as np
+import pandas as pd
+
+# Below this many rows a plain dict lookup per value beats factorizing
+_SMALL_BATCH_ROWS = 64
+
+
+def _category_key(value):
+    # get_dummies skips missing values and names columns after str(value)
+    if value is None or value != value:
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+class OneHotEncoder:
+    """
+    One-hot encoder compiled once from the training column_list.
+
+    Each dummy column in column_list ("<feature>_<category>") is mapped to its
+    position, so raw feature values are written straight into a float matrix
+    laid out like column_list. The output matches get_dummies followed by
+    reindex(columns=column_list, fill_value=0): the category dropped at
+    training time, unseen categories and missing values all encode as zeros.
+    Columns named exactly after a feature are copied through unchanged.
+
+    Categorical columns are encoded from their codes, with one lookup per
+    category; other columns are factorized first. Either way the ones are
+    written with a single flat put per feature.
+
+    Args:
+        feature_names (list): Raw feature names, e.g. ["Sex", "Race"].
+        column_list (list): Model input columns from column_list.pkl.
+    """
+
+    def __init__(self, feature_names, column_list):
+        self.feature_names = list(feature_names)
+        self.column_list = list(column_list)
+        self.category_index = {feature: {} for feature in self.feature_names}
+        self.passthrough_index = {}
+        for index, column in enumerate(self.column_list):
+            if column in self.category_index:
+                self.passthrough_index[column] = index
+                continue
+            # Longest prefix wins so "Native_country_X" is not read as "Native"
+            matches = [f for f in self.feature_names if column.startswith(f + "_")]
+            if matches:
+                feature = max(matches, key=len)
+                self.category_index[feature][column[len(feature) + 1 :]] = index
+
+    def _lookup_all(self, lookup: dict, values) -> np.ndarray:
+        return np.fromiter(
+            (lookup.get(_category_key(value), -1) for value in values),
+            dtype=np.intp,
+            count=len(values),
+        )
+
+    def _columns(self, feature: str, values) -> np.ndarray:
+        """Output column of each value of feature, -1 where nothing is set."""
+        lookup = self.category_index[feature]
+        if len(values) <= _SMALL_BATCH_ROWS:
+            return self._lookup_all(lookup, values)
+        if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+            categorical = values.array if isinstance(values, pd.Series) else values
+            codes, uniques = categorical.codes, categorical.categories
+        else:
+            # Look up each distinct value once; factorize codes missing as -1
+            codes, uniques = pd.factorize(values)
+        # Code -1 (missing) picks the trailing -1
+        return np.append(self._lookup_all(lookup, uniques), -1)[codes]
+
+    def transform(self, data, out=None) -> np.ndarray:
+        """
+        Encodes a DataFrame (or mapping of feature name to values) into a
+        len(data) x len(column_list) float matrix. out can be a preallocated
+        matrix of that shape; it is zeroed and filled in place.
+        """
+        n_rows = len(data[self.feature_names[0]]) if self.feature_names else 0
+        if out is None:
+            out = np.zeros((n_rows, len(self.column_list)), dtype=float)
+        else:
+            out.fill(0.0)
+        row_offsets = None
+        for feature in self.feature_names:
+            values = data[feature]
+            if feature in self.passthrough_index:
+                out[:, self.passthrough_index[feature]] = values
+                continue
+            if not self.category_index[feature]:
+                continue
+            if row_offsets is None:
+                row_offsets = np.arange(n_rows) * len(self.column_list)
+            columns = self._columns(feature, values)
+            hit = columns >= 0
+            # Flat positions of the ones, out is written in place
+            out.put((row_offsets + columns)[hit], 1.0)
+        return out
+
+    def transform_row(self, values: dict, out=None) -> np.ndarray:
+        """Encodes a single row given as {feature_name: value}."""
+        if out is None:
+            out = np.zeros(len(self.column_list), dtype=float)
+        else:
+            out.fill(0.0)
+        for feature in self.feature_names:
+            value = values.get(feature)
+            if feature in self.passthrough_index:
+                out[self.passthrough_index[feature]] = value
+                continue
+            index = self.category_index[feature].get(_category_key(value))
+            if index is not None:
+                out[index] = 1.0
+        return out
+
+    def transform_dataframe(self, data) -> pd.DataFrame:
+        return pd.DataFrame(self.transform(data), columns=self.column_list, copy=False)
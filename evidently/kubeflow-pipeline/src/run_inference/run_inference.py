@@ -1,10 +1,183 @@
 import mlflow
 from mlflow.tracking import MlflowClient
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pickle
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 import argparse
+import multiprocessing
 import os
+from one_hot_encoder import OneHotEncoder
+
+# Columns of the feature Dataset that are not model inputs
+ENTITY_COLUMNS = ["user_id", "event_timestamp"]
+PREDICTION_COLUMN = "Predicted_Income_Class"
+DEFAULT_BATCH_SIZE = 65536
+
+# Model and encoder of a scoring worker process
+_worker_model = None
+_worker_encoder = None
+_worker_buffer = None
+
+
+def load_model(model_name: str, model_type: str, model_stage: str):
+    if model_type == "sklearn":
+        return mlflow.sklearn.load_model(
+            model_uri=f"models:/{model_name}/{model_stage}"
+        )
+    elif model_type == "xgboost":
+        return mlflow.xgboost.load_model(
+            model_uri=f"models:/{model_name}/{model_stage}"
+        )
+    elif model_type == "tensorflow":
+        return mlflow.tensorflow.load_model(
+            model_uri=f"models:/{model_name}/{model_stage}"
+        )
+    raise NotImplementedError(f"Model type '{model_type}' is not supported.")
+
+
+def load_registered_model(
+    mlflow_host: str, model_name: str, model_type: str, model_stage: str
+):
+    mlflow.set_tracking_uri(mlflow_host)
+    return load_model(model_name, model_type, model_stage)
+
+
+def score_batch(model, encoder: OneHotEncoder, batch: pd.DataFrame, out=None):
+    """
+    Encodes a batch of features, into out when given, and returns the
+    encoded DataFrame with the positive class probability appended.
+    """
+    encoded = pd.DataFrame(
+        encoder.transform(batch, out=out), columns=encoder.column_list, copy=False
+    )
+    encoded[PREDICTION_COLUMN] = model.predict_proba(encoded)[:, 1]
+    return encoded
+
+
+def score_stream(
+    model, encoder: OneHotEncoder, input_data: str, data_output: str, batch_size: int
+) -> int:
+    """
+    Scores input_data batch_size rows at a time and appends each scored
+    batch to data_output, so memory depends on batch_size rather than on
+    the size of the Dataset. Only the feature columns are read. Returns the
+    number of rows scored.
+    """
+    Path(data_output).parent.mkdir(parents=True, exist_ok=True)
+    buffer = np.empty((batch_size, len(encoder.column_list)), dtype=float)
+    writer = None
+    n_rows = 0
+    try:
+        for batch in pq.ParquetFile(input_data).iter_batches(
+            batch_size=batch_size, columns=encoder.feature_names
+        ):
+            scored = score_batch(
+                model, encoder, batch.to_pandas(), out=buffer[: batch.num_rows]
+            )
+            table = pa.Table.from_pandas(scored, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(data_output, table.schema)
+            writer.write_table(table)
+            n_rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        _write_empty(encoder, data_output)
+    return n_rows
+
+
+def _write_empty(encoder: OneHotEncoder, data_output: str):
+    empty = pd.DataFrame(columns=[*encoder.column_list, PREDICTION_COLUMN])
+    empty.astype(float).to_parquet(data_output, index=False)
+
+
+def _init_worker(model_loader, encoder: OneHotEncoder, batch_size: int):
+    global _worker_model, _worker_encoder, _worker_buffer
+    _worker_model = model_loader()
+    # The workers already use every core, one thread each
+    if hasattr(_worker_model, "n_jobs"):
+        _worker_model.set_params(n_jobs=1)
+    _worker_encoder = encoder
+    _worker_buffer = np.empty((batch_size, len(encoder.column_list)), dtype=float)
+
+
+def _score_record_batch(batch: pa.RecordBatch) -> pa.Table:
+    scored = score_batch(
+        _worker_model,
+        _worker_encoder,
+        batch.to_pandas(),
+        out=_worker_buffer[: batch.num_rows],
+    )
+    return pa.Table.from_pandas(scored, preserve_index=False)
+
+
+def score_parallel(
+    model_loader,
+    encoder: OneHotEncoder,
+    input_data: str,
+    data_output: str,
+    batch_size: int,
+    num_workers: int,
+) -> int:
+    """
+    Scores input_data batch_size rows at a time across num_workers
+    processes, each loading the model once with model_loader, and appends
+    the scored batches to data_output in their original order. The batches
+    are read here and sent to the workers, so the work splits evenly however
+    the Dataset is laid out: to_parquet writes inputs of up to ~1M rows as a
+    single row group. At most 2 x num_workers batches are in flight, so
+    memory depends on batch_size rather than on the size of the Dataset.
+    Returns the number of rows scored.
+
+    Args:
+        model_loader (callable): Picklable function returning the model.
+        encoder (OneHotEncoder): Encoder of the model input columns.
+        input_data (str): Path of the feature Dataset.
+        data_output (str): Path to save the scored Dataset.
+        batch_size (int): Rows scored at a time by a worker.
+        num_workers (int): Worker processes.
+    """
+    Path(data_output).parent.mkdir(parents=True, exist_ok=True)
+    writer = None
+    n_rows = 0
+
+    def write(future):
+        nonlocal writer, n_rows
+        table = future.result()
+        if writer is None:
+            writer = pq.ParquetWriter(data_output, table.schema)
+        writer.write_table(table)
+        n_rows += table.num_rows
+
+    # Spawned rather than forked, the parent may hold MLflow client threads
+    try:
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_loader, encoder, batch_size),
+        ) as executor:
+            pending = []
+            for batch in pq.ParquetFile(input_data).iter_batches(
+                batch_size=batch_size, columns=encoder.feature_names
+            ):
+                pending.append(executor.submit(_score_record_batch, batch))
+                while len(pending) > 2 * num_workers:
+                    write(pending.pop(0))
+            while pending:
+                write(pending.pop(0))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        _write_empty(encoder, data_output)
+    return n_rows
 
 
 def perform_inference(
@@ -17,7 +190,28 @@ def perform_inference(
     mlflow_host: str,
     input_data: str,  # KFP v2 input artifact
     data_output: str,  # KFP v2 output artifact
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    num_workers: int = 1,
 ):
+    """
+    Scores the feature Dataset with the model in model_stage. With a
+    batch_size the Dataset is streamed through the model batch_size rows at
+    a time, with 0 it is read and scored whole. With more than one worker
+    its batches are scored in parallel, see score_parallel.
+
+    Args:
+        minio_host (str): Minio host URL.
+        access_key (str): Minio access key.
+        secret_key (str): Minio secret key.
+        model_name (str): Registered MLflow model name.
+        model_type (str): sklearn, xgboost or tensorflow.
+        model_stage (str): Model stage to load.
+        mlflow_host (str): MLflow tracking URI.
+        input_data (str): Path of the feature Dataset.
+        data_output (str): Path to save the scored Dataset.
+        batch_size (int): Rows scored at a time, 0 for all at once.
+        num_workers (int): Scoring processes, sklearn and xgboost models.
+    """
     os.environ["AWS_ACCESS_KEY_ID"] = access_key
     os.environ["AWS_SECRET_ACCESS_KEY"] = secret_key
     if not minio_host.startswith("http"):
@@ -40,33 +234,42 @@ def perform_inference(
     mlflow.artifacts.download_artifacts(
         f"runs:/{model_run_id}/column_list.pkl", dst_path="column_list"
     )
-    input_data_df = pd.read_parquet(input_data)
-    input_data_df.drop(columns=["user_id", "event_timestamp"], inplace=True)
-
     with open("column_list/column_list.pkl", "rb") as f:
         col_list = pickle.load(f)
-    input_data_df = pd.get_dummies(
-        input_data_df, drop_first=True, sparse=False, dtype=float
-    )
-    input_data_df = input_data_df.reindex(columns=col_list, fill_value=0)
+    feature_names = [
+        name for name in pq.read_schema(input_data).names if name not in ENTITY_COLUMNS
+    ]
+    # Same matrix as get_dummies + reindex(columns=col_list, fill_value=0): the
+    # category training dropped is simply not in col_list
+    encoder = OneHotEncoder(feature_names, col_list)
 
-    if model_type == "sklearn":
-        model = mlflow.sklearn.load_model(
-            model_uri=f"models:/{model_name}/{model_stage}"
+    if num_workers > 1:
+        if model_type not in ("sklearn", "xgboost"):
+            raise NotImplementedError(
+                f"Parallel scoring of '{model_type}' models is not supported."
+            )
+        n_rows = score_parallel(
+            partial(
+                load_registered_model, mlflow_host, model_name, model_type, model_stage
+            ),
+            encoder,
+            input_data,
+            data_output,
+            batch_size or DEFAULT_BATCH_SIZE,
+            num_workers,
         )
-    elif model_type == "xgboost":
-        model = mlflow.xgboost.load_model(
-            model_uri=f"models:/{model_name}/{model_stage}"
-        )
-    elif model_type == "tensorflow":
-        model = mlflow.tensorflow.load_model(
-            model_uri=f"models:/{model_name}/{model_stage}"
-        )
-    else:
-        raise NotImplementedError(f"Model type '{model_type}' is not supported.")
+        print(f"Scored {n_rows} rows with {num_workers} workers")
+        return
 
-    predicted_classes = [x[1] for x in model.predict_proba(input_data_df)]
-    input_data_df["Predicted_Income_Class"] = predicted_classes
+    model = load_model(model_name, model_type, model_stage)
+
+    if batch_size > 0:
+        n_rows = score_stream(model, encoder, input_data, data_output, batch_size)
+        print(f"Scored {n_rows} rows in batches of {batch_size}")
+        return
+
+    input_data_df = pd.read_parquet(input_data, columns=feature_names)
+    input_data_df = score_batch(model, encoder, input_data_df)
     Path(data_output).parent.mkdir(parents=True, exist_ok=True)
     input_data_df.to_parquet(data_output)
 
@@ -100,6 +303,18 @@ def main():
     parser.add_argument(
         "--data_output", required=True, help="Path to the output data artifact."
     )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Rows scored at a time, 0 reads and scores the whole input at once",
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=1,
+        help="Processes scoring batches in parallel (sklearn and xgboost)",
+    )
 
     args = parser.parse_args()
 
@@ -113,6 +328,8 @@ def main():
         mlflow_host=args.mlflow_host,
         input_data=args.input_data,
         data_output=args.data_output,
+        batch_size=args.batch_size,
+        num_workers=args.num_workers,
     )
 
 
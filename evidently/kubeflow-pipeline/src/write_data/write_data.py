@@ -1,6 +1,57 @@
 from minio import Minio
-import pandas as pd  # Updated imports for KFP v2
+import pyarrow.dataset as ds
 import argparse
+import os
+import tempfile
+
+# Smallest part size S3 accepts for a multipart upload
+MIN_PART_SIZE_MB = 5
+
+
+def upload_file(
+    client: Minio,
+    bucket_name: str,
+    object_name: str,
+    file_path: str,
+    part_size_mb: int,
+    num_parallel_uploads: int,
+):
+    """
+    Uploads file_path as it is. Files larger than a part are sent as a
+    multipart upload of num_parallel_uploads parts at a time.
+    """
+    client.fput_object(
+        bucket_name,
+        object_name,
+        file_path,
+        part_size=max(part_size_mb, MIN_PART_SIZE_MB) * 1024 * 1024,
+        num_parallel_uploads=num_parallel_uploads,
+    )
+
+
+def reencode(
+    input_data_path: str, output_dir: str, compression: str, partition_cols: list
+) -> list:
+    """
+    Rewrites the input Parquet into output_dir batch by batch with pyarrow,
+    with the given compression and, if partition_cols is set, as a hive
+    partitioned dataset. Returns the written files relative to output_dir.
+    """
+    file_format = ds.ParquetFileFormat()
+    ds.write_dataset(
+        ds.dataset(input_data_path, format="parquet"),
+        output_dir,
+        format=file_format,
+        file_options=file_format.make_write_options(compression=compression),
+        partitioning=partition_cols or None,
+        partitioning_flavor="hive" if partition_cols else None,
+        basename_template="part-{i}.parquet",
+    )
+    return sorted(
+        os.path.relpath(os.path.join(root, name), output_dir)
+        for root, _, names in os.walk(output_dir)
+        for name in names
+    )
 
 
 def write_data(
@@ -10,19 +61,66 @@ def write_data(
     bucket_name: str,
     file_name: str,
     input_data_path: str,  # Updated type hint for KFP v2
+    part_size_mb: int = 16,
+    num_parallel_uploads: int = 4,
+    compression: str = "",
+    partition_cols: list = None,
 ):
+    """
+    Uploads the input artifact to Minio. By default the artifact is
+    uploaded as it is; it is only re-encoded when a compression or
+    partition columns are given. A partitioned upload is written under the
+    file_name prefix, one object per file.
+
+    Args:
+        minio_host (str): Minio host URL.
+        access_key (str): Minio access key.
+        secret_key (str): Minio secret key.
+        bucket_name (str): Minio bucket name.
+        file_name (str): Object name to write.
+        input_data_path (str): Parquet artifact to upload.
+        part_size_mb (int): Multipart upload part size, at least 5.
+        num_parallel_uploads (int): Parts uploaded at a time.
+        compression (str): Parquet compression to re-encode with, empty to
+            keep the artifact's.
+        partition_cols (list): Columns to partition the upload by.
+    """
     client = Minio(
         endpoint=minio_host, access_key=access_key, secret_key=secret_key, secure=False
     )
 
-    # Load input data from the artifact path
-    input_data = pd.read_parquet(
-        input_data_path
-    )  # KFP v2 uses `.path` for artifact inputs
-    input_data.to_parquet(file_name, index=False)
+    if not compression and not partition_cols:
+        print(f"Uploading {input_data_path} to {bucket_name}/{file_name}...")
+        upload_file(
+            client,
+            bucket_name,
+            file_name,
+            input_data_path,
+            part_size_mb,
+            num_parallel_uploads,
+        )
+        return
 
-    # Upload the file to MinIO
-    client.fput_object(bucket_name, file_name, file_name)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(
+            f"Re-encoding {input_data_path} with compression={compression or None}"
+            f" partition_cols={partition_cols or None}..."
+        )
+        files = reencode(input_data_path, tmp_dir, compression or None, partition_cols)
+        for relative_path in files:
+            if partition_cols:
+                object_name = f"{file_name.rstrip('/')}/{relative_path}"
+            else:
+                object_name = file_name
+            print(f"Uploading {bucket_name}/{object_name}...")
+            upload_file(
+                client,
+                bucket_name,
+                object_name,
+                os.path.join(tmp_dir, relative_path),
+                part_size_mb,
+                num_parallel_uploads,
+            )
 
 
 def main():
@@ -33,6 +131,24 @@ def main():
     parser.add_argument("--bucket_name", type=str, help="MinIO bucket name")
     parser.add_argument("--file_name", type=str, help="Name of the file to upload")
     parser.add_argument("--input_data_path", type=str, help="Path to the input data")
+    parser.add_argument(
+        "--part_size_mb", type=int, default=16, help="Multipart upload part size"
+    )
+    parser.add_argument(
+        "--num_parallel_uploads", type=int, default=4, help="Parts uploaded at a time"
+    )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        default="",
+        help="Parquet compression to re-encode with, empty to upload as it is",
+    )
+    parser.add_argument(
+        "--partition_cols",
+        type=str,
+        default="",
+        help="Comma-separated columns to partition the upload by",
+    )
 
     args = parser.parse_args()
 
@@ -43,6 +159,10 @@ def main():
         bucket_name=args.bucket_name,
         file_name=args.file_name,
         input_data_path=args.input_data_path,
+        part_size_mb=args.part_size_mb,
+        num_parallel_uploads=args.num_parallel_uploads,
+        compression=args.compression,
+        partition_cols=[c for c in args.partition_cols.split(",") if c],
     )
 
 